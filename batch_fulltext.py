@@ -0,0 +1,374 @@
+import os
+import json
+import time
+import logging
+import argparse
+import threading
+from config import get_config
+from hdfs_client import make_hdfs_client
+from full_text import hdfs_walk
+from ndjson_output import make_ndjson_path, read_ndjson_summary
+from job_scheduler import JobScheduler
+from exe_full_text import execute_fulltext_api
+from result_cache import is_complete_output
+from error_status import *
+
+# 문서 별 배치 처리 상태
+BATCH_DONE = "DONE"
+BATCH_FAILED = "FAILED"
+BATCH_SKIPPED = "SKIPPED"
+
+# ================================================================================================================
+def find_pdf_paths(fs, input_path):
+    """
+    fs : hdfs client
+    input_path : pdf 문서들이 있는 hdfs 디렉토리 경로
+
+    하위 디렉토리까지 순회해서 pdf 파일 경로들을 정렬된 리스트로 return 한다.
+
+    결과 파일은 'make_output_paths'로 input_path 기준의 하위 디렉토리에 나눠서 저장한다.
+    """
+    pdf_paths = []
+    for root, _, files in hdfs_walk(fs, input_path):
+        for file in files:
+            if file.lower().endswith(".pdf"):
+                pdf_paths.append(f"{root.rstrip('/')}/{file}")
+
+    return sorted(pdf_paths)
+
+def make_output_paths(input_path, pdf_path, png_lake, json_path):
+    """
+    input_path : pdf 문서들이 있는 hdfs 디렉토리 경로
+    pdf_path : input_path 아래의 pdf 문서 경로
+    png_lake : 페이지 이미지들이 저장될 directory의 경로
+    json_path : json파일이 저장될 hdfs의 json 저장소의 경로
+
+    결과 파일 이름은 pdf 파일 이름으로 정해지므로, 다른 하위 디렉토리의 같은 이름 문서가 서로 덮어쓰지 않도록
+    input_path 기준의 하위 디렉토리 구조를 png lake와 json 저장소에 그대로 만든 (png lake 경로, json 저장소 경로)를 return 한다.
+    """
+    relative_directory = os.path.relpath(os.path.dirname(pdf_path), input_path.rstrip("/") or "/")
+    if relative_directory == ".":
+        return png_lake, json_path
+
+    return os.path.join(png_lake, relative_directory), os.path.join(json_path, relative_directory)
+
+def find_duplicate_outputs(pdf_paths):
+    """
+    같은 디렉토리에서 확장자만 다른 문서('a.pdf', 'a.PDF')처럼 결과 파일 이름이 겹치는 pdf 경로들의 리스트를 return 한다.
+    """
+    outputs = {}
+    for pdf_path in pdf_paths:
+        outputs.setdefault(os.path.splitext(pdf_path)[0], []).append(pdf_path)
+
+    return [pdf_path for paths in outputs.values() if len(paths) > 1 for pdf_path in paths]
+
+def json_result_path(json_path, pdf_path, output_format="json"):
+    # 'extract_text'가 저장하는 json 경로와 같은 규칙
+    file_name = os.path.splitext(os.path.basename(pdf_path))[0]
+    if output_format == "ndjson":
+        return make_ndjson_path(json_path, file_name)
+    return os.path.join(json_path, f"{file_name}.json")
+
+def has_successful_json(fs, json_path, pdf_path, output_format="json"):
+    """
+    json 저장소에 모든 페이지가 성공한 결과 json이 이미 있으면 True를 return 한다.
+
+    'output_format'이 "ndjson"이면 '.ndjson' 결과 파일의 요약 줄 STATUS를 확인한다. (요약 줄이 없으면 처리 중에 멈춘 문서)
+    """
+    result_path = json_result_path(json_path, pdf_path, output_format)
+    if output_format == "ndjson":
+        try:
+            summary = read_ndjson_summary(fs, result_path)
+        except Exception:
+            logging.warning("invalid ndjson result : {}".format(result_path))
+            return False
+        return summary is not None and is_complete_output(summary)
+
+    if not fs.exists(result_path):
+        return False
+
+    try:
+        with fs.open(result_path) as fp:
+            return is_complete_output(json.loads(fp.read()))
+    except Exception:
+        # 깨진 json은 다시 처리
+        logging.warning("invalid json result : {}".format(result_path))
+        return False
+
+# ================================================================================================================
+class BatchManifest:
+    """
+    # 배치 진행 기록
+
+    문서 하나가 끝날 때마다 처리 결과를 jsonl 파일에 한 줄씩 추가하고 디스크에 바로 기록(fsync)한다.
+
+    배치가 중간에 죽어도 다시 실행하면 기록을 읽어서 끝난 문서는 건너뛰고 이어서 처리한다.
+    """
+    def __init__(self, path):
+        """
+        path : 진행 기록 파일 경로 (로컬 디스크)
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.records = self.load()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.fp = open(path, "a", encoding="utf-8")
+
+        # 잘린 마지막 줄 뒤에 새 기록이 붙지 않도록 줄바꿈 추가
+        if self.fp.tell() and not self.ends_with_newline():
+            self.write_line("")
+
+    def load(self):
+        """
+        문서 경로 별 마지막 기록을 dict로 return 한다. 기록 도중 죽어서 잘린 마지막 줄은 무시한다.
+        """
+        records = {}
+        if not os.path.exists(self.path):
+            return records
+
+        with open(self.path, encoding="utf-8") as fp:
+            for line in fp:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    logging.warning("skipped broken manifest line : {}".format(line.strip()))
+                    continue
+                records[record["PDF_PATH"]] = record
+
+        return records
+
+    def ends_with_newline(self):
+        with open(self.path, "rb") as fp:
+            fp.seek(-1, os.SEEK_END)
+            return fp.read(1) == b"\n"
+
+    def write_line(self, line):
+        self.fp.write(line + "\n")
+        self.fp.flush()
+        os.fsync(self.fp.fileno())
+
+    def is_finished(self, pdf_path, retry_failed=True):
+        record = self.records.get(pdf_path)
+        if record is None:
+            return False
+        if record["STATE"] == BATCH_FAILED:
+            return not retry_failed
+        return True
+
+    def write(self, record):
+        with self.lock:
+            self.records[record["PDF_PATH"]] = record
+            self.write_line(json.dumps(record, ensure_ascii=False))
+
+    def close(self):
+        with self.lock:
+            self.fp.close()
+
+# ================================================================================================================
+class BatchProgress:
+    """
+    # 배치 진행률
+
+    이번 실행에서 끝난 문서 수, 페이지 수로 처리량과 남은 문서의 예상 완료 시간(ETA)을 계산하고,
+    interval 초마다 로그로 남긴다.
+    """
+    def __init__(self, total, interval=60):
+        """
+        total : 이번 실행에서 처리할 문서 수
+        interval : 진행률 로그 간격(초)
+        """
+        self.total = total
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.start = time.perf_counter()
+        self.last_log = self.start
+        self.counts = {BATCH_DONE : 0, BATCH_FAILED : 0, BATCH_SKIPPED : 0}
+        self.page_count = 0
+
+    def record(self, state, page_count=0):
+        with self.lock:
+            self.counts[state] += 1
+            self.page_count += page_count
+
+            now = time.perf_counter()
+            if now - self.last_log < self.interval:
+                return
+            self.last_log = now
+
+        logging.info(self.format(self.snapshot()))
+
+    def snapshot(self):
+        """
+        {"TOTAL", "FINISHED", "DONE", "FAILED", "SKIPPED", "PAGES", "ELAPSED_SECONDS", "DOCS_PER_MIN", "PAGES_PER_SEC", "ETA_SECONDS"}를 return 한다.
+        """
+        with self.lock:
+            counts = dict(self.counts)
+            page_count = self.page_count
+            elapsed = time.perf_counter() - self.start
+
+        # 건너뛴 문서는 처리 시간이 거의 없으므로 처리량, ETA 계산에서 제외
+        processed = counts[BATCH_DONE] + counts[BATCH_FAILED]
+        finished = processed + counts[BATCH_SKIPPED]
+        remaining = self.total - finished
+        docs_per_sec = processed / elapsed if elapsed else 0.0
+
+        return {
+            "TOTAL" : self.total,
+            "FINISHED" : finished,
+            "DONE" : counts[BATCH_DONE],
+            "FAILED" : counts[BATCH_FAILED],
+            "SKIPPED" : counts[BATCH_SKIPPED],
+            "PAGES" : page_count,
+            "ELAPSED_SECONDS" : elapsed,
+            "DOCS_PER_MIN" : docs_per_sec * 60,
+            "PAGES_PER_SEC" : page_count / elapsed if elapsed else 0.0,
+            "ETA_SECONDS" : remaining / docs_per_sec if docs_per_sec else None
+        }
+
+    @staticmethod
+    def format(snapshot):
+        eta = snapshot["ETA_SECONDS"]
+        eta_text = time.strftime("%H:%M:%S", time.gmtime(eta)) if eta is not None else "-"
+        if eta is not None and eta >= 86400:
+            eta_text = f"{int(eta // 86400)}d {eta_text}"
+
+        return "batch progress : {}/{} (done {}, failed {}, skipped {}), {:.2f} docs/min, {:.3f} pages/sec, ETA {}".format(
+            snapshot["FINISHED"], snapshot["TOTAL"], snapshot["DONE"], snapshot["FAILED"], snapshot["SKIPPED"],
+            snapshot["DOCS_PER_MIN"], snapshot["PAGES_PER_SEC"], eta_text)
+
+# ================================================================================================================
+def process_document(pdf_path, fulltext_api, fs, json_path, manifest, progress, skip_existing=True, output_format="json"):
+    """
+    pdf_path : 처리할 pdf 문서 경로
+    fulltext_api : 문서 하나를 처리하는 함수 (pdf_path를 받아서 output dict를 return)
+    fs : 결과 json 확인에 사용할 hdfs client
+    json_path : 문서의 결과 json이 저장될 json 저장소 경로 (make_output_paths)
+    manifest : BatchManifest 객체
+    progress : BatchProgress 객체
+    skip_existing : 성공한 결과 json이 이미 있으면 처리하지 않고 건너뛸지 여부
+    output_format : 결과 저장 형식 ("json", "ndjson")
+
+    문서 하나를 처리하고 진행 기록에 결과를 남긴다.
+    """
+    start = time.perf_counter()
+    record = {"PDF_PATH" : pdf_path, "STATE" : BATCH_SKIPPED, "STATUS" : "200", "STATUS_RESULT" : "", "PAGE_COUNT" : 0}
+
+    try:
+        if skip_existing and has_successful_json(fs, json_path, pdf_path, output_format):
+            record["STATUS_RESULT"] = "이미 처리된 문서"
+        else:
+            output = fulltext_api(pdf_path)
+            # 일부 페이지만 처리된 결과값은 실패로 기록해서 다음 실행에서 다시 처리
+            record["STATE"] = BATCH_DONE if is_complete_output(output) else BATCH_FAILED
+            record["STATUS"] = output.get("STATUS", "")
+            record["STATUS_RESULT"] = output.get("STATUS_RESULT", "")
+            # ndjson 형식의 결과값에는 PAGES가 없으므로 PAGE_COUNT 사용
+            record["PAGE_COUNT"] = len(output["PAGES"]) if "PAGES" in output else int(output.get("PAGE_COUNT") or 0)
+
+    except Exception:
+        # 에러 발생 시 에러 정보 추출
+        error = extract_error_status({"STATUS" : "", "STATUS_RESULT" : ""})
+        record.update(STATE=BATCH_FAILED, STATUS=error["STATUS"], STATUS_RESULT=error["STATUS_RESULT"])
+
+    record["SECONDS"] = time.perf_counter() - start
+    record["FINISHED_AT"] = time.time()
+
+    manifest.write(record)
+    progress.record(record["STATE"], record["PAGE_COUNT"])
+
+    if record["STATE"] == BATCH_FAILED:
+        logging.warning("batch document failed : {} ({})".format(pdf_path, record["STATUS_RESULT"]))
+
+    return record
+
+# ================================================================================================================
+def run_batch(input_path, png_lake, tesseract, easyocr, json_path, hdfs_hosts="hdfs.kdap.svc.cluster.local:9870", config=None, skip_existing=True, retry_failed=True):
+    """
+    # 배치 Full Text 실행
+
+    input_path : pdf 문서들이 있는 hdfs 디렉토리 경로 (하위 디렉토리 포함)
+    png_lake : 페이지 이미지들이 저장될 directory의 경로
+    tesseract : pytesseract model
+    easyocr : easyocr model
+    json_path : json파일이 저장될 hdfs의 json 저장소의 경로
+    hdfs_hosts : WebHDFS 주소 ('hdfs_backend'가 local이면 사용하지 않음)
+    config : 기본 설정값을 덮어쓸 설정값 dict (config.py 참고)
+    skip_existing : 성공한 결과 json이 이미 있는 문서를 건너뛸지 여부
+    retry_failed : 진행 기록에 실패로 남은 문서를 다시 처리할지 여부
+
+    'batch_workers' 개의 worker로 문서들을 동시에 처리하고, 처리 결과를 'batch_manifest_path'에 기록한다.
+
+    결과 json과 페이지 이미지는 input_path 기준의 하위 디렉토리 구조대로 json_path, png_lake 아래에 저장한다.
+
+    같은 진행 기록 경로로 다시 실행하면 이미 끝난 문서는 건너뛰고 남은 문서만 처리한다.
+
+    진행률 요약 dict (BatchProgress.snapshot 형식)를 return 한다.
+    """
+    config = get_config(config)
+    fs = make_hdfs_client(hdfs_hosts, config)
+    manifest = BatchManifest(config["batch_manifest_path"])
+
+    pdf_paths = find_pdf_paths(fs, input_path)
+
+    # 결과 파일 이름이 겹치는 문서가 있으면 서로 덮어쓰므로 처리 전에 중단
+    duplicate_paths = find_duplicate_outputs(pdf_paths)
+    if duplicate_paths:
+        raise ValueError("pdf files with the same output name : {}".format(", ".join(duplicate_paths)))
+
+    pending_paths = [pdf_path for pdf_path in pdf_paths if not manifest.is_finished(pdf_path, retry_failed)]
+    logging.info("batch documents : {}, already finished : {}, pending : {}".format(len(pdf_paths), len(pdf_paths) - len(pending_paths), len(pending_paths)))
+
+    progress = BatchProgress(len(pending_paths), config["batch_progress_interval"])
+
+    def fulltext_api(pdf_path):
+        document_png_lake, document_json_path = make_output_paths(input_path, pdf_path, png_lake, json_path)
+        return execute_fulltext_api(pdf_path, document_png_lake, tesseract, easyocr, document_json_path, config=config)
+
+    # 큐가 차면 자리가 날 때까지 기다리므로 동시에 처리하는 문서 수와 메모리에 올라가는 작업 수가 제한된다
+    scheduler = JobScheduler(process_document,
+                             worker_count=config["batch_workers"],
+                             queue_size=config["batch_workers"] * 2,
+                             admission="block",
+                             block_timeout=None)
+    try:
+        for pdf_path in pending_paths:
+            _, document_json_path = make_output_paths(input_path, pdf_path, png_lake, json_path)
+            scheduler.submit(pdf_path, fulltext_api, fs, document_json_path, manifest, progress, skip_existing, config["output_format"])
+    finally:
+        scheduler.shutdown(wait=True)
+        manifest.close()
+
+    summary = progress.snapshot()
+    logging.info(BatchProgress.format(summary))
+
+    return summary
+
+# ================================================================================================================
+def main():
+    parser = argparse.ArgumentParser(description="hdfs 디렉토리의 pdf 문서들을 배치로 Full Text 처리")
+    parser.add_argument("input_path", help="pdf 문서들이 있는 hdfs 디렉토리 경로")
+    parser.add_argument("--png-lake", default="/tmp_png_lake", help="페이지 이미지들이 저장될 directory의 경로")
+    parser.add_argument("--json-path", default="/tmp_json", help="json파일이 저장될 hdfs 경로")
+    parser.add_argument("--hdfs-hosts", default="hdfs.kdap.svc.cluster.local:9870")
+    parser.add_argument("--config", default="{}", help="파이프라인 설정값 json (예 : '{\"batch_workers\": 4}')")
+    parser.add_argument("--no-skip-existing", action="store_true", help="성공한 결과 json이 있어도 다시 처리")
+    parser.add_argument("--no-retry-failed", action="store_true", help="진행 기록에 실패로 남은 문서를 다시 처리하지 않음")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    import ocr
+    import pytesseract
+
+    config = get_config(json.loads(args.config))
+    easyocr = ocr.make_inference(config)
+
+    summary = run_batch(args.input_path, args.png_lake, pytesseract, easyocr, args.json_path, args.hdfs_hosts, config,
+                        skip_existing=not args.no_skip_existing, retry_failed=not args.no_retry_failed)
+    print(BatchProgress.format(summary))
+
+if __name__ == "__main__":
+    main()
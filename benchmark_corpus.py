@@ -0,0 +1,215 @@
+import cv2
+import fitz
+import numpy as np
+
+# 벤치마크 문서 종류
+CORPUS_SEARCHABLE = "searchable"
+CORPUS_SCANNED = "scanned"
+CORPUS_ICCBASED = "iccbased"
+CORPUS_ROTATED = "rotated"
+CORPUS_DRAWING = "drawing"
+
+CORPUS_KINDS = [CORPUS_SEARCHABLE, CORPUS_SCANNED, CORPUS_ICCBASED, CORPUS_ROTATED, CORPUS_DRAWING]
+
+# 글자 모양을 만들 단어들
+WORDS = ["KEPCO", "ENGINEERING", "POWER", "PLANT", "DESIGN", "REPORT", "CABLE", "TRANSFORMER",
+         "VOLTAGE", "SECTION", "DRAWING", "REVISION", "APPROVED", "CHECKED", "SCALE", "SHEET"]
+
+# A4, A1 페이지 크기 (pt)
+A4_SIZE = (595, 842)
+A1_SIZE = (2384, 1684)
+
+# ================================================================================================================
+def make_sentence(rng, word_count):
+    return " ".join(rng.choice(WORDS) for _ in range(word_count))
+
+def make_scan_image(rng, width, height, rows, cols, text_lines):
+    """
+    width, height : 이미지 크기 (pixel)
+    rows, cols : 표의 행, 열 개수 (0이면 표를 그리지 않는다)
+    text_lines : 표 위에 쓸 글자 줄 수
+
+    흰 배경에 글자 줄과 표가 있고 스캔 잡음이 섞인 흑백 이미지를 만든다.
+    """
+    image = np.full((height, width), 255, dtype=np.uint8)
+
+    # 글자 줄
+    line_height = 48
+    for line in range(text_lines):
+        cv2.putText(image, make_sentence(rng, 6), (60, 80 + line * line_height), cv2.FONT_HERSHEY_SIMPLEX, 1.0, 0, 2)
+
+    # 표
+    if rows and cols:
+        top = 80 + text_lines * line_height
+        cell_width = (width - 120) // cols
+        cell_height = max(24, (height - top - 60) // rows)
+        for row in range(rows + 1):
+            cv2.line(image, (60, top + row * cell_height), (60 + cols * cell_width, top + row * cell_height), 0, 2)
+        for col in range(cols + 1):
+            cv2.line(image, (60 + col * cell_width, top), (60 + col * cell_width, top + rows * cell_height), 0, 2)
+        for row in range(rows):
+            for col in range(cols):
+                cv2.putText(image, rng.choice(WORDS)[:6], (66 + col * cell_width, top + row * cell_height + cell_height - 8), cv2.FONT_HERSHEY_SIMPLEX, 0.6, 0, 1)
+
+    # 스캔 잡음
+    noise = rng.integers(0, 30, size=image.shape, dtype=np.uint8)
+    return cv2.subtract(image, noise)
+
+def make_text_sample(rng, width=1200, line_count=4):
+    """
+    width : 이미지 너비 (pixel)
+    line_count : 글자 줄 수
+
+    OCR 정확도 측정용으로 스캔 잡음이 섞인 글자 줄 이미지와 정답 텍스트를 만들어서 (이미지, 정답 텍스트)를 return 한다.
+    """
+    line_height = 48
+    image = np.full((80 + line_count * line_height, width), 255, dtype=np.uint8)
+
+    lines = []
+    for line in range(line_count):
+        sentence = make_sentence(rng, 5)
+        cv2.putText(image, sentence, (40, 60 + line * line_height), cv2.FONT_HERSHEY_SIMPLEX, 1.0, 0, 2)
+        lines.append(sentence)
+
+    noise = rng.integers(0, 30, size=image.shape, dtype=np.uint8)
+    return cv2.subtract(image, noise), " ".join(lines)
+
+def insert_gray_image(doc, page, image):
+    """
+    흑백 이미지를 페이지 전체에 넣고 색 공간을 DeviceGray로 지정한다. (스캔 문서와 같은 형태)
+    """
+    ok, png = cv2.imencode(".png", image)
+    xref = page.insert_image(page.rect, stream=png.tobytes(), keep_proportion=False)
+    doc.xref_set_key(xref, "ColorSpace", "/DeviceGray")
+
+# ================================================================================================================
+def make_searchable_pdf(rng, page_count):
+    """
+    텍스트만 있는 Readable 문서
+    """
+    doc = fitz.open()
+    for _ in range(page_count):
+        page = doc.new_page(width=A4_SIZE[0], height=A4_SIZE[1])
+        for line in range(40):
+            page.insert_text((50, 60 + line * 18), make_sentence(rng, 8), fontsize=10)
+
+    return doc
+
+def make_scanned_pdf(rng, page_count, dpi=200):
+    """
+    페이지 전체가 DeviceGray 스캔 이미지인 문서
+    """
+    doc = fitz.open()
+    width, height = int(A4_SIZE[0] * dpi / 72), int(A4_SIZE[1] * dpi / 72)
+
+    for _ in range(page_count):
+        page = doc.new_page(width=A4_SIZE[0], height=A4_SIZE[1])
+        insert_gray_image(doc, page, make_scan_image(rng, width, height, 12, 4, 10))
+
+    return doc
+
+def make_iccbased_pdf(rng, page_count):
+    """
+    텍스트와 ICCBased 컬러 삽입 이미지가 있는 문서
+
+    모든 페이지에 같은 로고 이미지가 반복되고, 페이지마다 다른 표 이미지가 하나씩 들어간다.
+    """
+    doc = fitz.open()
+
+    logo = np.full((120, 480, 3), 255, dtype=np.uint8)
+    cv2.putText(logo, "KEPCO E&C", (20, 85), cv2.FONT_HERSHEY_SIMPLEX, 2.0, (40, 40, 200), 4)
+    ok, logo_png = cv2.imencode(".png", logo)
+
+    for _ in range(page_count):
+        page = doc.new_page(width=A4_SIZE[0], height=A4_SIZE[1])
+        for line in range(12):
+            page.insert_text((50, 140 + line * 18), make_sentence(rng, 8), fontsize=10)
+
+        # PyMuPDF는 컬러 png를 ICCBased 색 공간으로 넣는다
+        page.insert_image(fitz.Rect(50, 40, 290, 100), stream=logo_png.tobytes())
+
+        table = cv2.cvtColor(make_scan_image(rng, 1200, 900, 8, 4, 2), cv2.COLOR_GRAY2BGR)
+        ok, table_png = cv2.imencode(".png", table)
+        page.insert_image(fitz.Rect(50, 380, 545, 780), stream=table_png.tobytes())
+
+    return doc
+
+def make_rotated_pdf(rng, page_count, dpi=200):
+    """
+    방향 조정이 필요한 스캔 문서
+
+    짝수 페이지는 내용이 옆으로 누운 스캔 이미지, 홀수 페이지는 /Rotate 90이 지정된 스캔 이미지이다.
+    """
+    doc = fitz.open()
+    width, height = int(A4_SIZE[0] * dpi / 72), int(A4_SIZE[1] * dpi / 72)
+
+    for page_num in range(page_count):
+        page = doc.new_page(width=A4_SIZE[0], height=A4_SIZE[1])
+        if page_num % 2 == 0:
+            # 가로 방향 내용을 시계방향으로 90도 눕혀서 세로 페이지에 넣기
+            image = make_scan_image(rng, height, width, 8, 6, 8)
+            insert_gray_image(doc, page, cv2.rotate(image, cv2.ROTATE_90_CLOCKWISE))
+        else:
+            insert_gray_image(doc, page, make_scan_image(rng, width, height, 10, 4, 10))
+            page.set_rotation(90)
+
+    return doc
+
+def make_drawing_pdf(rng, page_count, dpi=150):
+    """
+    A1 크기의 촘촘한 도면 스캔 문서 (큰 이미지, 많은 선)
+    """
+    doc = fitz.open()
+    width, height = int(A1_SIZE[0] * dpi / 72), int(A1_SIZE[1] * dpi / 72)
+
+    for _ in range(page_count):
+        page = doc.new_page(width=A1_SIZE[0], height=A1_SIZE[1])
+        image = make_scan_image(rng, width, height, 60, 24, 4)
+
+        # 도면 선
+        for _ in range(400):
+            x1, x2 = rng.integers(0, width, size=2)
+            y1, y2 = rng.integers(0, height, size=2)
+            cv2.line(image, (int(x1), int(y1)), (int(x2), int(y2)), 0, 1)
+
+        insert_gray_image(doc, page, image)
+
+    return doc
+
+corpus_makers = {
+    CORPUS_SEARCHABLE : make_searchable_pdf,
+    CORPUS_SCANNED : make_scanned_pdf,
+    CORPUS_ICCBASED : make_iccbased_pdf,
+    CORPUS_ROTATED : make_rotated_pdf,
+    CORPUS_DRAWING : make_drawing_pdf,
+}
+
+# ================================================================================================================
+def make_corpus(fs, directory, kinds=None, documents_per_kind=2, pages_per_document=4, seed=0):
+    """
+    # 벤치마크 문서 생성
+
+    fs : 문서를 저장할 hdfs client
+    directory : 문서를 저장할 hdfs 디렉토리
+    kinds : 만들 문서 종류들의 리스트 (None이면 모든 종류)
+    documents_per_kind : 종류 별 문서 수
+    pages_per_document : 문서 별 페이지 수
+    seed : 난수 seed (같은 seed면 같은 문서가 만들어진다)
+
+    [{"PDF_PATH", "KIND", "PAGE_COUNT", "BYTES"}, ...]를 return 한다.
+    """
+    rng = np.random.default_rng(seed)
+    fs.mkdirs(directory)
+
+    corpus = []
+    for kind in kinds or CORPUS_KINDS:
+        for index in range(documents_per_kind):
+            doc = corpus_makers[kind](rng, pages_per_document)
+            content = doc.tobytes(garbage=3, deflate=True)
+            doc.close()
+
+            pdf_path = f"{directory.rstrip('/')}/{kind}_{str(index + 1).zfill(3)}.pdf"
+            fs.create(pdf_path, content, overwrite=True)
+            corpus.append({"PDF_PATH" : pdf_path, "KIND" : kind, "PAGE_COUNT" : pages_per_document, "BYTES" : len(content)})
+
+    return corpus
@@ -0,0 +1,79 @@
+import time
+import argparse
+import cv2
+import numpy as np
+from erase_table_line import EraseTableLine, ERASE_ENGINE_CONTOUR, ERASE_ENGINE_VECTORIZED
+
+# ================================================================================================================
+def make_table_image(width, height, rows, cols, seed=0):
+    """
+    width, height : 이미지 크기
+    rows, cols : 표의 행, 열 개수
+
+    흰 배경에 격자 표와 셀마다 짧은 글자 모양의 획이 있는 스캔 문서 형태의 BGR 이미지를 만든다.
+    """
+    rng = np.random.default_rng(seed)
+    image = np.full((height, width, 3), 255, dtype=np.uint8)
+
+    cell_width = width // cols
+    cell_height = height // rows
+
+    for row in range(rows + 1):
+        cv2.line(image, (0, row * cell_height), (width - 1, row * cell_height), (0, 0, 0), 2)
+    for col in range(cols + 1):
+        cv2.line(image, (col * cell_width, 0), (col * cell_width, height - 1), (0, 0, 0), 2)
+
+    # 셀 안에 글자 크기의 획 그리기
+    for row in range(rows):
+        for col in range(cols):
+            x = col * cell_width + 6
+            y = row * cell_height + cell_height // 2
+            for _ in range(rng.integers(2, 6)):
+                cv2.putText(image, chr(rng.integers(65, 91)), (x, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
+                x += 12
+
+    # 스캔 잡음
+    noise = rng.integers(0, 40, size=image.shape[:2], dtype=np.uint8)
+    image = cv2.subtract(image, cv2.merge([noise, noise, noise]))
+
+    return image
+
+# ================================================================================================================
+def measure(image, engine, repeat):
+    """
+    같은 이미지를 repeat 번 전처리해서 (가장 빠른 시간, 전처리 결과)를 return 한다.
+    """
+    elapsed = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = EraseTableLine(image, engine=engine).execute_all_erase_function()
+        elapsed.append(time.perf_counter() - start)
+
+    return min(elapsed), result
+
+# ================================================================================================================
+def main():
+    parser = argparse.ArgumentParser(description="EraseTableLine 구분선 검출 방식 별 속도 비교")
+    parser.add_argument("--width", type=int, default=2480)
+    parser.add_argument("--height", type=int, default=3508)
+    parser.add_argument("--rows", type=int, default=80)
+    parser.add_argument("--cols", type=int, default=12)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    color_image = make_table_image(args.width, args.height, args.rows, args.cols)
+    gray_image = cv2.cvtColor(color_image, cv2.COLOR_BGR2GRAY)
+
+    contour_time, contour_result = measure(color_image, ERASE_ENGINE_CONTOUR, args.repeat)
+    vectorized_time, vectorized_result = measure(color_image, ERASE_ENGINE_VECTORIZED, args.repeat)
+    gray_time, gray_result = measure(gray_image, ERASE_ENGINE_VECTORIZED, args.repeat)
+
+    print(f"image : {args.width}x{args.height}, table : {args.rows}x{args.cols}")
+    print(f"contour (BGR)    : {contour_time * 1000:.1f} ms")
+    print(f"vectorized (BGR) : {vectorized_time * 1000:.1f} ms (x{contour_time / vectorized_time:.2f})")
+    print(f"vectorized (gray): {gray_time * 1000:.1f} ms (x{contour_time / gray_time:.2f})")
+    print(f"same result      : {np.array_equal(contour_result, vectorized_result)}")
+    print(f"gray diff pixels : {int(np.count_nonzero(contour_result != gray_result))}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from config import get_config
+from hdfs_client import make_hdfs_client
+from metrics import get_peak_rss
+from benchmark_corpus import make_corpus, CORPUS_KINDS
+
+# 기준값과 비교할 항목 (항목 경로, 클수록 좋은지 여부)
+compared_fields = [
+    (("DOCS_PER_MIN",), True),
+    (("PAGES_PER_SEC",), True),
+    (("DOCUMENT_LATENCY", "P50"), False),
+    (("DOCUMENT_LATENCY", "P90"), False),
+    (("PEAK_RSS_BYTES",), False),
+]
+
+# ================================================================================================================
+def summarize_latencies(values):
+    """
+    values : 지연 시간(초)들의 리스트
+
+    {"COUNT", "P50", "P90", "P99", "MAX", "TOTAL"}를 return 한다.
+    """
+    if not values:
+        return {"COUNT" : 0, "P50" : 0.0, "P90" : 0.0, "P99" : 0.0, "MAX" : 0.0, "TOTAL" : 0.0}
+
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {
+        "COUNT" : len(values),
+        "P50" : float(p50),
+        "P90" : float(p90),
+        "P99" : float(p99),
+        "MAX" : float(max(values)),
+        "TOTAL" : float(sum(values))
+    }
+
+def make_report(corpus, results, wall_seconds, config_overrides):
+    """
+    corpus : 'make_corpus'가 return 한 문서 정보 리스트
+    results : 문서 별 (처리 시간, output) 리스트
+    wall_seconds : 전체 실행 시간
+    config_overrides : 벤치마크에 사용한 설정값
+
+    처리량, 문서 지연 시간, 단계 별 지연 시간 분포, peak 메모리를 정리한 보고서 dict를 return 한다.
+    """
+    page_count = sum(document["PAGE_COUNT"] for document in corpus)
+    failed = [document["PDF_PATH"] for document, (_, output) in zip(corpus, results) if output.get("STATUS") != "200"]
+
+    # 문서 별 단계 합계 시간을 모아서 단계 별 분포 계산
+    stage_latencies = {}
+    for _, output in results:
+        metrics = output.get("METRICS")
+        if not metrics:
+            continue
+        for stage, stage_metrics in metrics["STAGES"].items():
+            stage_latencies.setdefault(stage, []).append(stage_metrics["WALL_SECONDS"])
+
+    kinds = {}
+    for document, (seconds, _) in zip(corpus, results):
+        kinds.setdefault(document["KIND"], []).append(seconds)
+
+    return {
+        "CONFIG" : config_overrides,
+        "DOCUMENTS" : len(corpus),
+        "PAGES" : page_count,
+        "FAILED_DOCUMENTS" : failed,
+        "WALL_SECONDS" : wall_seconds,
+        "DOCS_PER_MIN" : len(corpus) / wall_seconds * 60 if wall_seconds else 0.0,
+        "PAGES_PER_SEC" : page_count / wall_seconds if wall_seconds else 0.0,
+        "DOCUMENT_LATENCY" : summarize_latencies([seconds for seconds, _ in results]),
+        "KIND_LATENCY" : {kind : summarize_latencies(values) for kind, values in kinds.items()},
+        "STAGE_LATENCY" : {stage : summarize_latencies(values) for stage, values in sorted(stage_latencies.items())},
+        # 벤치마크는 한 프로세스에서 실행하므로 프로세스 전체의 peak RSS
+        "PEAK_RSS_BYTES" : get_peak_rss()
+    }
+
+# ================================================================================================================
+def compare_report(report, baseline, tolerance):
+    """
+    report : 이번 실행의 보고서
+    baseline : 저장해둔 기준 보고서
+    tolerance : 허용하는 성능 저하 비율 (0.1이면 10%)
+
+    항목 별 변화율을 출력하고, 허용 범위보다 나빠진 항목들의 리스트를 return 한다.
+    """
+    regressions = []
+
+    for field_path, higher_is_better in compared_fields:
+        current, previous = report, baseline
+        for key in field_path:
+            current, previous = current[key], previous[key]
+
+        name = ".".join(field_path)
+        if not previous:
+            print(f"{name:<24} {previous:>14.3f} -> {current:>14.3f}")
+            continue
+
+        change = (current - previous) / previous
+        worse = -change if higher_is_better else change
+        mark = "REGRESSION" if worse > tolerance else ""
+        print(f"{name:<24} {previous:>14.3f} -> {current:>14.3f} ({change * 100:+.1f}%) {mark}")
+
+        if worse > tolerance:
+            regressions.append(name)
+
+    return regressions
+
+def print_report(report):
+    print(f"documents : {report['DOCUMENTS']}, pages : {report['PAGES']}, failed : {len(report['FAILED_DOCUMENTS'])}")
+    print(f"wall : {report['WALL_SECONDS']:.1f} s, docs/min : {report['DOCS_PER_MIN']:.2f}, pages/sec : {report['PAGES_PER_SEC']:.3f}")
+    print(f"peak RSS : {report['PEAK_RSS_BYTES'] / 1024 ** 2:.0f} MB")
+
+    print(f"{'latency (s)':<16} {'count':>6} {'p50':>9} {'p90':>9} {'p99':>9} {'total':>10}")
+    rows = [("document", report["DOCUMENT_LATENCY"])]
+    rows += [(f"kind:{kind}", latency) for kind, latency in report["KIND_LATENCY"].items()]
+    rows += [(f"stage:{stage}", latency) for stage, latency in report["STAGE_LATENCY"].items()]
+    for name, latency in rows:
+        print(f"{name:<16} {latency['COUNT']:>6} {latency['P50']:>9.3f} {latency['P90']:>9.3f} {latency['P99']:>9.3f} {latency['TOTAL']:>10.2f}")
+
+# ================================================================================================================
+def run_benchmark(root, kinds, documents_per_kind, pages_per_document, workers, config_overrides, seed=0):
+    """
+    # Full Text 벤치마크 실행
+
+    root : 로컬 hdfs로 사용할 디렉토리
+    kinds : 문서 종류들의 리스트
+    documents_per_kind : 종류 별 문서 수
+    pages_per_document : 문서 별 페이지 수
+    workers : 동시에 처리할 문서 수
+    config_overrides : 파이프라인 설정값 (hdfs_backend, metrics 설정은 벤치마크용으로 덮어쓴다)
+
+    운영 클러스터와 GPU 없이, 로컬 디렉토리를 hdfs로 사용하고 CPU에서 OCR 해서 'execute_fulltext_api'를 실행한다.
+    """
+    # 모델을 불러오는 모듈은 설정 확인 후에 import (easyocr, torch 로딩 시간이 길다)
+    from exe_full_text import execute_fulltext_api
+    import ocr
+    import pytesseract
+
+    config = get_config(config_overrides)
+    config.update({
+        "hdfs_backend" : "local",
+        "local_hdfs_root" : root,
+        "metrics" : True,
+        "metrics_in_output" : True,
+        "result_cache" : None,
+        "ocr_gpu" : False
+    })
+
+    fs = make_hdfs_client(None, config)
+    corpus = make_corpus(fs, "/benchmark/input", kinds, documents_per_kind, pages_per_document, seed)
+    logging.info("corpus : {} documents, {} bytes".format(len(corpus), sum(document["BYTES"] for document in corpus)))
+
+    easyocr = ocr.make_inference(config)
+
+    def run_document(document):
+        start = time.perf_counter()
+        output = execute_fulltext_api(document["PDF_PATH"], "/benchmark/png_lake", pytesseract, easyocr, "/benchmark/json", config=config)
+        return time.perf_counter() - start, output
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(run_document, corpus))
+    wall_seconds = time.perf_counter() - start
+
+    return make_report(corpus, results, wall_seconds, config_overrides)
+
+# ================================================================================================================
+def main():
+    parser = argparse.ArgumentParser(description="합성 PDF 문서로 Full Text 파이프라인 처리량 측정")
+    parser.add_argument("--root", default=None, help="로컬 hdfs로 사용할 디렉토리 (기본값 : 임시 디렉토리)")
+    parser.add_argument("--kinds", nargs="+", default=CORPUS_KINDS, choices=CORPUS_KINDS)
+    parser.add_argument("--documents", type=int, default=2, help="종류 별 문서 수")
+    parser.add_argument("--pages", type=int, default=4, help="문서 별 페이지 수")
+    parser.add_argument("--workers", type=int, default=1, help="동시에 처리할 문서 수")
+    parser.add_argument("--config", default="{}", help="파이프라인 설정값 json (예 : '{\"preprocess_processes\": 4}')")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--report", default=None, help="보고서를 저장할 json 경로")
+    parser.add_argument("--baseline", default=None, help="비교할 기준 보고서 json 경로")
+    parser.add_argument("--save-baseline", action="store_true", help="이번 보고서를 기준 보고서로 저장")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="허용하는 성능 저하 비율")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    root = args.root or tempfile.mkdtemp(prefix="fulltext_benchmark_")
+    try:
+        report = run_benchmark(root, args.kinds, args.documents, args.pages, args.workers, json.loads(args.config), args.seed)
+    finally:
+        if args.root is None:
+            shutil.rmtree(root, ignore_errors=True)
+
+    print_report(report)
+
+    if args.report:
+        with open(args.report, "w") as fp:
+            json.dump(report, fp, indent=2)
+
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, "w") as fp:
+            json.dump(report, fp, indent=2)
+        print(f"saved baseline : {args.baseline}")
+
+    elif args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as fp:
+            baseline = json.load(fp)
+        regressions = compare_report(report, baseline, args.tolerance)
+        if regressions:
+            print(f"regressions : {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
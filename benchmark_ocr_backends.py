@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import logging
+import argparse
+import numpy as np
+from PIL import Image
+from config import get_config
+from metrics import get_peak_rss
+from benchmark_corpus import make_text_sample
+
+# 비교할 OCR 실행 방식 (이름 : Inference에 넘길 설정값)
+backend_settings = {
+    "easyocr" : {"backend" : "easyocr"},
+    "onnx" : {"backend" : "onnx", "quantize" : True},
+    "onnx_fp32" : {"backend" : "onnx", "quantize" : False}
+}
+
+# ================================================================================================================
+def edit_distance(source, target):
+    """
+    두 문자열의 편집 거리(Levenshtein distance)를 return 한다.
+    """
+    previous = list(range(len(target) + 1))
+    for i, source_char in enumerate(source, 1):
+        current = [i]
+        for j, target_char in enumerate(target, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (source_char != target_char)))
+        previous = current
+
+    return previous[-1]
+
+def normalize_text(text):
+    return " ".join(text.split()).upper()
+
+def score_text(prediction, truth):
+    """
+    prediction : OCR 결과 텍스트
+    truth : 정답 텍스트
+
+    (글자 편집 거리, 정답 글자 수, 찾은 정답 단어 수, 정답 단어 수)를 return 한다. (공백, 대소문자는 정규화)
+    """
+    prediction, truth = normalize_text(prediction), normalize_text(truth)
+
+    predicted_words = prediction.split()
+    found_words = 0
+    for word in truth.split():
+        if word in predicted_words:
+            predicted_words.remove(word)
+            found_words += 1
+
+    return edit_distance(prediction, truth), len(truth), found_words, len(truth.split())
+
+# ================================================================================================================
+def load_samples(samples_dir, sample_count, seed=0):
+    """
+    samples_dir : 정답이 있는 샘플 디렉토리 ('이름.png'와 정답 텍스트 '이름.txt' 쌍, None이면 합성 샘플 사용)
+    sample_count : 합성 샘플 수
+
+    (흑백 이미지, 정답 텍스트) 리스트를 return 한다.
+    """
+    if samples_dir is None:
+        rng = np.random.default_rng(seed)
+        return [make_text_sample(rng) for _ in range(sample_count)]
+
+    samples = []
+    for file in sorted(os.listdir(samples_dir)):
+        name, ext = os.path.splitext(file)
+        truth_path = os.path.join(samples_dir, f"{name}.txt")
+        if ext.lower() != ".png" or not os.path.exists(truth_path):
+            continue
+
+        with open(truth_path, encoding="utf-8") as fp:
+            truth = fp.read()
+        samples.append((np.array(Image.open(os.path.join(samples_dir, file)).convert("L")), truth))
+
+    return samples
+
+def run_backend(name, samples, config, repeat):
+    """
+    # OCR 실행 방식 측정
+
+    name : 'backend_settings'의 실행 방식 이름
+    samples : (이미지, 정답 텍스트) 리스트
+    config : 파이프라인 설정값 (batch_size, thread 수, ONNX 모델 디렉토리)
+    repeat : 측정을 반복할 횟수 (첫 실행은 warm-up으로 측정에서 제외)
+
+    CPU에서 모델을 불러오고 샘플들을 OCR 해서 속도, 정확도, 메모리를 정리한 dict를 return 한다.
+
+    peak RSS는 프로세스 전체의 최대값이므로 실행 방식 별 값을 비교하려면 '--backends'로 하나씩 실행한다.
+    """
+    # 모델을 불러오는 모듈은 실행할 때 import (easyocr, torch 로딩 시간이 길다)
+    import ocr
+
+    start = time.perf_counter()
+    easyocr = ocr.Inference(batch_size=config["ocr_batch_size"],
+                            gpu=False,
+                            onnx_directory=config["ocr_onnx_directory"],
+                            intra_op_threads=config["ocr_intra_op_threads"],
+                            inter_op_threads=config["ocr_inter_op_threads"],
+                            **backend_settings[name])
+    load_seconds = time.perf_counter() - start
+
+    images = [image for image, _ in samples]
+    easyocr.extract_text_batch(images[:1])
+
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        outputs = easyocr.extract_text_batch(images)
+        seconds.append(time.perf_counter() - start)
+
+    distance = char_count = found_words = word_count = 0
+    failed = 0
+    for output, (_, truth) in zip(outputs, samples):
+        if output["STATUS"] != "200":
+            failed += 1
+        scores = score_text(output["TEXT"], truth)
+        distance += scores[0]
+        char_count += scores[1]
+        found_words += scores[2]
+        word_count += scores[3]
+
+    seconds_per_image = float(np.median(seconds)) / len(images)
+
+    return {
+        "LOAD_SECONDS" : load_seconds,
+        "SECONDS_PER_IMAGE" : seconds_per_image,
+        "IMAGES_PER_SEC" : 1 / seconds_per_image if seconds_per_image else 0.0,
+        "CER" : distance / char_count if char_count else 0.0,
+        "WORD_RECALL" : found_words / word_count if word_count else 0.0,
+        "FAILED_IMAGES" : failed,
+        "PEAK_RSS_BYTES" : get_peak_rss()
+    }
+
+def print_report(report):
+    print(f"samples : {report['SAMPLES']}, repeat : {report['REPEAT']}")
+    print(f"{'backend':<12} {'load (s)':>9} {'s/image':>9} {'images/s':>9} {'CER':>7} {'recall':>7} {'RSS (MB)':>9}")
+    for name, result in report["BACKENDS"].items():
+        print(f"{name:<12} {result['LOAD_SECONDS']:>9.2f} {result['SECONDS_PER_IMAGE']:>9.3f} {result['IMAGES_PER_SEC']:>9.2f} "
+              f"{result['CER']:>7.3f} {result['WORD_RECALL']:>7.3f} {result['PEAK_RSS_BYTES'] / 1024 ** 2:>9.0f}")
+
+# ================================================================================================================
+def main():
+    parser = argparse.ArgumentParser(description="CPU에서 OCR 실행 방식 별 속도와 정확도 비교")
+    parser.add_argument("--backends", nargs="+", default=list(backend_settings), choices=list(backend_settings))
+    parser.add_argument("--samples-dir", default=None, help="정답이 있는 샘플 디렉토리 ('이름.png', '이름.txt' 쌍, 기본값 : 합성 샘플)")
+    parser.add_argument("--samples", type=int, default=16, help="합성 샘플 수")
+    parser.add_argument("--repeat", type=int, default=3, help="측정 반복 횟수")
+    parser.add_argument("--config", default="{}", help="파이프라인 설정값 json (예 : '{\"ocr_intra_op_threads\": 4}')")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--report", default=None, help="보고서를 저장할 json 경로")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    config = get_config(json.loads(args.config))
+    samples = load_samples(args.samples_dir, args.samples, args.seed)
+
+    report = {
+        "CONFIG" : json.loads(args.config),
+        "SAMPLES" : len(samples),
+        "REPEAT" : args.repeat,
+        "BACKENDS" : {name : run_backend(name, samples, config, args.repeat) for name in args.backends}
+    }
+
+    print_report(report)
+
+    if args.report:
+        with open(args.report, "w") as fp:
+            json.dump(report, fp, indent=2)
+
+if __name__ == "__main__":
+    main()
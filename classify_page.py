@@ -0,0 +1,68 @@
+import re
+
+def get_page_block_info(page):
+    """
+    # 페이지 블록 정보 추출
+
+    page : fitz 모듈로 연 pdf 문서의 페이지
+
+    페이지의 블록 정보 중 텍스트 부분만 리스트로 return 한다.
+
+    이미지 블록은 '<image: DeviceGray, ...>' 와 같은 형태의 텍스트로 나온다.
+    """
+    page_block_info = []
+    for block in page.get_text_blocks():
+        page_block_info.append(block[4])
+
+    return page_block_info
+
+# ================================================================================================================
+def classify_page(page_block_info):
+    """
+    # 페이지 분류
+
+    page_block_info : 'get_page_block_info' 함수로 추출한 페이지의 블록 정보
+
+    블록 정보만으로 페이지가 Scanned 페이지인지 분류한다. (렌더링, OCR 없이 메타데이터만 사용)
+
+    1. image : DeviceGray 블록 정보가 존재하면 페이지 전체 OCR 대상
+    2. ICCBased 블록 정보가 존재하면 삽입 이미지 OCR 대상
+    3. 어떤 블록 정보도 없으면 페이지 전체 OCR 대상
+    """
+    devicegray = False
+    iccbased = False
+
+    for block in page_block_info:
+        if re.match(r"(<image: DeviceGray).+", block):
+            devicegray = True
+        if re.match(r".+(ICCBased).+", block):
+            iccbased = True
+
+    empty = not page_block_info
+
+    page_kind = {
+        "devicegray" : devicegray,
+        "iccbased" : iccbased,
+        "empty" : empty,
+        # 페이지 이미지(png)가 필요한 페이지
+        "needs_render" : devicegray or empty,
+        # 삽입 이미지가 필요한 페이지
+        "needs_inner_images" : iccbased
+    }
+
+    return page_kind
+
+# ================================================================================================================
+def classify_pages(doc):
+    """
+    # 문서의 모든 페이지 분류
+
+    doc : fitz 모듈로 연 pdf 문서
+
+    문서의 페이지 별 분류 결과를 페이지 순서대로 리스트로 return 한다.
+    """
+    page_kinds = []
+    for page in doc:
+        page_kinds.append(classify_page(get_page_block_info(page)))
+
+    return page_kinds
@@ -0,0 +1,152 @@
+"""
+# Full Text 파이프라인 설정
+
+파이프라인 각 단계에서 사용하는 설정값의 기본값을 모아둔다.
+
+함수나 클래스에 config 인자로 dict를 넘기면 해당 키만 기본값을 덮어쓴다.
+"""
+
+# 파이프라인 기본 설정값
+default_config = {
+    # 한 번에 렌더링할 페이지 수 (렌더링 메모리 사용량은 전체 페이지 수가 아닌 이 값에 비례)
+    "render_window_size" : 4,
+    # 페이지 렌더링 방식 ("pdf2image" : 고정 DPI(200) RGB 렌더링, "pymupdf" : 페이지 별 DPI로 흑백 렌더링, OCR 정확도 비교 전까지 선택 사항)
+    "render_engine" : "pdf2image",
+    # 스캔 이미지가 없는 페이지(벡터 도면 등)의 렌더링 DPI
+    "render_dpi" : 200,
+    # 페이지 별 렌더링 DPI의 하한, 상한 (스캔 이미지가 있으면 스캔 해상도보다 높게 렌더링하지 않음)
+    "render_min_dpi" : 100,
+    "render_max_dpi" : 300,
+    # 렌더링한 페이지 이미지의 최대 픽셀 수 (큰 도면은 DPI를 낮춤, 0이면 제한 없음)
+    "render_max_pixels" : 100000000,
+    # 단일 패스 파이프라인 사용 여부 (pdf 다운로드, 문서 열기를 한 번만 하고 이미지를 메모리로 전달)
+    "single_pass" : True,
+    # 단일 패스 파이프라인에서 페이지 이미지와 삽입 이미지를 png lake에도 저장할지 여부
+    "save_png" : True,
+    # png lake 저장 방식 ("directory" : 페이지 별 폴더와 파일, "packed" : 문서 하나당 패킹 파일 하나)
+    "png_storage" : "directory",
+    # inference_service의 Full Text 작업을 처리하는 worker thread 개수
+    "worker_count" : 2,
+    # 대기 중인 작업의 최대 개수
+    "job_queue_size" : 32,
+    # 작업 큐가 가득 찼을 때의 동작 ("reject" : 바로 거절, "block" : job_block_timeout 초까지 대기)
+    "job_admission" : "reject",
+    "job_block_timeout" : 30,
+    # 텍스트 추출 시 이미지를 함께 불러오고 전처리할 페이지 수
+    "ocr_window_size" : 4,
+    # EraseTableLine 전처리와 OSD를 병렬로 실행할 프로세스 수 (0이면 요청 thread에서 순차 실행)
+    "preprocess_processes" : 0,
+    # OCR recognizer에 한 번에 넣을 글자 영역(crop) 수
+    "ocr_batch_size" : 16,
+    # ICCBased 페이지에서 텍스트가 있을 만한 삽입 이미지만 OCR 할지 여부 (작은 이미지, 텍스트 레이어가 덮은 이미지, 단색에 가까운 이미지 제외, 제외한 이미지의 텍스트는 FULL_TEXT에서 빠지므로 기본값은 사용하지 않음)
+    "region_planner" : False,
+    # OCR 할 삽입 이미지의 짧은 변 최소 픽셀 수와 최소 픽셀 수
+    "region_min_side" : 32,
+    "region_min_pixels" : 4096,
+    # 텍스트 레이어의 블록이 삽입 이미지 영역을 이 비율 이상 덮으면 OCR 하지 않음
+    "region_max_text_coverage" : 0.7,
+    # OCR 할 삽입 이미지의 최소 밝기 엔트로피(bit)
+    "region_min_entropy" : 1.0,
+    # 이 픽셀 수 이상인 페이지 이미지(A1, A0 도면 등)는 겹치는 tile로 나눠서 전처리, OCR (0이면 나누지 않음)
+    "ocr_tile_min_pixels" : 20000000,
+    # tile의 한 변 길이 (OCR detector가 줄이지 않고 처리하는 크기 이하)
+    "ocr_tile_size" : 2048,
+    # 이웃한 tile끼리 겹치는 길이 (경계에서 잘린 글자가 이웃 tile에 온전히 들어가도록 긴 글자 영역보다 길게)
+    "ocr_tile_overlap" : 256,
+    # tile로 나눈 페이지를 OCR 할 때 한 번에 잘라서 전처리하고 detector에 넣을 tile 수 (tile 작업 메모리 상한)
+    "ocr_tile_batch" : 4,
+    # 결과값 캐시 저장소 (None : 사용 안 함, "local" : 로컬 디스크, "hdfs" : hdfs 디렉토리)
+    "result_cache" : None,
+    "result_cache_path" : "/tmp_json_cache",
+    # 결과값 캐시의 최대 크기 (넘으면 오래 사용하지 않은 결과값부터 삭제)
+    "result_cache_max_bytes" : 10 * 1024 ** 3,
+    # EraseTableLine 구분선 검출 방식 (vectorized, 기존 방식은 contour)
+    "erase_line_engine" : "vectorized",
+    # OSD 전에 방향을 판단할 PyMuPDF 정보 단계 (순서대로 확인, 모두 판단할 수 없으면 OSD)
+    "orientation_tiers" : ["text", "page_rotate", "image_transform"],
+    # 텍스트 라인 방향으로 판단할 때 필요한 최소 글자 수
+    "orientation_text_min_chars" : 20,
+    # OSD에 사용할 축소 흑백 이미지의 긴 변 최대 길이 (0이면 원본 크기로 OSD 하고 전처리 결과를 OCR에 재사용)
+    "osd_thumbnail_size" : 1600,
+    # 단계 별 wall time, CPU time, 읽고 쓴 byte 수, RSS 변화 측정 여부
+    "metrics" : False,
+    # 측정 결과를 output json의 'METRICS'에 기록할지 여부
+    "metrics_in_output" : True,
+    # 측정 결과를 보낼 sink (None, "jsonl", "prometheus")
+    "metrics_sink" : None,
+    # jsonl sink의 로컬 파일 경로
+    "metrics_sink_path" : "/tmp/fulltext_metrics.jsonl",
+    # hdfs 접근 방식 (webhdfs : 운영 클러스터, local : 'local_hdfs_root' 디렉토리를 hdfs처럼 사용)
+    "hdfs_backend" : "webhdfs",
+    # hdfs_backend가 local일 때 hdfs의 '/'로 사용할 로컬 디렉토리
+    "local_hdfs_root" : "/tmp/local_hdfs",
+    # WebHDFS host 별로 유지하는 keep-alive 연결의 최대 개수
+    "hdfs_pool_size" : 32,
+    # WebHDFS 요청 하나의 timeout(초)
+    "hdfs_timeout" : 20,
+    # hdfs 요청이 일시적인 장애로 실패했을 때의 최대 시도 횟수
+    "hdfs_max_tries" : 3,
+    # hdfs 첫 재시도 전 대기 시간(초) (재시도마다 두 배)
+    "hdfs_retry_backoff" : 1.0,
+    # 여러 파일을 한 번에 읽고 쓸 때 동시에 보내는 hdfs 요청 수
+    "hdfs_bulk_workers" : 8,
+    # 이 크기(byte) 이상인 pdf는 메모리로 불러오지 않고 로컬 임시 파일로 나눠서 내려받은 후 파일로 연다 (0이면 항상 메모리)
+    "pdf_spill_bytes" : 256 * 1024 * 1024,
+    # pdf 임시 파일을 저장할 로컬 디렉토리 (None이면 시스템 임시 디렉토리)
+    "pdf_spill_directory" : None,
+    # pdf를 임시 파일로 내려받을 때 한 번에 읽는 크기(byte)
+    "pdf_spill_chunk_bytes" : 8 * 1024 * 1024,
+    # easyocr 모델을 GPU에서 실행할지 여부
+    "ocr_gpu" : True,
+    # OCR 모델 실행 방식 ("easyocr" : PyTorch 모델, "onnx" : ONNX Runtime CPU 모델 - GPU가 없는 노드용)
+    "ocr_backend" : "easyocr",
+    # ONNX로 변환한 OCR 모델을 저장, 재사용할 로컬 디렉토리
+    "ocr_onnx_directory" : "~/.EasyOCR/onnx",
+    # ONNX OCR 모델의 가중치를 int8로 동적 양자화할지 여부
+    "ocr_onnx_quantize" : True,
+    # CPU에서 OCR 할 때 연산 하나에 사용할 thread 수와 독립된 연산들을 동시에 실행할 thread 수 (0이면 라이브러리 기본값)
+    "ocr_intra_op_threads" : 0,
+    "ocr_inter_op_threads" : 0,
+    # easyocr 모델 가중치 파일 디렉토리 (None이면 easyocr 기본 경로 ~/.EasyOCR/model, 이미지에 미리 넣어둔 경로를 지정)
+    "ocr_model_directory" : None,
+    # 가중치 파일이 없을 때 내려받을지 여부 (False이면 시작할 때 네트워크에 접속하지 않는다)
+    "ocr_download_enabled" : True,
+    # OCR worker 프로세스 수 (0이면 요청 thread에서 바로 OCR, 1 이상이면 모델을 한 번 불러온 후 fork한 프로세스들이 모델을 공유해서 OCR, CPU 전용)
+    "ocr_workers" : 0,
+    # OCR worker 프로세스 하나가 사용할 연산 thread 수 (worker 수 x thread 수가 CPU core 수를 넘지 않게 지정)
+    "ocr_worker_threads" : 1,
+    # OCR worker에 넘긴 이미지들의 결과를 기다리는 최대 시간(초) (넘으면 멈춘 worker를 종료시키고 새로 만든다, 비정상 종료된 worker는 바로 에러 처리)
+    "ocr_worker_timeout" : 600,
+    # 문서 간에 공유하는 이미지 OCR 결과 캐시의 최대 개수 (0이면 문서 안에서만 재사용)
+    "ocr_shared_cache_size" : 0,
+    # 페이지 결과를 체크포인트에 기록하고, 다시 처리할 때 실패했거나 기록이 없는 페이지만 처리할지 여부
+    "page_checkpoint" : True,
+    # 결과 저장 형식 ("json" : 문서 하나당 json 파일 하나, "ndjson" : 페이지가 끝날 때마다 한 줄씩 추가하고 마지막 줄에 요약을 쓰는 '.ndjson' 파일)
+    "output_format" : "json",
+    # batch_fulltext에서 동시에 처리할 문서 수
+    "batch_workers" : 2,
+    # batch_fulltext의 진행 기록(manifest) 파일 경로 (로컬 디스크)
+    "batch_manifest_path" : "/tmp/fulltext_batch_manifest.jsonl",
+    # batch_fulltext의 진행률, ETA 로그 간격(초)
+    "batch_progress_interval" : 60,
+    # 서비스 시작 시 합성 이미지로 OCR을 한 번 실행한 후 준비 완료로 보고할지 여부 (첫 요청의 지연 제거)
+    "startup_warmup" : True,
+    # 서비스 시작 시 pdf 처리 모듈(exe_full_text 등)을 미리 import 할지 여부 (False이면 첫 작업에서 import)
+    "startup_preload_pipeline" : False,
+}
+
+# ================================================================================================================
+def get_config(config=None):
+    """
+    # 설정값 병합
+
+    config : 기본값을 덮어쓸 설정값 dict (None이면 기본값 그대로 사용)
+
+    기본 설정값에 전달받은 설정값을 덮어써서 새로운 dict로 return 한다.
+    """
+    merged_config = dict(default_config)
+
+    if config:
+        merged_config.update(config)
+
+    return merged_config
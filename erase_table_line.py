@@ -1,14 +1,43 @@
 import cv2
 import numpy as np
 
+# 구분선 검출 방식
+# contour : contour 마다 Python loop로 사각형을 그리는 기존 방식
+# vectorized : 모든 contour의 사각형을 numpy로 한 번에 걸러서 한 번에 그리는 방식 (기존 방식과 결과 동일)
+ERASE_ENGINE_CONTOUR = "contour"
+ERASE_ENGINE_VECTORIZED = "vectorized"
+
 class EraseTableLine:
     """
     # 이미지 전처리
 
     # 20240207 Edit by YOUNGRAE CHO
+
+    image : opencv(BGR) 이미지 또는 흑백 이미지
+    engine : 구분선 검출 방식 (ERASE_ENGINE_VECTORIZED, ERASE_ENGINE_CONTOUR)
     """
-    def __init__(self, image):
+    def __init__(self, image, engine=ERASE_ENGINE_VECTORIZED):
         self.image = image
+        self.engine = engine
+
+    # ================================================================================================================
+    def make_threshold_image(self):
+        """
+        이미지를 흑백으로 바꾸고(이미 흑백이면 그대로 사용) 이진화해서 윤곽을 찾을 이미지를 만든다.
+        """
+        # 원본 이미지를 그레이 이미지로 변환
+        if self.image.ndim == 2:
+            imgray = self.image
+        else:
+            imgray = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
+
+        # 이미지에 적응형 임계값 처리를 적용해 이진화
+        thr = cv2.adaptiveThreshold(imgray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, 11, 2)
+        # erode를 이용해 하얀 배경 위의 까만 선을 선명하게
+        kernel = np.ones((2, 2), np.uint8)
+        thr = cv2.erode(thr, kernel, iterations = 2)
+
+        return thr
     
     # ================================================================================================================
     def detect_contour(self):
@@ -20,18 +49,11 @@ class EraseTableLine:
         찾아낸 경계를 검은색(b, g, r = 0)이미지에 흰색(b, g, r = 255)의 사각형을 그려 line만 있는 line_image를 만든다.
         """
         # 원본 이미지의 높이, 넓이
-        origin_height, origin_width, _ = self.image.shape
+        origin_height, origin_width = self.image.shape[:2]
         # 검은색 이미지 생성
         line_image = self.image*0
 
-        # 원본 이미지를 그레이 이미지로 변환
-        imgray = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
-
-        # 이미지에 적응형 임계값 처리를 적용해 이진화
-        thr = cv2.adaptiveThreshold(imgray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, 11, 2)
-        # erode를 이용해 하얀 배경 위의 까만 선을 선명하게
-        kernel = np.ones((2, 2), np.uint8)
-        thr = cv2.erode(thr, kernel, iterations = 2)
+        thr = self.make_threshold_image()
 
         min_width = 30  # Minimum contour rectangle size
         min_height = 30  # Minimum contour rectangle size
@@ -58,6 +80,48 @@ class EraseTableLine:
 
         return line_image
 
+    # ================================================================================================================
+    def detect_contour_vectorized(self):
+        """
+        'detect_contour'와 같은 조건으로 line_image를 만들되, contour 마다 사각형을 그리지 않는다.
+
+        모든 contour의 사각형과 hierarchy를 numpy 배열로 한 번에 걸러낸 뒤, 남은 사각형들을 polylines 한 번으로 그린다.
+
+        기존 조건 세 가지는 '원본 크기의 절반보다 크거나, 자식 contour가 있거나, 넓이 또는 높이가 최소 크기보다 큰 사각형'으로 합쳐진다.
+        (원본 한 변이 최소 크기의 2배보다 작은 작은 이미지에서는 절반보다 큰 사각형이 최소 크기보다 작을 수 있으므로 그대로 확인한다)
+        """
+        # 원본 이미지의 높이, 넓이
+        origin_height, origin_width = self.image.shape[:2]
+        # 검은색 이미지 생성
+        line_image = np.zeros_like(self.image)
+
+        thr = self.make_threshold_image()
+
+        min_width = 30  # Minimum contour rectangle size
+        min_height = 30  # Minimum contour rectangle size
+        contours, hierarchy = cv2.findContours(thr, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)
+
+        if len(contours) == 0:
+            return line_image
+
+        # 모든 contour의 사각형 (x, y, width, height)
+        rects = np.array([cv2.boundingRect(contour) for contour in contours], dtype=np.int32)
+        has_child = hierarchy[0, :, 2] != -1
+
+        is_large = (rects[:, 2] > origin_width * 0.5) | (rects[:, 3] > origin_height * 0.5)
+
+        selected = rects[is_large | has_child | (rects[:, 2] > min_width) | (rects[:, 3] > min_height)]
+
+        # 사각형의 네 꼭짓점 (cv2.rectangle과 같은 좌표)
+        x1, y1 = selected[:, 0], selected[:, 1]
+        x2, y2 = x1 + selected[:, 2], y1 + selected[:, 3]
+        corners = np.stack([x1, y1, x2, y1, x2, y2, x1, y2], axis=1).reshape(-1, 4, 2)
+
+        # 하얀색으로 구분선 그리기
+        cv2.polylines(line_image, list(corners), True, (255, 255, 255), 2)
+
+        return line_image
+
     # ================================================================================================================
     def morph_closing(self, line_image):
         """
@@ -75,9 +139,9 @@ class EraseTableLine:
         closing_iter = 2
 
         # 빈 공간 메우기
-        closing_line = cv2.morphologyEX(line_image, cv2.MORPH_CLOSE, kernel, iterations = closing_iter)
+        closing_line = cv2.morphologyEx(line_image, cv2.MORPH_CLOSE, kernel, iterations = closing_iter)
 
-        return closing_iter
+        return closing_line
     
     # ================================================================================================================
     def erase_line(self, closing_line):
@@ -89,7 +153,10 @@ class EraseTableLine:
         erased_line = cv2.addWeighted(self.image, 1, closing_line, 1, 0)
 
         # ocr 성능을 위한 전처리 추가
-        gray_erased_line = cv2.cvtColor(erased_line, cv2.COLOR_BGR2GRAY)
+        if erased_line.ndim == 2:
+            gray_erased_line = erased_line
+        else:
+            gray_erased_line = cv2.cvtColor(erased_line, cv2.COLOR_BGR2GRAY)
         kernel = np.ones((2, 2), np.uint8)
         erode_erased_line = cv2.erode(gray_erased_line, kernel, iterations = 1)
 
@@ -100,9 +167,12 @@ class EraseTableLine:
         """
         # 20240123 Edit by YOUNGRAE CHO
 
-        이미지 전처리 함수들을 차례대로 실행한다.
+        이미지 전처리 함수들을 차례대로 실행한다. 결과는 원본과 같은 크기의 흑백 이미지이다.
         """
-        line_image = self.detect_contour()
+        if self.engine == ERASE_ENGINE_CONTOUR:
+            line_image = self.detect_contour()
+        else:
+            line_image = self.detect_contour_vectorized()
         closing_line = self.morph_closing(line_image)
         erased_line = self.erase_line(closing_line)
 
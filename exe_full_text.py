@@ -1,8 +1,12 @@
 from full_text import *
 from pdf2png import MakePngLake
+from pipeline import DocumentPipeline
+from config import get_config
+from result_cache import get_result_cache, make_cache_key, save_cached_result
+from metrics import make_metrics
 
 # Full Text API 실행 함수
-def execute_fulltext_api(pdf_path, png_lake, tesseract, easyocr, json_path):
+def execute_fulltext_api(pdf_path, png_lake, tesseract, easyocr, json_path, config=None):
     """
     # Full Text API 실행
 
@@ -11,10 +15,48 @@ def execute_fulltext_api(pdf_path, png_lake, tesseract, easyocr, json_path):
     tesseract : pytesseract model
     easyocr : easyocr model
     json_path : json파일이 저장될 hdfs의 json 저장소의 경로
+    config : 기본 설정값을 덮어쓸 설정값 dict (config.py 참고)
+
+    'metrics'가 True이면 문서 처리의 단계 별 측정 결과를 'metrics_sink'로 보낸다.
+    """
+    config = get_config(config)
+
+    # 문서 하나의 측정 기록 (측정하지 않으면 아무것도 하지 않는 객체)
+    metrics = make_metrics(config, pdf_path)
+
+    output = run_fulltext(pdf_path, png_lake, tesseract, easyocr, json_path, config, metrics)
+    metrics.finish(output)
+
+    return output
+
+def run_fulltext(pdf_path, png_lake, tesseract, easyocr, json_path, config, metrics):
+    """
+    'execute_fulltext_api'의 실제 처리 함수. config는 기본 설정값이 합쳐진 dict, metrics는 MetricsRecorder 객체이다.
     """
+    # 단일 패스 파이프라인 : pdf를 한 번만 불러오고 이미지는 메모리로 전달
+    if config["single_pass"]:
+        pipeline = DocumentPipeline(pdf_path, png_lake, tesseract, easyocr, json_path, config=config, metrics=metrics)
+        return pipeline.execute()
+
     # pdf의 페이지 별 이미지 변환
-    make_png = MakePngLake(pdf_path, png_lake, tesseract)
-    result = make_png.execute_pdf2png_function()
+    make_png = MakePngLake(pdf_path, png_lake, tesseract, config=config, metrics=metrics)
+
+    try:
+        # 결과값 캐시 확인 (pdf 내용 hash 기준)
+        result_cache = get_result_cache(config)
+        if result_cache is not None:
+            cache_key = make_cache_key(make_png.source, config)
+            cached_output = result_cache.get(cache_key)
+
+            if cached_output is not None:
+                save_cached_result(make_png.fs, cached_output, json_path, make_png.pdf_file_name, config["output_format"])
+                return cached_output
+
+        result = make_png.execute_pdf2png_function()
+
+    finally:
+        # pdf를 로컬 임시 파일로 내려받았으면 삭제 (텍스트 추출 단계는 pdf를 따로 불러온다)
+        make_png.close_source()
 
     # 이미지 변환 성공시 결과값은 3개
     if len(result) == 3:
@@ -22,7 +64,11 @@ def execute_fulltext_api(pdf_path, png_lake, tesseract, easyocr, json_path):
         if result[2]["STATUS"] == "200":
 
             # pdf 문서의 full text 추출
-            output = extract_text(pdf_path, result[0], result[1], easyocr, json_path)
+            output = extract_text(pdf_path, result[0], result[1], easyocr, json_path, config=config, orientation_tiers=make_png.orientation_tiers, metrics=metrics)
+
+            # 성공한 결과값은 캐시에 저장
+            if result_cache is not None:
+                result_cache.put(cache_key, output)
 
             return output
         
@@ -1,29 +1,45 @@
 import os
 import json
-import pandas as pd
+import time
 import cv2
 import numpy as np
 from io import BytesIO
 from PIL import Image
 import re
-from erase_table_line import EraseTableLine
+from erase_table_line import EraseTableLine, ERASE_ENGINE_VECTORIZED
 from error_status import *
-import pyhdfs
+from classify_page import get_page_block_info, classify_page
+from packed_image import PackedImageReader, make_pack_path, make_inner_image_manifest_path, PAGE_IMAGE, INNER_IMAGE
+from config import get_config
+from preprocess_pool import get_preprocess_pool
+from ocr_memo import OcrMemo, make_image_key, get_shared_ocr_cache
+from metrics import NULL_METRICS, STAGE_HDFS_READ, STAGE_LOAD_IMAGES, STAGE_ERASE_LINE, STAGE_OCR, STAGE_JSON_WRITE, STAGE_CHECKPOINT
+from hdfs_client import make_hdfs_client, bulk_download
+from page_checkpoint import PageCheckpoint, make_checkpoint_path
+from result_cache import make_cache_key
+from ndjson_output import NdjsonOutputWriter, make_ndjson_path
+from tiled_ocr import TiledImage, make_ocr_tiling
+from region_planner import make_region_planner
+from pdf_source import load_pdf_source
 import logging
 
-def hdfs_walk(hdfs_client, hdfs_path):
+def hdfs_walk(hdfs_client, hdfs_path, listing=None):
     """
     # 20240305 Edit by YOUNGRAE CHO
 
     os.walk()와 유사한 기능을 pyhdfs로 구현한 함수
     pyhdfs의 list_status() 함수를 통해 hdfs의 디렉토리 트리를 재귀적으로 순회한다.
 
-    hdfs_client : pyhdfs의 HdfsClient 객체
+    hdfs_client : pyhdfs의 HdfsClient 객체 (HdfsStorage면 하위 디렉토리들을 동시에 조회)
     hdfs_path : 조회하려는 hdfs 디렉토리 경로
+    listing : 이미 조회한 hdfs_path의 list_status 결과 (None이면 조회)
     """
     dirs, files = [], []
 
-    for item in hdfs_client.list_status(hdfs_path):
+    if listing is None:
+        listing = hdfs_client.list_status(hdfs_path)
+
+    for item in listing:
         if item["type"] == "DIRECTORY":
             dirs.append(item["pathSuffix"])
         elif item["type"] == "FILE":
@@ -31,347 +47,870 @@ def hdfs_walk(hdfs_client, hdfs_path):
 
     yield hdfs_path, dirs, files
 
-    for dir in dirs:
-        new_path = f"{hdfs_path.rstrip('/')}/{dir}"
-        yield from hdfs_walk(hdfs_client, new_path)
+    # os.walk처럼 yield 후에 dirs에서 뺀 디렉토리는 순회하지 않는다
+    new_paths = [f"{hdfs_path.rstrip('/')}/{dir}" for dir in dirs]
+
+    # 하위 디렉토리 목록을 한 번에 동시 조회
+    if len(new_paths) > 1 and hasattr(hdfs_client, "list_status_many"):
+        listings = hdfs_client.list_status_many(new_paths)
+    else:
+        listings = [None] * len(new_paths)
+
+    for new_path, new_listing in zip(new_paths, listings):
+        yield from hdfs_walk(hdfs_client, new_path, new_listing)
 
 # ================================================================================================================
-def extract_text(pdf_path, file_name, output_directory, easyocr, json_path, hdfs_hosts="hdfs.kdap.svc.cluster.local:9870"):
+def decode_image(image_content):
     """
-    # 20240307 Edit by YOUNGRAE CHO
+    image_content : 이미지 파일의 바이너리 데이터
 
-    pdf_path : pdf문서의 경로
-    file_name : pdf 파일의 이름
-    output_directory : 해당 pdf의 변환된 png 파일들이 저장되는 디렉토리 경로
+    바이너리 이미지를 opencv(BGR) 이미지로 변환한다.
+    """
+    # 불러온 이미지를 array로 변환
+    image_bytes = np.frombuffer(image_content, dtype=np.uint8)
+
+    # 이미지를 opencv로 열기
+    return cv2.imdecode(image_bytes, cv2.IMREAD_COLOR)
+
+# ================================================================================================================
+class HdfsImageLoader:
+    """
+    # hdfs png lake 이미지 로더
+
+    MakePngLake가 hdfs에 저장한 페이지 이미지와 삽입 이미지를 불러온다.
+
+    'extract_text' 함수의 image_loader 기본값으로 사용된다.
+    """
+    def __init__(self, fs, output_directory, file_name, bulk_workers=8):
+        """
+        fs : pyhdfs의 HdfsClient 객체
+        output_directory : 해당 pdf의 변환된 png 파일들이 저장되는 디렉토리 경로
+        file_name : pdf 파일의 이름
+        bulk_workers : 페이지의 삽입 이미지들을 동시에 불러올 최대 개수
+        """
+        self.fs = fs
+        self.output_directory = output_directory
+        self.file_name = file_name
+        self.bulk_workers = bulk_workers
+        self._inner_image_references = None
+
+    @property
+    def inner_image_references(self):
+        """
+        여러 번 참조된 삽입 이미지의 참조 목록(inner_images.json)을 처음 요청할 때 한 번만 읽는다.
+
+        {페이지 번호 : [(순번, 이미 저장된 이미지 경로), ...]}를 return 한다. 참조 목록이 없으면 빈 dict.
+        """
+        if self._inner_image_references is None:
+            references = {}
+            manifest_path = make_inner_image_manifest_path(self.output_directory)
+            if self.fs.exists(manifest_path):
+                with self.fs.open(manifest_path) as fp:
+                    manifest = json.loads(fp.read())
+                for reference in manifest["references"]:
+                    references.setdefault(reference["page"], []).append((reference["index"], reference["path"]))
+            self._inner_image_references = references
+
+        return self._inner_image_references
+
+    def page_path(self, page_num):
+        return os.path.join(self.output_directory, f"page_{str(page_num + 1).zfill(4)}")
+
+    # 페이지 이미지 불러오기
+    def load_page_image(self, page_num):
+        # 변환된 png 경로
+        image_path = os.path.join(self.page_path(page_num), f"{self.file_name}-i{str(page_num + 1).zfill(4)}.png")
+
+        # png 경로를 통해 hdfs에서 이미지 불러오기
+        with self.fs.open(image_path) as byte_image:
+            image_content = byte_image.read()
+
+        return decode_image(image_content)
+
+    # 페이지의 삽입 이미지들을 순서대로 불러오기
+    def load_inner_images(self, page_num):
+        # inner image 경로
+        inner_image_dir = self.page_path(page_num) + "/inner_images"
+
+        # 다른 페이지에 저장된 같은 이미지를 가리키는 참조가 있으면 파일들과 합쳐서 페이지 안의 순번대로 불러오기
+        references = self.inner_image_references.get(page_num)
+        if references:
+            indexed_paths = list(references)
+
+            # 페이지의 모든 삽입 이미지가 참조이면 디렉토리가 없다
+            if self.fs.exists(inner_image_dir):
+                for item in self.fs.list_status(inner_image_dir):
+                    # 파일 이름 image-001.png => 순번 0
+                    if item["type"] == "FILE":
+                        idx = int(os.path.splitext(item["pathSuffix"])[0].split("-")[-1]) - 1
+                        indexed_paths.append((idx, os.path.join(inner_image_dir, item["pathSuffix"])))
+
+            for image_content in bulk_download(self.fs, [path for _, path in sorted(indexed_paths)], self.bulk_workers):
+                yield decode_image(image_content)
+            return
+
+        # hdfs의 inner image 디렉토리 순회하면서 inner image 경로 찾기
+        for root, directory, files in hdfs_walk(self.fs, inner_image_dir):
+
+            # inner image 경로 조합
+            inner_image_paths = [os.path.join(root, file) for file in files]
+
+            # inner image 경로를 통해 hdfs에서 이미지들을 동시에 불러오기
+            for image_content in bulk_download(self.fs, inner_image_paths, self.bulk_workers):
+                yield decode_image(image_content)
+
+# ================================================================================================================
+class PackedImageLoader:
+    """
+    # hdfs 패킹 파일 이미지 로더
+
+    MakePngLake가 packed 방식으로 저장한 패킹 파일에서 이미지를 하나씩 range read로 불러온다.
+
+    Searchable 문서는 이미지를 요청하지 않으므로 index는 첫 이미지 요청 시에 읽는다.
+    """
+    def __init__(self, fs, output_directory):
+        """
+        fs : pyhdfs의 HdfsClient 객체
+        output_directory : 디렉토리 방식 기준의 해당 pdf의 png 디렉토리 경로
+        """
+        self.fs = fs
+        self.pack_path = make_pack_path(output_directory)
+        self._reader = None
+
+    @property
+    def reader(self):
+        if self._reader is None:
+            self._reader = PackedImageReader(self.fs, self.pack_path)
+        return self._reader
+
+    # 페이지 이미지 불러오기
+    def load_page_image(self, page_num):
+        return decode_image(self.reader.read_image(PAGE_IMAGE, page_num))
+
+    # 페이지의 삽입 이미지들을 순서대로 불러오기
+    def load_inner_images(self, page_num):
+        for idx in range(self.reader.count_inner_images(page_num)):
+            yield decode_image(self.reader.read_image(INNER_IMAGE, page_num, idx))
+
+# ================================================================================================================
+def prepare_ocr_window(doc, page_numbers, image_loader, ocr_memo, preprocess_pool=None, erase_engine=ERASE_ENGINE_VECTORIZED, metrics=NULL_METRICS, tiling=None, region_planner=None):
+    """
+    doc : fitz 모듈로 연 pdf 문서
+    page_numbers : 함께 처리할 페이지 번호(0부터 시작)들의 리스트
+    image_loader : 페이지 이미지와 삽입 이미지를 불러오는 객체
+    ocr_memo : 이미 OCR 한 이미지의 결과를 기억하는 OcrMemo 객체
+    preprocess_pool : 전처리를 병렬로 실행할 PreprocessPool 객체 (None이면 순차 실행)
+    erase_engine : EraseTableLine 구분선 검출 방식
+    metrics : 이미지 불러오기(load_images), 전처리(erase_line) 단계를 측정할 MetricsRecorder 객체
+    tiling : 큰 페이지 이미지를 tile로 나눌 OcrTiling 객체 (None이면 나누지 않는다)
+    region_planner : ICCBased 페이지에서 OCR 할 삽입 이미지를 고르는 RegionPlanner 객체 (None이면 모든 삽입 이미지를 OCR)
+
+    window 안의 페이지들을 분류하고, OCR 대상 이미지(페이지 이미지, 삽입 이미지)를 모두 불러와서 한 번에 전처리한다.
+
+    픽셀이 같은 이미지(반복되는 로고, 도장, 표제란 등)는 한 번만 전처리하고, 이미 OCR 한 이미지는 전처리하지 않는다.
+    image_loader가 OSD 단계의 전처리 결과('pop_erased_image')를 가지고 있으면 페이지 이미지를 다시 전처리하지 않는다.
+
+    (페이지 별 분류 결과, 페이지 별 이미지 key, 이미 알고 있는 OCR 결과, OCR 할 전처리 이미지, 페이지 별 에러)를 return 한다.
+    이미지 key는 {"page" : 페이지 이미지 key 또는 None, "inner" : [삽입 이미지 key, ...]} 형태이다.
+
+    페이지를 분류하거나 이미지를 불러오다 에러가 나면 그 페이지만 {page_number : 에러 정보}에 기록하고 다음 페이지로 넘어간다.
+    전처리하다 에러가 난 이미지는 이미 알고 있는 OCR 결과에 에러 정보를 넣는다.
+
+    tiling 기준보다 큰 페이지 이미지는 여기서 전처리하지 않고 OCR 할 이미지에 TiledImage로 넣는다. (OCR 할 때 tile 묶음 단위로 전처리)
+    region_planner가 건너뛴 삽입 이미지는 이미지 key의 "skipped"에 (건너뛴 이유, 픽셀 수)로 기록한다.
+    """
+    page_kinds = {}
+    image_keys = {page_num : {"page" : None, "inner" : [], "skipped" : []} for page_num in page_numbers}
+    known_results = {}
+    pending_images = {}
+    page_errors = {}
+    # 전처리할 이미지의 key
+    erase_keys = []
+    cv_images = []
+
+    # 큰 페이지 이미지는 OCR 할 때 tile 묶음 단위로 전처리
+    def preprocess_tiles(tiles):
+        with metrics.stage(STAGE_ERASE_LINE):
+            return erase_table_lines(tiles, preprocess_pool, erase_engine)
+
+    # 이미지 key를 만들고, 처음 보는 이미지만 전처리 대상에 추가 (이미 전처리된 이미지가 있으면 그대로 사용)
+    def register_image(cv_image, erased_line_image=None):
+        image_key = make_image_key(cv_image)
+
+        if image_key in known_results or image_key in pending_images:
+            ocr_memo.deduplicated_count += 1
+            return image_key
+
+        memo_result = ocr_memo.lookup(image_key)
+        if memo_result is not None:
+            ocr_memo.deduplicated_count += 1
+            known_results[image_key] = memo_result
+        elif erased_line_image is not None:
+            pending_images[image_key] = tiling.split(erased_line_image) if tiling is not None else erased_line_image
+        else:
+            tiled_image = tiling.split(cv_image, preprocess_tiles) if tiling is not None else cv_image
+            if isinstance(tiled_image, TiledImage):
+                pending_images[image_key] = tiled_image
+            else:
+                pending_images[image_key] = None
+                erase_keys.append(image_key)
+                cv_images.append(cv_image)
+
+        return image_key
+
+    pop_erased_image = getattr(image_loader, "pop_erased_image", None)
+
+    # 메모리 로더는 이미지를 불러올 때 렌더링, 방향 조정을 하므로 render, orientation 단계가 이 단계 안에 포함된다
+    with metrics.stage(STAGE_LOAD_IMAGES, page_numbers):
+        for page_num in page_numbers:
+            try:
+                # 페이지의 블록 정보로 페이지 분류 (MakePngLake와 동일한 기준)
+                page_kind = classify_page(get_page_block_info(doc[page_num]))
+                page_kinds[page_num] = page_kind
+
+                # DeviceGray, 빈 페이지 => 페이지 이미지 불러오기
+                if page_kind["needs_render"]:
+                    cv_image = image_loader.load_page_image(page_num)
+                    erased_line_image = pop_erased_image(page_num) if pop_erased_image is not None else None
+                    image_keys[page_num]["page"] = register_image(cv_image, erased_line_image)
+
+                # ICCBased 페이지 => 삽입 이미지들을 순서대로 불러오기 (텍스트가 있을 만한 이미지만 OCR 대상에 추가)
+                if page_kind["needs_inner_images"]:
+                    skip_reasons = region_planner.plan(doc[page_num]) if region_planner is not None else []
+
+                    for idx, cv_image in enumerate(image_loader.load_inner_images(page_num)):
+                        skip_reason = skip_reasons[idx] if idx < len(skip_reasons) else None
+                        if skip_reason is None and region_planner is not None:
+                            skip_reason = region_planner.check_image(cv_image)
+
+                        if skip_reason is not None:
+                            image_keys[page_num]["skipped"].append((skip_reason, cv_image.shape[0] * cv_image.shape[1]))
+                            continue
+
+                        image_keys[page_num]["inner"].append(register_image(cv_image))
+
+            except Exception:
+                # 에러 발생 시 해당 페이지만 실패로 기록
+                page_errors[page_num] = extract_error_status({"STATUS" : "", "STATUS_RESULT" : ""})
+                logging.warning("page {} image loading failed : {}".format(page_num + 1, page_errors[page_num]["STATUS_RESULT"]))
+
+    # ======================= 이미지 전처리 =======================
+
+    # 이미지에서 표 구분선 삭제 (tile로 나눈 페이지 이미지는 OCR 할 때 전처리)
+    with metrics.stage(STAGE_ERASE_LINE, page_numbers):
+        erased_line_images = erase_table_lines(cv_images, preprocess_pool, erase_engine)
+
+    # ======================= 이미지 전처리 끝 =======================
+
+    for image_key, erased_line_image in zip(erase_keys, erased_line_images):
+        if isinstance(erased_line_image, dict):
+            # 전처리 에러는 OCR 에러와 같이 처리
+            pending_images.pop(image_key, None)
+            known_results.setdefault(image_key, erased_line_image)
+        else:
+            pending_images[image_key] = erased_line_image
+
+    return page_kinds, image_keys, known_results, pending_images, page_errors
+
+def erase_table_lines(cv_images, preprocess_pool=None, erase_engine=ERASE_ENGINE_VECTORIZED):
+    """
+    이미지들의 표 구분선을 삭제하고 입력 순서대로 결과 리스트를 return 한다. (에러가 난 이미지는 에러 정보)
+
+    pool이 있으면 여러 프로세스에서 병렬로 실행하고, 병렬 실행이 실패하면 한 장씩 다시 전처리한다.
+    """
+    if preprocess_pool is not None and len(cv_images) > 1:
+        try:
+            return preprocess_pool.erase_lines(cv_images, erase_engine)
+        except Exception:
+            # 어떤 이미지에서 에러가 났는지 알 수 있도록 한 장씩 다시 전처리
+            logging.exception("parallel erase line failed, retry one by one")
+
+    return [erase_table_line_or_error(cv_image, erase_engine) for cv_image in cv_images]
+
+def erase_table_line_or_error(cv_image, erase_engine):
+    """
+    이미지 한 장의 표 구분선을 삭제한다. 에러가 나면 에러 정보({"STATUS", "STATUS_RESULT", "TEXT"})를 return 한다.
+    """
+    try:
+        return EraseTableLine(cv_image, erase_engine).execute_all_erase_function()
+    except Exception:
+        return extract_error_status({"STATUS" : "", "STATUS_RESULT" : "", "TEXT" : ""})
+
+# ================================================================================================================
+def run_window_ocr(easyocr, pending_images, batch_size, batch_tiles=4):
+    """
     easyocr : easyocr model
-    json_path : json파일이 저장될 hdfs의 json 저장소의 경로
+    pending_images : 'prepare_ocr_window' 함수가 return 한 {이미지 key : 전처리 이미지}
+    batch_size : 한 번에 OCR 할 글자 영역 수
+    batch_tiles : tile로 나눈 이미지를 OCR 할 때 한 번에 detector에 넣을 tile 수
 
-    Scanned 페이지임을 검증 후, 모든 조건이 일치하지 않으면 Readable 페이지로 간주
-    Scanned 페이지면 OCR, Readable 페이지면 라이브러리를 통해 텍스트 추출
+    window 안의 모든 전처리 이미지(페이지 이미지, 삽입 이미지)를 한 번에 batch로 OCR 한다.
 
-    output 값은 json으로 hdfs에 저장된다.
+    결과는 {이미지 key : OCR 결과} 형태로 return 한다.
+
+    TiledImage는 batch_tiles 개씩 tile을 잘라서 전처리, OCR 하고 글자 영역 좌표로 tile 결과를 합친다.
+    다음 묶음을 만들기 전에 이전 묶음을 버리므로 페이지 크기와 관계없이 tile 작업 메모리는 한 묶음 크기이다.
     """
+    image_keys = [image_key for image_key, image in pending_images.items() if not isinstance(image, TiledImage)]
+    images = [pending_images[image_key] for image_key in image_keys]
 
-    # hdfs와의 연결을 위한 객체 설정
-    fs = pyhdfs.HdfsClient(hosts = hdfs_hosts)
-    # hdfs의 pdf 파일을 바이너리 형태로 불러오기
-    with fs.open(pdf_path) as fp:
-        content = fp.read()
+    ocr_results = dict(zip(image_keys, run_batch_ocr(easyocr, images, batch_size)))
 
-    # 결과값 형식 지정
-    output = {
-        "STATUS" : "",
-        "STATUS_RESULT" : "",
-        "PAGE_COUNT" : "",
-        "DOC_SEARCHABLE" : "",
+    for image_key, image in pending_images.items():
+        if isinstance(image, TiledImage):
+            logging.info("Start tiled OCR : {} tiles".format(len(image.plan)))
+            tile_results = []
+            for tiles in image.tile_groups(batch_tiles):
+                # 전처리 에러가 난 tile이 있으면 페이지 이미지 전체가 에러
+                errors = [tile for tile in tiles if isinstance(tile, dict)]
+                if errors:
+                    tile_results.append(errors[0])
+                    break
+
+                tile_results += run_batch_ocr(easyocr, tiles, batch_size, return_boxes=True)
+                # OCR이 끝난 tile 묶음은 다음 묶음을 만들기 전에 메모리 해제
+                del tiles
+
+            ocr_results[image_key] = image.plan.merge(tile_results)
+            image.release()
+
+    return ocr_results
+
+def run_batch_ocr(easyocr, images, batch_size, return_boxes=False):
+    """
+    이미지들을 한 번에 batch로 OCR 하고 입력 순서대로 OCR 결과 리스트를 return 한다.
+
+    return_boxes가 True이면 batch API가 있는 모델에 글자 영역 좌표('BOXES')를 함께 요청한다.
+    """
+    if not images:
+        return []
+
+    try:
+        logging.info("Start OCR : {} images".format(len(images)))
+        # OCR -> 전처리한 이미지 넣기 (batch API가 없는 모델은 한 장씩)
+        if hasattr(easyocr, "extract_text_batch"):
+            if return_boxes:
+                ocr_results = easyocr.extract_text_batch(images, batch_size=batch_size, return_boxes=True)
+            else:
+                ocr_results = easyocr.extract_text_batch(images, batch_size=batch_size)
+        else:
+            ocr_results = [easyocr.extract_text(image) for image in images]
+        logging.info("End OCR")
+
+    except Exception:
+        # OCR 에러 발생 시 모든 이미지의 텍스트 추출 실패
+        error_result = extract_error_status({"STATUS" : "", "STATUS_RESULT" : "", "TEXT" : ""})
+        ocr_results = [error_result] * len(images)
+
+    return ocr_results
+
+def count_pixels(images):
+    """
+    OCR 할 전처리 이미지들(TiledImage는 tile들)의 픽셀 수 합계를 return 한다.
+    """
+    pixels = 0
+    for image in images:
+        if isinstance(image, TiledImage):
+            pixels += image.pixels
+        elif image is not None:
+            pixels += image.shape[0] * image.shape[1]
+
+    return pixels
+
+# ================================================================================================================
+def add_ocr_text(page_ocr_result, output, page_num):
+    """
+    page_ocr_result : 이미지 한 장의 OCR 결과값
+    output : 'extract_text' 함수의 결과값
+    page_num : 이미지가 존재하는 페이지 번호(0부터 시작)
+
+    OCR 결과 텍스트를 output에 추가한다.
+
+    OCR이 실패했으면 output에 에러 정보를 반영하고 False를 return 한다.
+    """
+    # OCR 결과값의 STATUS 여부 확인
+    if page_ocr_result["STATUS"] == "200":
+
+        # OCR 성공 시 텍스트 추출 성공
+        output["STATUS"] = "200"
+        output["STATUS_RESULT"] = "성공"
+
+        # result의 문서 전체 텍스트에 추가
+        output["FULL_TEXT"] += page_ocr_result["TEXT"]
+
+        # result의 페이지 별 텍스트에 추가
+        output["PAGES"][page_num]["page_text"] += page_ocr_result["TEXT"]
+
+        return True
+
+    else:
+        # OCR 실패 시 텍스트 추출 실패
+        output["STATUS"] = page_ocr_result["STATUS"]
+        output["STATUS_RESULT"] = page_ocr_result["STATUS_RESULT"]
+
+        return False
+
+# ================================================================================================================
+def extract_page_text(page, page_num, page_kind, page_image_keys, ocr_results, rotation_tier=""):
+    """
+    page : fitz 모듈로 연 pdf 페이지
+    page_num : 페이지 번호(0부터 시작)
+    page_kind : 'classify_page' 함수의 페이지 분류 결과
+    page_image_keys : 'prepare_ocr_window' 함수가 return 한 페이지의 이미지 key
+    ocr_results : {이미지 key : OCR 결과}
+    rotation_tier : 렌더링 단계에서 회전 각도를 결정한 단계
+
+    페이지 하나의 텍스트를 추출해서 페이지 결과를 return 한다.
+    {"PAGE", "PAGE_KIND", "SCANNED_COUNT", "SKIPPED_IMAGES", "SKIPPED_PIXELS", "FULL_TEXT", "RECORD"}
+
+    RECORD는 output의 'PAGES'에 들어가는 페이지 정보이고, FULL_TEXT는 이 페이지가 문서 전체 텍스트에 추가하는 텍스트이다.
+
+    OCR이나 텍스트 추출이 실패하면 문서 처리를 멈추지 않고 RECORD의 'page_status', 'page_status_result'에 에러를 기록한다.
+    (실패한 페이지의 텍스트는 비워둔다)
+    """
+    record = {
+        "page_number" : str(page_num + 1),
+        "page_searchable" : "",
+        "page_rotation_tier" : rotation_tier,
+        "page_text" : "",
+        "page_status" : "",
+        "page_status_result" : ""
+    }
+    # 'add_ocr_text' 함수가 텍스트를 추가할 페이지 하나의 결과값
+    page_output = {"STATUS" : "", "STATUS_RESULT" : "", "FULL_TEXT" : "", "PAGES" : {page_num : record}}
+
+    # OCR 대상에서 제외한 삽입 이미지들의 (이유, 픽셀 수)
+    skipped_images = page_image_keys.get("skipped", [])
+
+    # Scanned 이미지 수 (OCR 대상에서 제외한 삽입 이미지 포함, 실패해도 같은 값)
+    scanned_count = int(page_kind["devicegray"]) + int(page_kind["empty"])
+    if page_kind["iccbased"]:
+        scanned_count += len(page_image_keys["inner"]) + len(skipped_images)
+
+    entry = {
+        "PAGE" : page_num,
+        "PAGE_KIND" : {kind : page_kind[kind] for kind in ("devicegray", "iccbased", "empty")},
+        "SCANNED_COUNT" : scanned_count,
+        "SKIPPED_IMAGES" : len(skipped_images),
+        "SKIPPED_PIXELS" : sum(pixels for _, pixels in skipped_images),
         "FULL_TEXT" : "",
-        "PAGES" : []
+        "RECORD" : record
     }
 
+    def fail():
+        record["page_status"] = page_output["STATUS"]
+        record["page_status_result"] = page_output["STATUS_RESULT"]
+        record["page_text"] = ""
+        logging.warning("page {} text extraction failed : {}".format(page_num + 1, page_output["STATUS_RESULT"]))
+        return entry
+
     try:
-        # 문서 열기
-        doc = fitz.open(stream=content)
-        # 문서의 전체 페이지 수 계산
-        page_count = doc.page_count
-        output["PAGE_COUNT"] = str(page_count)
+        # ==================================== < O C R > ====================================
+        # image : DeviceGray 블록 정보가 존재하면 Scanned 페이지로 간주 => OCR로 'page_text' 추출
+        if page_kind["devicegray"]:
+            record["page_searchable"] = "False"
 
-        # Scanned 문서 여부 확인용 (마지막까지 0이면 Searchable 문서)
-        scanned_page_count = 0
-
-        # 각 페이지 별로 텍스트 추출
-        for page_num in range(page_count):
-
-            # 페이지 선언
-            page = doc[page_num]
-
-            # 페이지의 블록 정보 추출 및 저장
-            page_block_info = []
-            for idx, block in enumerate(page.get_text_blocks()):
-                page_block_info.append(block[4])
-
-            # 페이지 정보, output의 'pages'에 추가
-            output["PAGES"].append({
-                                    "page_number" : str(page_num + 1),
-                                    "page_searchable" : "",
-                                    "page_text" : ""
-                                    })
-            
-            # Scanned page 여부 확인용 (마지막까지 0이면 Searchable 페이지)
-            scanned_page_count_per_page = 0
-
-            # ==================================== < O C R > ====================================
-            # image : DeviceGray 블록 정보 확인
-            Devicegray = False
-            for block in page_block_info:
-                if re.match(r"(<image: DeviceGray).+", block):
-                    Devicegray = True
-
-            # image : DeviceGray 블록 정보가 존재하면 Scanned 페이지로 간주 => OCR로 'page_text' 추출
-            if Devicegray:
-
-                # 해당 페이지의 searchable 여부
-                output["PAGES"][page_num]["page_searchable"] = "False"
-                # Scanned image가 하나라도 있으면 Scanned PDF
-                output["DOC_SEARCHABLE"] = "False"
-
-                # 변환된 png 경로
-                page_path = os.path.join(output_directory, f"page_{str(page_num + 1).zfill(4)}")
-                image_path = os.path.join(page_path, f"{file_name}-i{str(page_num + 1).zfill(4)}.png")
-
-                # png 경로를 통해 hdfs에서 이미지 불러오기
-                with fs.open(image_path) as byte_image:
-                    image_content = byte_image.read()
-
-                # 불러온 이미지를 array로 변환
-                image_stream = BytesIO(image_content)
-                image_bytes = np.array(bytearray(image_stream.read()), dtype=np.uint8)
-
-                # ======================= 이미지 전처리 =======================
-
-                # 이미지를 opencv로 열기
-                cv_image = cv2.imdecode(image_bytes, cv2.IMREAD_COLOR)
-
-                # 이미지에서 표 구분선 삭제
-                erased_line_image = EraseTableLine(cv_image).execute_all_erase_function()
-
-                # ======================= 이미지 전처리 끝 =======================
-
-                try:
-                    logging.info("Start OCR")
-                    # OCR -> 전처리한 이미지 넣기
-                    page_ocr_result = easyocr.extract_text(erased_line_image)
-                    logging.info("End OCR")
-
-                    # OCR 결과값의 STATUS 여부 확인
-                    if page_ocr_result["STATUS"] == "200":
-                        
-                        # OCR 성공 시 텍스트 추출 성공
-                        output["STATUS"] = "200"
-                        output["STATUS_RESULT"] = "성공"
-
-                        # result의 문서 전체 텍스트에 추가
-                        output["FULL_TEXT"] += page_ocr_result["TEXT"]
-
-                        # result의 페이지 별 텍스트에 추가
-                        output["PAGES"][page_num]["page_text"] += page_ocr_result["TEXT"]
-
-                        # Scanned page가 하나 이상 존재하는지 기록
-                        scanned_page_count += 1
-                        scanned_page_count_per_page += 1
-
-                    else:
-                        # OCR 실패 시 텍스트 추출 실패
-                        output["STATUS"] = page_ocr_result["STATUS"]
-                        output["STATUS_RESULT"] = page_ocr_result["STATUS_RESULT"]
-
-                        return output
-                    
-                except Exception:
-                    # OCR 에러 발생 시 텍스트 추출 실패
-                    output = extract_error_status(output)
-                    return output
-            else:
-                pass
+            if not add_ocr_text(ocr_results[page_image_keys["page"]], page_output, page_num):
+                return fail()
+
+        # ==================================== < O C R > ====================================
+        # ICCBased 블록 정보 있으면 Readable 텍스트는 추출 후 ICCBased 이미지들에 대해 OCR 실행
+        if page_kind["iccbased"]:
+            record["page_searchable"] = "False"
+
+            # 우선 Readable 텍스트 추출
+            page_output["FULL_TEXT"] += page.get_text()
+
+            # 페이지의 삽입 이미지들을 순서대로 OCR
+            for image_key in page_image_keys["inner"]:
+                if not add_ocr_text(ocr_results[image_key], page_output, page_num):
+                    return fail()
+
+        # ==================================== < O C R > ====================================
+        # 해당 페이지는 존재하지만 어떤 블록 정보도 나오지 않을 경우 Scanned 페이지로 간주
+        if page_kind["empty"]:
+            record["page_searchable"] = "False"
 
-            # ==================================== < O C R > ====================================
-            # 페이지 블록 정보들 중에서 ICCBased 블록 정보 유무 확인
-            Iccbased = False
-            for block in page_block_info:
-                if re.match(r".+(ICCBased).+", block):
-                    Iccbased = True
+            if not add_ocr_text(ocr_results[page_image_keys["page"]], page_output, page_num):
+                return fail()
 
-            # ICCBased 블록 정보 있으면 Readable 텍스트는 추출 후 ICCBased 이미지들에 대해 OCR 실행
-            if Iccbased:
+        # ==================================== < R e a d a b l e > ====================================
+        # 모든 Scanned 페이지 조건이 일치하지 않으면 Readable 페이지로 간주
+        elif scanned_count == 0:
+            record["page_searchable"] = "True"
+
+            text = page.get_text()
+            page_output["FULL_TEXT"] += text
+            record["page_text"] += text
+
+    except Exception:
+        # 에러 발생 시 해당 페이지만 텍스트 추출 실패
+        extract_error_status(page_output)
+        return fail()
+
+    record["page_status"] = "200"
+    record["page_status_result"] = "성공"
+    entry["FULL_TEXT"] = page_output["FULL_TEXT"]
+
+    return entry
+
+def make_failed_page_entry(page_num, page_kind, error, rotation_tier=""):
+    """
+    이미지를 불러오지 못한 페이지의 결과를 'extract_page_text'와 같은 형식으로 만든다. (분류 전에 실패했으면 page_kind는 None)
+    """
+    kinds = {kind : page_kind[kind] for kind in ("devicegray", "iccbased", "empty")} if page_kind is not None else None
+
+    return {
+        "PAGE" : page_num,
+        "PAGE_KIND" : kinds,
+        "SCANNED_COUNT" : int(kinds["devicegray"]) + int(kinds["empty"]) if kinds is not None else 0,
+        "SKIPPED_IMAGES" : 0,
+        "SKIPPED_PIXELS" : 0,
+        "FULL_TEXT" : "",
+        "RECORD" : {
+            "page_number" : str(page_num + 1),
+            "page_searchable" : "False" if kinds is not None and any(kinds.values()) else "",
+            "page_rotation_tier" : rotation_tier,
+            "page_text" : "",
+            "page_status" : error["STATUS"],
+            "page_status_result" : error["STATUS_RESULT"]
+        }
+    }
 
-                # 해당 페이지의 searchable 여부
-                output["PAGES"][page_num]["page_searchable"] = "False"
-                # Scanned image가 하나라도 있으면 Scanned PDF
-                output["DOC_SEARCHABLE"] = "False"
+def page_doc_searchable(page_kind, scanned_page_count):
+    """
+    page_kind : 페이지 결과의 PAGE_KIND (분류 전에 실패한 페이지는 None)
+    scanned_page_count : 이 페이지까지 포함한 문서의 Scanned 이미지 수
 
-                # 변환된 png 경로
-                page_path = os.path.join(output_directory, f"page_{str(page_num + 1).zfill(4)}")
-                image_path = os.path.join(page_path, f"{file_name}-i{str(page_num + 1).zfill(4)}.png")
+    페이지가 'DOC_SEARCHABLE'에 쓰는 값을 return 한다. (쓰지 않으면 None)
 
-                # 우선 Readable 텍스트 추출
-                output["FULL_TEXT"] += (page.get_text())
+    Scanned 페이지면 "False", Scanned 이미지가 아직 하나도 없는 문서의 Readable 페이지면 "True"이다.
+    """
+    if page_kind is None:
+        return None
 
-                # inner image 경로
-                inner_image_dir = page_path + "/inner_images"
+    value = None
+    if page_kind["devicegray"] or page_kind["iccbased"] or page_kind["empty"]:
+        value = "False"
+    if not page_kind["empty"] and scanned_page_count == 0:
+        value = "True"
 
-                # hdfs의 inner image 디렉토리 순회하면서 inner image 경로 찾기
-                for root, directory, files in hdfs_walk(fs, inner_image_dir):
+    return value
 
-                    # inner image 경로 조합
-                    for file in files:
-                        inner_image_path = os.path.join(root, file)
+# ================================================================================================================
+class PageResultAssembler:
+    """
+    # 페이지 결과 순서대로 모으기
 
-                        # inner image 경로를 통해 hdfs에서 이미지 불러오기
-                        with fs.open(inner_image_path) as byte_image:
-                            image_content = byte_image.read()
+    끝난 페이지 결과를 앞 페이지부터 순서대로 결과값에 추가하면서 DOC_SEARCHABLE, STATUS, FAILED_PAGES를 갱신한다.
 
-                        # 불러온 이미지를 array로 변환
-                        image_stream = BytesIO(image_content)
-                        image_bytes = np.asarray(bytearray(image_stream.read()), dtype=np.uint8)
+    ndjson_writer를 전달받으면 페이지 결과를 PAGES, FULL_TEXT 대신 NDJSON 결과 파일에 추가하고, 추가한 결과는 메모리에서 지운다.
+    """
+    def __init__(self, output, page_count, ndjson_writer=None):
+        """
+        output : 'extract_text'의 결과값 dict
+        page_count : 문서의 전체 페이지 수
+        ndjson_writer : 페이지 결과를 쓸 NdjsonOutputWriter 객체 (None이면 output에 모은다)
+        """
+        self.output = output
+        self.page_count = page_count
+        self.ndjson_writer = ndjson_writer
+        # 다음에 추가할 페이지 번호
+        self.next_page = 0
+        self.scanned_page_count = 0
+        self.full_texts = []
+        # OCR 대상에서 제외한 삽입 이미지 수와 픽셀 수 (체크포인트에서 불러온 페이지 포함)
+        self.skipped_images = 0
+        self.skipped_pixels = 0
+
+    def add_ready_pages(self, page_entries):
+        """
+        page_entries : {page_number : 'extract_page_text' 함수가 return 한 페이지 결과}
+
+        다음 페이지부터 이어지는 끝난 페이지들을 결과값에 추가한다.
+        """
+        while self.next_page < self.page_count and self.next_page in page_entries:
+            if self.ndjson_writer is not None:
+                entry = page_entries.pop(self.next_page)
+                self.ndjson_writer.add_page(entry["RECORD"], entry["FULL_TEXT"])
+            else:
+                entry = page_entries[self.next_page]
+                self.output["PAGES"].append(entry["RECORD"])
+                self.full_texts.append(entry["FULL_TEXT"])
+
+            self.add_status(entry)
+            self.next_page += 1
+
+    def add_status(self, entry):
+        record = entry["RECORD"]
+        output = self.output
+
+        # 이전 버전의 체크포인트에는 건너뛴 이미지 기록이 없다
+        self.skipped_images += entry.get("SKIPPED_IMAGES", 0)
+        self.skipped_pixels += entry.get("SKIPPED_PIXELS", 0)
+
+        # Scanned image가 하나라도 있으면 Scanned PDF, 하나도 없으면 Searchable PDF
+        self.scanned_page_count += entry["SCANNED_COUNT"]
+        doc_searchable = page_doc_searchable(entry["PAGE_KIND"], self.scanned_page_count)
+        if doc_searchable is not None:
+            output["DOC_SEARCHABLE"] = doc_searchable
+
+        if record["page_status"] != "200":
+            output["FAILED_PAGES"].append(record["page_number"])
+            # 첫 번째로 실패한 페이지의 에러를 문서의 에러로 사용
+            if len(output["FAILED_PAGES"]) == 1:
+                output["STATUS"] = record["page_status"]
+                output["STATUS_RESULT"] = "page {} : {}".format(record["page_number"], record["page_status_result"])
+
+        elif not output["FAILED_PAGES"]:
+            # 텍스트 추출 성공
+            output["STATUS"] = "200"
+            output["STATUS_RESULT"] = "성공"
+
+    def finish(self):
+        # 페이지 텍스트는 마지막에 한 번만 합친다
+        self.output["FULL_TEXT"] = "".join(self.full_texts)
+        self.full_texts = []
 
-                        # ======================= 이미지 전처리 =======================
+# ================================================================================================================
+def extract_text(pdf_path, file_name, output_directory, easyocr, json_path, hdfs_hosts="hdfs.kdap.svc.cluster.local:9870", fs=None, doc=None, image_loader=None, config=None, orientation_tiers=None, metrics=None, checkpoint=None):
+    """
+    # 20240307 Edit by YOUNGRAE CHO
 
-                        # 이미지를 opencv로 열기
-                        cv_image = cv2.imdecode(image_bytes, cv2.IMREAD_COLOR)
+    pdf_path : pdf문서의 경로
+    file_name : pdf 파일의 이름
+    output_directory : 해당 pdf의 변환된 png 파일들이 저장되는 디렉토리 경로
+    easyocr : easyocr model
+    json_path : json파일이 저장될 hdfs의 json 저장소의 경로
+    fs : 재사용할 pyhdfs의 HdfsClient 객체 (None이면 프로세스에서 공유하는 HdfsStorage 사용)
+    doc : 이미 열려있는 fitz 문서 (None이면 hdfs에서 pdf를 불러와서 연다)
+    image_loader : 페이지 이미지와 삽입 이미지를 불러오는 객체 (None이면 hdfs png lake에서 불러온다)
+    config : 기본 설정값을 덮어쓸 설정값 dict (config.py 참고)
+    orientation_tiers : 렌더링 단계에서 페이지 별로 회전 각도를 결정한 단계 {page_number : tier} (MakePngLake.orientation_tiers)
+    metrics : 단계 별 측정을 기록할 MetricsRecorder 객체 (None이면 측정하지 않는다)
+    checkpoint : 페이지 결과를 기록하고 이어서 처리할 PageCheckpoint 객체 (None이면 'page_checkpoint' 설정에 따라 만든다)
 
-                        # 이미지에서 표 구분선 삭제
-                        erased_line_image = EraseTableLine(cv_image).execute_all_erase_function()
+    Scanned 페이지임을 검증 후, 모든 조건이 일치하지 않으면 Readable 페이지로 간주
+    Scanned 페이지면 OCR, Readable 페이지면 라이브러리를 통해 텍스트 추출
 
-                        # ======================= 이미지 전처리 끝 =======================
+    페이지는 'ocr_window_size' 단위로 묶어서 이미지를 불러오고 전처리한다. ('preprocess_processes'가 1 이상이면 병렬 전처리)
+    window 안의 이미지들은 'ocr_batch_size' 단위의 batch로 한 번에 OCR 한다.
+    픽셀 수가 'ocr_tile_min_pixels' 이상인 페이지 이미지는 겹치는 tile로 나눠서 전처리, OCR 하고 결과를 합친다.
+    'region_planner'가 True이면 ICCBased 페이지의 작은 이미지, 텍스트 레이어가 덮고 있는 이미지, 단색에 가까운 이미지는 OCR 하지 않고
+    건너뛴 수를 'SKIPPED_IMAGE_COUNT'에, 이번 문서의 픽셀 당 OCR 시간으로 추정한 절약 시간(초)을 'SKIPPED_OCR_SECONDS'에 기록한다.
+    픽셀이 같은 이미지는 문서 안에서 한 번만 전처리, OCR 하고 건너뛴 수를 'DEDUPLICATED_IMAGE_COUNT'에 기록한다.
+    렌더링한 페이지는 회전 각도를 결정한 단계(text, page_rotate, image_transform, osd, osd_error)를 'page_rotation_tier'에 기록한다.
+    측정 중이고 'metrics_in_output'이 True이면 json 저장 직전까지의 측정 결과를 'METRICS'에 기록한다.
+
+    페이지 하나의 OCR, 텍스트 추출이 실패해도 문서 처리를 멈추지 않는다.
+    실패한 페이지는 'PAGES'의 'page_status', 'page_status_result'에 에러를 기록하고 'FAILED_PAGES'에 페이지 번호를 추가하며,
+    문서의 STATUS는 첫 번째로 실패한 페이지의 에러가 된다.
+    'page_checkpoint'가 True이면 끝난 페이지들을 window 단위로 체크포인트에 기록하고, 같은 문서를 다시 처리하면
+    성공한 페이지는 체크포인트의 결과를 사용하고 실패했거나 기록이 없는 페이지만 처리한다. ('RESUMED_PAGE_COUNT')
 
-                        try:
-                            logging.info("Start OCR")
-                            # OCR -> 전처리한 이미지 넣기
-                            page_ocr_result = easyocr.extract_text(erased_line_image)
-                            logging.info("End OCR")
+    output 값은 json으로 hdfs에 저장된다.
+    'output_format'이 "ndjson"이면 앞 페이지부터 순서대로 끝난 페이지들을 window 단위로 '.ndjson' 파일에 추가하고 마지막 줄에 요약을 쓴다.
+    이때 return 하는 output에는 FULL_TEXT, PAGES 대신 결과 파일 경로('OUTPUT_PATH')가 들어간다. (ndjson_output.read_ndjson_output로 기존 형식 복원)
+    """
 
-                            # OCR 결과값의 STATUS 여부 확인
-                            if page_ocr_result["STATUS"] == "200":
-                                
-                                # OCR 성공 시 텍스트 추출 성공
-                                output["STATUS"] = "200"
-                                output["STATUS_RESULT"] = "성공"
+    if metrics is None:
+        metrics = NULL_METRICS
 
-                                # result의 문서 전체 텍스트에 추가
-                                output["FULL_TEXT"] += page_ocr_result["TEXT"]
+    config = get_config(config)
 
-                                # result의 페이지 별 텍스트에 추가
-                                output["PAGES"][page_num]["page_text"] += page_ocr_result["TEXT"]
+    # hdfs와의 연결을 위한 객체 설정 (측정 중이면 읽고 쓴 byte 수를 센다)
+    if fs is None:
+        fs = make_hdfs_client(hdfs_hosts, config)
+    fs = metrics.wrap_fs(fs)
 
-                                # Scanned page가 하나 이상 존재하는지 기록
-                                scanned_page_count += 1
-                                scanned_page_count_per_page += 1
+    # 문서를 전달받지 않았을 때만 hdfs의 pdf 파일을 바이너리 형태로 불러오기
+    own_doc = doc is None
+    source = None
+    if own_doc:
+        with metrics.stage(STAGE_HDFS_READ):
+            source = load_pdf_source(fs, pdf_path, config)
 
-                            else:
-                                # OCR 실패 시 텍스트 추출 실패
-                                output["STATUS"] = page_ocr_result["STATUS"]
-                                output["STATUS_RESULT"] = page_ocr_result["STATUS_RESULT"]
+    if orientation_tiers is None:
+        orientation_tiers = {}
 
-                                return output
-                            
-                        except Exception:
-                            # OCR 에러 발생 시 텍스트 추출 실패
-                            output = extract_error_status(output)
-                            return output
-                        
-            else:
-                pass
-
-            # ==================================== < O C R > ====================================
-            # 해당 페이지는 존재하지만 어떤 블록 정보도 나오지 않을 경우 Scanned 페이지로 간주
-            if not page_block_info:
-
-                # 해당 페이지의 searchable 여부
-                output["PAGES"][page_num]["page_searchable"] = "False"
-                # Scanned image가 하나라도 있으면 Scanned PDF
-                output["DOC_SEARCHABLE"] = "False"
-
-                # 변환된 png 경로
-                page_path = os.path.join(output_directory, f"page_{str(page_num + 1).zfill(4)}")
-                image_path = os.path.join(page_path, f"{file_name}-i{str(page_num + 1).zfill(4)}.png")
-
-                # png 경로를 통해 hdfs에서 이미지 불러오기
-                with fs.open(image_path) as byte_image:
-                    image_content = byte_image.read()
-
-                # 불러온 이미지를 array로 변환
-                image_stream = BytesIO(image_content)
-                image_bytes = np.array(bytearray(image_stream.read()), dtype=np.uint8)
-
-                # ======================= 이미지 전처리 =======================
-
-                # 이미지를 opencv로 열기
-                cv_image = cv2.imdecode(image_bytes, cv2.IMREAD_COLOR)
-
-                # 이미지에서 표 구분선 삭제
-                erased_line_image = EraseTableLine(cv_image).execute_all_erase_function()
-
-                # ======================= 이미지 전처리 끝 =======================
-
-                try:
-                    logging.info("Start OCR")
-                    # OCR -> 전처리한 이미지 넣기
-                    page_ocr_result = easyocr.extract_text(erased_line_image)
-                    logging.info("End OCR")
-
-                    # OCR 결과값의 STATUS 여부 확인
-                    if page_ocr_result["STATUS"] == "200":
-                        
-                        # OCR 성공 시 텍스트 추출 성공
-                        output["STATUS"] = "200"
-                        output["STATUS_RESULT"] = "성공"
-
-                        # result의 문서 전체 텍스트에 추가
-                        output["FULL_TEXT"] += page_ocr_result["TEXT"]
-
-                        # result의 페이지 별 텍스트에 추가
-                        output["PAGES"][page_num]["page_text"] += page_ocr_result["TEXT"]
-
-                        # Scanned page가 하나 이상 존재하는지 기록
-                        scanned_page_count += 1
-                        scanned_page_count_per_page += 1
-
-                    else:
-                        # OCR 실패 시 텍스트 추출 실패
-                        output["STATUS"] = page_ocr_result["STATUS"]
-                        output["STATUS_RESULT"] = page_ocr_result["STATUS_RESULT"]
-
-                        return output
-                    
-                except Exception:
-                    # OCR 에러 발생 시 텍스트 추출 실패
-                    output = extract_error_status(output)
-                    return output
-            
-            # ==================================== < R e a d a b l e > ====================================
-            # 모든 Scanned 페이지 조건이 일치하지 않으면 Readable 페이지로 간주
-            else:
-                # Scanned image가 하나도 없으면 Searchable PDF
-                if scanned_page_count == 0:
+    # 이미지 로더를 전달받지 않았으면 hdfs png lake에서 이미지 불러오기
+    if image_loader is None:
+        if config["png_storage"] == "packed":
+            image_loader = PackedImageLoader(fs, output_directory)
+        else:
+            image_loader = HdfsImageLoader(fs, output_directory, file_name, config["hdfs_bulk_workers"])
 
-                    output["DOC_SEARCHABLE"] = "True"
+    # 전처리 프로세스 pool (설정하지 않았으면 None => 순차 전처리)
+    preprocess_pool = get_preprocess_pool(config["preprocess_processes"])
+    window_size = max(1, int(config["ocr_window_size"]))
 
-                if scanned_page_count_per_page == 0:
+    # 문서 안에서 반복되는 이미지는 한 번만 OCR (설정하면 문서 간에도 재사용)
+    ocr_memo = OcrMemo(get_shared_ocr_cache(config["ocr_shared_cache_size"]))
 
-                    # 해당 페이지의 searchable 여부
-                    output["PAGES"][page_num]["page_searchable"] = "True"
+    # 대형 도면 등 큰 페이지 이미지는 tile 단위로 전처리, OCR
+    tiling = make_ocr_tiling(config)
+    # ICCBased 페이지는 텍스트가 있을 만한 삽입 이미지만 OCR
+    region_planner = make_region_planner(config)
+    # 건너뛴 이미지의 OCR 시간을 추정하기 위한 OCR 시간과 픽셀 수
+    ocr_seconds = 0.0
+    ocr_pixels = 0
 
-                    try:
-                        # 문서 전체 텍스트 result에 추가
-                        output["FULL_TEXT"] += page.get_text()
+    # ndjson 형식이면 끝난 페이지를 바로 파일에 쓰고 메모리에 모아두지 않는다
+    ndjson_writer = NdjsonOutputWriter(fs, make_ndjson_path(json_path, file_name)) if config["output_format"] == "ndjson" else None
 
-                        # 페이지 별 텍스트 result에 추가
-                        output["PAGES"][page_num]["page_text"] += page.get_text()
+    # 결과값 형식 지정
+    output = {
+        "STATUS" : "",
+        "STATUS_RESULT" : "",
+        "PAGE_COUNT" : "",
+        "DOC_SEARCHABLE" : "",
+        "FULL_TEXT" : "",
+        "DEDUPLICATED_IMAGE_COUNT" : "",
+        "SKIPPED_IMAGE_COUNT" : "",
+        "SKIPPED_OCR_SECONDS" : "",
+        "FAILED_PAGES" : [],
+        "RESUMED_PAGE_COUNT" : "",
+        "PAGES" : []
+    }
 
-                        # 텍스트 추출 성공
-                        output["STATUS"] = "200"
-                        output["STATUS_RESULT"] = "성공"
+    try:
+        # 문서 열기
+        if own_doc:
+            doc = source.open_document()
+        # 문서의 전체 페이지 수 계산
+        page_count = doc.page_count
+        output["PAGE_COUNT"] = str(page_count)
 
-                    except Exception:
-                        # OCR 에러 발생 시 텍스트 추출 실패
-                        output = extract_error_status(output)
-                        return output
-        # 문서 닫기
-        doc.close()
+        # 페이지 체크포인트 (전달받지 않았으면 pdf 내용을 불러온 경우에만 사용)
+        if checkpoint is None and own_doc and config["page_checkpoint"]:
+            checkpoint = PageCheckpoint(fs, make_checkpoint_path(json_path, file_name), make_cache_key(source, config))
+
+        # 이전 실행에서 성공한 페이지는 다시 처리하지 않는다
+        page_entries = dict(checkpoint.load()) if checkpoint is not None else {}
+        page_entries = {page_num : entry for page_num, entry in page_entries.items() if page_num < page_count}
+        pending_pages = [page_num for page_num in range(page_count) if page_num not in page_entries]
+        output["RESUMED_PAGE_COUNT"] = str(len(page_entries))
+        if page_entries:
+            logging.info("resumed pages : {} / {}".format(len(page_entries), page_count))
+
+        # 체크포인트에 아직 쓰지 않은 페이지 결과
+        unsaved_entries = []
+
+        # 끝난 페이지들을 앞 페이지부터 순서대로 결과값에 추가
+        assembler = PageResultAssembler(output, page_count, ndjson_writer)
+
+        for window_start in range(0, len(pending_pages), window_size):
+            window_pages = pending_pages[window_start:window_start + window_size]
+
+            # window 안의 페이지 분류, 이미지 불러오기, 전처리 (이미 OCR 한 이미지는 제외)
+            page_kinds, image_keys, ocr_results, pending_images, page_errors = prepare_ocr_window(doc, window_pages, image_loader, ocr_memo, preprocess_pool, config["erase_line_engine"], metrics, tiling, region_planner)
+            # window 안의 처음 보는 이미지들을 batch로 OCR
+            ocr_pixels += count_pixels(pending_images.values())
+            ocr_start = time.perf_counter()
+            with metrics.stage(STAGE_OCR, window_pages):
+                new_ocr_results = run_window_ocr(easyocr, pending_images, config["ocr_batch_size"], config["ocr_tile_batch"])
+            ocr_seconds += time.perf_counter() - ocr_start
+            # OCR이 끝난 이미지는 메모리 해제
+            del pending_images
+
+            for image_key, page_ocr_result in new_ocr_results.items():
+                ocr_memo.remember(image_key, page_ocr_result)
+            ocr_results.update(new_ocr_results)
+
+            # 각 페이지 별로 텍스트 추출 (실패한 페이지는 에러를 기록하고 다음 페이지로 넘어간다)
+            for page_num in window_pages:
+                rotation_tier = orientation_tiers.get(page_num, "")
+
+                if page_num in page_errors:
+                    entry = make_failed_page_entry(page_num, page_kinds.get(page_num), page_errors[page_num], rotation_tier)
+                else:
+                    entry = extract_page_text(doc[page_num], page_num, page_kinds[page_num], image_keys[page_num], ocr_results, rotation_tier)
+
+                page_entries[page_num] = entry
+                unsaved_entries.append(entry)
+
+            last_window = window_start + window_size >= len(pending_pages)
+
+            # 끝난 페이지들을 체크포인트에 기록 (마지막 window는 실패한 페이지가 있을 때만 기록)
+            if checkpoint is not None and not last_window:
+                with metrics.stage(STAGE_CHECKPOINT, window_pages):
+                    checkpoint.write(unsaved_entries)
+                unsaved_entries = []
+
+            assembler.add_ready_pages(page_entries)
+
+            # ndjson 형식이면 추가한 페이지들을 바로 파일에 쓴다 (마지막 window는 요약과 함께 쓴다)
+            if ndjson_writer is not None and not last_window:
+                with metrics.stage(STAGE_JSON_WRITE, window_pages):
+                    ndjson_writer.flush()
+
+        # 처리할 페이지가 없었으면(모두 체크포인트에서 불러온 경우) 여기서 결과값에 추가
+        assembler.add_ready_pages(page_entries)
+        assembler.finish()
+
+        # 실패한 페이지가 있으면 남은 결과까지 체크포인트에 기록하고, 모두 성공했으면 체크포인트 삭제
+        if checkpoint is not None:
+            with metrics.stage(STAGE_CHECKPOINT):
+                if output["FAILED_PAGES"]:
+                    checkpoint.write(unsaved_entries)
+                    logging.warning("failed pages : {}".format(", ".join(output["FAILED_PAGES"])))
+                else:
+                    checkpoint.remove()
+
+        # 렌더링한 이미지를 함께 저장하는 로더이면 결과를 저장하기 전에 이미지 저장을 마무리 (저장 에러는 문서 처리 에러)
+        finish_images = getattr(image_loader, "finish", None)
+        if finish_images is not None and not output["FAILED_PAGES"]:
+            finish_images()
+
+        # 전처리, OCR을 건너뛴 반복 이미지 수
+        output["DEDUPLICATED_IMAGE_COUNT"] = str(ocr_memo.deduplicated_count)
+        logging.info("deduplicated images : {}".format(ocr_memo.deduplicated_count))
+
+        # OCR 대상에서 제외한 삽입 이미지 수와 절약한 OCR 시간 (이번 문서의 픽셀 당 OCR 시간으로 추정)
+        output["SKIPPED_IMAGE_COUNT"] = str(assembler.skipped_images)
+        skipped_seconds = assembler.skipped_pixels * ocr_seconds / ocr_pixels if ocr_pixels else 0.0
+        output["SKIPPED_OCR_SECONDS"] = str(round(skipped_seconds, 3))
+        logging.info("skipped inner images : {} (estimated OCR seconds saved : {:.3f})".format(assembler.skipped_images, skipped_seconds))
+
+        # 문서 닫기 (전달받은 문서는 호출한 쪽에서 닫는다)
+        if own_doc:
+            doc.close()
 
     except Exception:
+        # 앞 window의 페이지들로 기록된 "200"이 남아 있으면 매핑되지 않은 에러도 성공으로 남으므로 지우고 에러 정보를 추출
+        output["STATUS"] = ""
+        output["STATUS_RESULT"] = ""
         output = extract_error_status(output)
         return output
+
+    finally:
+        # pdf를 로컬 임시 파일로 내려받았으면 삭제
+        if source is not None:
+            source.close()
     
     logging.info("End Full Text Extracting")
 
+    # 측정 결과를 output에 기록
+    if metrics.enabled and config["metrics_in_output"]:
+        output["METRICS"] = metrics.summary()
+
+    # ndjson 형식이면 남은 페이지들과 요약 줄을 쓴다
+    if ndjson_writer is not None:
+        del output["FULL_TEXT"], output["PAGES"]
+        output["OUTPUT_PATH"] = ndjson_writer.path
+        with metrics.stage(STAGE_JSON_WRITE):
+            ndjson_writer.finish(output)
+        logging.info("Saved ndjson file in hdfs")
+
+        return output
+
     # output 값을 json 데이터화
     json_data = json.dumps(output)
     # hdfs에 저장될 json 경로 지정
     result_path = os.path.join(json_path, f"{file_name}.json")
     # hdfs에 json 저장
-    fs.create(result_path, json_data.encode(), overwrite=True)
+    with metrics.stage(STAGE_JSON_WRITE):
+        fs.create(result_path, json_data.encode(), overwrite=True)
     logging.info("Saved json file in hdfs")
 
-
-
-
+    return output
\ No newline at end of file
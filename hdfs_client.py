@@ -0,0 +1,369 @@
+import os
+import io
+import time
+import random
+import shutil
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+import pyhdfs
+
+# 일시적인 장애로 보고 다시 시도하는 예외
+retryable_exceptions = (
+    pyhdfs.HdfsNoServerException,
+    pyhdfs.HdfsRetriableException,
+    pyhdfs.HdfsStandbyException,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    ConnectionError,
+    TimeoutError
+)
+
+# 같은 요청을 다시 보내도 결과가 같아서 재시도하는 메소드 (create는 별도 처리)
+retried_methods = {"open", "mkdirs", "exists", "get_file_status", "list_status", "delete", "set_times"}
+
+# 주소, 설정 별로 한 번만 생성해서 재사용하는 hdfs client (연결 pool 공유)
+hdfs_clients = {}
+hdfs_clients_lock = threading.Lock()
+
+# ================================================================================================================
+def make_hdfs_client(hdfs_hosts, config):
+    """
+    hdfs_hosts : WebHDFS 주소
+    config : 파이프라인 설정값 dict
+
+    'hdfs_backend' 설정값에 맞는 hdfs client를 HdfsStorage로 감싸서 return 한다.
+
+    1. webhdfs : pyhdfs의 HdfsClient (운영 클러스터)
+    2. local : 'local_hdfs_root' 디렉토리를 hdfs처럼 사용하는 LocalHdfsClient (벤치마크, 로컬 테스트)
+
+    같은 주소, 같은 설정이면 프로세스 안에서 하나의 객체를 공유하므로 문서마다 연결을 새로 맺지 않는다.
+    """
+    location = config["local_hdfs_root"] if config["hdfs_backend"] == "local" else hdfs_hosts
+    client_id = (config["hdfs_backend"], str(location), config["hdfs_pool_size"], config["hdfs_timeout"],
+                 config["hdfs_max_tries"], config["hdfs_retry_backoff"], config["hdfs_bulk_workers"])
+
+    with hdfs_clients_lock:
+        if client_id not in hdfs_clients:
+            if config["hdfs_backend"] == "local":
+                client = LocalHdfsClient(config["local_hdfs_root"])
+            else:
+                # max_tries는 1로 두고 재시도는 HdfsStorage의 backoff로 한다
+                client = pyhdfs.HdfsClient(hosts=hdfs_hosts, timeout=config["hdfs_timeout"], max_tries=1, retry_delay=0,
+                                           requests_session=make_requests_session(config["hdfs_pool_size"]))
+            hdfs_clients[client_id] = HdfsStorage(client, config["hdfs_max_tries"], config["hdfs_retry_backoff"], config["hdfs_bulk_workers"])
+
+    return hdfs_clients[client_id]
+
+def make_requests_session(pool_size):
+    """
+    pool_size : host 별로 유지할 keep-alive 연결의 최대 개수
+
+    NameNode, DataNode 연결을 재사용하는 requests Session을 return 한다.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    return session
+
+# ================================================================================================================
+class HdfsStorage:
+    """
+    # 공유 hdfs 저장소
+
+    hdfs client를 감싸서 일시적인 장애(연결 실패, timeout, NameNode standby)가 나면 backoff 간격으로 다시 시도한다.
+
+    여러 파일을 한 번에 읽고 쓰는 'upload_many', 'download_many', 'mkdirs_many', 'list_status_many'를 제공하며,
+    동시에 실행하는 요청 수는 bulk_workers로 제한한다.
+
+    나머지 메소드는 감싼 client에 그대로 넘긴다.
+    """
+    def __init__(self, client, max_tries=3, retry_backoff=1.0, bulk_workers=8):
+        """
+        client : pyhdfs의 HdfsClient 또는 LocalHdfsClient 객체
+        max_tries : 요청 하나의 최대 시도 횟수
+        retry_backoff : 첫 재시도 전 대기 시간(초) (재시도마다 두 배)
+        bulk_workers : bulk 메소드에서 동시에 실행하는 요청 수
+        """
+        self.client = client
+        self.max_tries = max(1, int(max_tries))
+        self.retry_backoff = retry_backoff
+        self.bulk_workers = max(1, int(bulk_workers))
+
+    def __getattr__(self, name):
+        attribute = getattr(self.client, name)
+        if name not in retried_methods:
+            return attribute
+
+        def retried_method(path, *args, **kwargs):
+            return self.call_with_retry(name, path, lambda: attribute(path, *args, **kwargs))
+
+        return retried_method
+
+    def call_with_retry(self, name, path, request, before_retry=None):
+        """
+        name, path : 로그에 남길 메소드 이름과 경로
+        request : 요청을 보내는 함수
+        before_retry : 재시도 전에 실행할 함수 (보낼 데이터의 위치 되돌리기 등)
+        """
+        for attempt in range(1, self.max_tries + 1):
+            try:
+                return request()
+
+            except retryable_exceptions as error:
+                if attempt == self.max_tries:
+                    raise
+
+                # 여러 worker가 동시에 재시도하지 않도록 대기 시간을 조금씩 다르게
+                delay = self.retry_backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+                logging.warning("hdfs {} failed ({}/{}), retry in {:.1f}s : {} ({!r})".format(name, attempt, self.max_tries, delay, path, error))
+                time.sleep(delay)
+
+                if before_retry is not None:
+                    before_retry()
+
+    def create(self, path, data, **kwargs):
+        # 파일 객체는 처음 위치로 되돌릴 수 있을 때만 재시도
+        if isinstance(data, (bytes, bytearray)):
+            return self.call_with_retry("create", path, lambda: self.client.create(path, data, **kwargs))
+
+        if hasattr(data, "seekable") and data.seekable():
+            position = data.tell()
+            return self.call_with_retry("create", path, lambda: self.client.create(path, data, **kwargs), lambda: data.seek(position))
+
+        return self.client.create(path, data, **kwargs)
+
+    # ============================================================================================================
+    def upload_many(self, items, overwrite=True):
+        bulk_upload(self, items, self.bulk_workers, overwrite)
+
+    def download_many(self, paths):
+        return bulk_download(self, paths, self.bulk_workers)
+
+    def mkdirs_many(self, paths):
+        return bulk_call(self.mkdirs, paths, self.bulk_workers)
+
+    def list_status_many(self, paths):
+        return bulk_call(self.list_status, paths, self.bulk_workers)
+
+# ================================================================================================================
+def bulk_call(function, items, workers=8):
+    """
+    function : 항목 하나를 인자로 받는 함수
+    items : 항목들의 리스트
+    workers : 동시에 실행할 최대 개수
+
+    항목들에 function을 동시에 실행하고 결과를 항목 순서대로 return 한다. 에러가 나면 모두 끝난 뒤 첫 에러를 raise 한다.
+    """
+    items = list(items)
+    if len(items) <= 1 or workers <= 1:
+        return [function(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(items)), thread_name_prefix="hdfs-bulk") as executor:
+        futures = [executor.submit(function, item) for item in items]
+
+    return [future.result() for future in futures]
+
+def bulk_download(fs, paths, workers=8):
+    """
+    fs : hdfs client
+    paths : 읽을 파일 경로들의 리스트
+    workers : 동시에 읽을 최대 파일 수
+
+    파일들을 동시에 읽어서 바이트 데이터를 경로 순서대로 return 한다.
+    """
+    def download(path):
+        with fs.open(path) as fp:
+            return fp.read()
+
+    return bulk_call(download, paths, workers)
+
+def bulk_upload(fs, items, workers=8, overwrite=True):
+    """
+    fs : hdfs client
+    items : (경로, 바이트 데이터)들의 리스트
+    workers : 동시에 쓸 최대 파일 수
+
+    파일들을 동시에 쓴다.
+    """
+    with BulkUploader(fs, workers, overwrite) as uploader:
+        for path, data in items:
+            uploader.put(path, data)
+
+# ================================================================================================================
+class BulkUploader:
+    """
+    # 동시 업로드
+
+    'put'으로 넘긴 파일들을 worker thread들이 동시에 hdfs에 쓴다.
+
+    아직 쓰지 않은 파일은 workers * 2개까지만 메모리에 두고, 넘으면 'put'이 자리가 날 때까지 기다린다.
+
+    'close'는 모든 파일이 써질 때까지 기다린 뒤, 실패한 파일이 있으면 첫 에러를 raise 한다.
+    """
+    def __init__(self, fs, workers=8, overwrite=True):
+        """
+        fs : hdfs client
+        workers : 동시에 쓸 최대 파일 수
+        overwrite : 같은 경로의 파일을 덮어쓸지 여부
+        """
+        self.fs = fs
+        self.overwrite = overwrite
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="hdfs-upload")
+        self.slots = threading.BoundedSemaphore(max(1, workers) * 2)
+        self.futures = []
+
+    def put(self, path, data):
+        self.slots.acquire()
+        try:
+            future = self.executor.submit(self.fs.create, path, data, overwrite=self.overwrite)
+        except Exception:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        self.futures.append(future)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        futures, self.futures = self.futures, []
+        for future in futures:
+            future.result()
+
+    def abort(self):
+        # 남은 파일은 쓰지 않고, 쓰는 중인 파일만 기다린 뒤 에러는 무시한다
+        for future in self.futures:
+            future.cancel()
+        self.executor.shutdown(wait=True)
+        self.futures = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # 다른 에러로 빠져나가는 중이면 쓰기 에러로 덮어쓰지 않는다
+        if exc_type is not None:
+            self.abort()
+            return False
+        self.close()
+
+# ================================================================================================================
+class LocalHdfsClient:
+    """
+    # 로컬 파일시스템 hdfs client
+
+    로컬 디렉토리를 hdfs처럼 사용한다. 파이프라인이 사용하는 pyhdfs HdfsClient의 메소드만 같은 형태로 구현한다.
+
+    hdfs 경로 '/a/b'는 'root/a/b'에 저장되며, 상태 정보는 pyhdfs의 FileStatus 객체로 return 한다.
+    """
+    def __init__(self, root):
+        """
+        root : hdfs의 '/'로 사용할 로컬 디렉토리 경로
+        """
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def local_path(self, path):
+        return os.path.join(self.root, path.lstrip("/"))
+
+    def check_exists(self, path):
+        if not os.path.exists(self.local_path(path)):
+            raise pyhdfs.HdfsFileNotFoundException(f"File does not exist: {path}", "FileNotFoundException", 404)
+
+    def make_file_status(self, local_path, path_suffix=""):
+        stat = os.stat(local_path)
+        is_directory = os.path.isdir(local_path)
+
+        return pyhdfs.FileStatus(
+            pathSuffix=path_suffix,
+            type="DIRECTORY" if is_directory else "FILE",
+            length=0 if is_directory else stat.st_size,
+            modificationTime=int(stat.st_mtime * 1000),
+            accessTime=int(stat.st_atime * 1000)
+        )
+
+    # 파일 읽기 (offset, length로 일부만 읽기 가능)
+    def open(self, path, offset=0, length=None, **kwargs):
+        self.check_exists(path)
+
+        with open(self.local_path(path), "rb") as fp:
+            fp.seek(offset)
+            data = fp.read() if length is None else fp.read(length)
+
+        return io.BytesIO(data)
+
+    # 파일 쓰기 (data는 bytes 또는 파일 객체)
+    def create(self, path, data, overwrite=False, **kwargs):
+        local_path = self.local_path(path)
+
+        if os.path.exists(local_path) and not overwrite:
+            raise pyhdfs.HdfsFileAlreadyExistsException(f"{path} already exists", "FileAlreadyExistsException", 403)
+
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        self.write(local_path, data, "wb")
+
+    # 파일 끝에 이어 쓰기
+    def append(self, path, data, **kwargs):
+        self.check_exists(path)
+        self.write(self.local_path(path), data, "ab")
+
+    def write(self, local_path, data, mode):
+        with open(local_path, mode) as fp:
+            if isinstance(data, (bytes, bytearray)):
+                fp.write(data)
+            else:
+                shutil.copyfileobj(data, fp)
+
+    def mkdirs(self, path, **kwargs):
+        os.makedirs(self.local_path(path), exist_ok=True)
+        return True
+
+    def exists(self, path, **kwargs):
+        return os.path.exists(self.local_path(path))
+
+    def delete(self, path, recursive=False, **kwargs):
+        local_path = self.local_path(path)
+
+        if not os.path.exists(local_path):
+            return False
+
+        if os.path.isdir(local_path):
+            if recursive:
+                shutil.rmtree(local_path)
+            else:
+                os.rmdir(local_path)
+        else:
+            os.remove(local_path)
+
+        return True
+
+    def rename(self, path, destination, **kwargs):
+        self.check_exists(path)
+        os.makedirs(os.path.dirname(self.local_path(destination)), exist_ok=True)
+        os.replace(self.local_path(path), self.local_path(destination))
+        return True
+
+    def get_file_status(self, path, **kwargs):
+        self.check_exists(path)
+        return self.make_file_status(self.local_path(path))
+
+    def list_status(self, path, **kwargs):
+        self.check_exists(path)
+        local_path = self.local_path(path)
+
+        # 파일 경로를 조회하면 hdfs처럼 파일 자신의 상태만 return
+        if not os.path.isdir(local_path):
+            return [self.make_file_status(local_path)]
+
+        return [self.make_file_status(os.path.join(local_path, name), name) for name in sorted(os.listdir(local_path))]
+
+    def set_times(self, path, modificationtime=None, accesstime=None, **kwargs):
+        self.check_exists(path)
+        stat = os.stat(self.local_path(path))
+
+        access_time = accesstime / 1000 if accesstime is not None else stat.st_atime
+        modification_time = modificationtime / 1000 if modificationtime is not None else stat.st_mtime
+        os.utime(self.local_path(path), (access_time, modification_time))
@@ -1,28 +1,81 @@
+import time
+# 서비스 모듈 import 시간 측정 시작
+service_import_start = time.perf_counter()
 import logging
 import os
 import t3qai_client as tc
 from t3qai_client import T3QAI_MODULE_PATH, T3QAI_INIT_MODEL_PATH
-from exe_full_text import *
-import ocr
-import pytesseract
-import threading
+from job_scheduler import JobScheduler, JOB_REJECTED
+from config import get_config
+from metrics import get_metrics_sink, PrometheusMetricsSink
+from startup import StartupTimer, warm_up_ocr, execute_fulltext_job, log_startup_report
+from startup import STARTUP_IMPORT_SERVICE, STARTUP_IMPORT_OCR, STARTUP_MODEL_LOAD, STARTUP_WARMUP, STARTUP_IMPORT_PIPELINE, STARTUP_SCHEDULER
 
 logger = logging.getLogger()
 logger.setLevel('INFO')
 
+service_import_seconds = time.perf_counter() - service_import_start
+
 def init_model():
-    easyocr = ocr.Inference()
+    """
+    무거운 모듈은 필요한 단계에서 import 한다.
+    1. ocr(easyocr, torch)는 모델을 불러올 때 import
+    2. pdf 처리 모듈(exe_full_text 등)은 'startup_preload_pipeline'이 False이면 첫 작업에서 import
+    3. 'startup_warmup'이 True이면 합성 이미지로 OCR을 한 번 실행한 후 return (준비 완료)
+
+    단계 별 시작 시간은 로그와 'startup' 항목에 남기고, prometheus sink이면 gauge로 내보낸다.
+    """
+    timer = StartupTimer(service_import_start)
+    timer.add(STARTUP_IMPORT_SERVICE, service_import_seconds)
+
+    config = get_config()
+
+    with timer.stage(STARTUP_IMPORT_OCR):
+        import ocr
+        import pytesseract
+
+    with timer.stage(STARTUP_MODEL_LOAD):
+        easyocr = ocr.make_inference(config)
+
+    if config["startup_warmup"]:
+        with timer.stage(STARTUP_WARMUP):
+            warm_up_ocr(easyocr)
+
+    if config["startup_preload_pipeline"]:
+        with timer.stage(STARTUP_IMPORT_PIPELINE):
+            import exe_full_text
+
+    # Full Text 작업을 처리할 작업 큐와 worker pool
+    with timer.stage(STARTUP_SCHEDULER):
+        scheduler = JobScheduler(execute_fulltext_job,
+                                 worker_count=config["worker_count"],
+                                 queue_size=config["job_queue_size"],
+                                 admission=config["job_admission"],
+                                 block_timeout=config["job_block_timeout"])
+
+    metrics_sink = get_metrics_sink(config)
+    startup_report = timer.report()
+    log_startup_report(startup_report)
+    if isinstance(metrics_sink, PrometheusMetricsSink):
+        metrics_sink.set_startup(startup_report)
+
     model_info_dict = {
         "pdf_path" : "",
         "png_lake" : "",
         "easyocr" : easyocr,
-        "tesseract" : pytesseract
+        "tesseract" : pytesseract,
+        "scheduler" : scheduler,
+        "metrics_sink" : metrics_sink,
+        "startup" : startup_report
     }
     return model_info_dict
 
 def inference_dataframe(input_data, model_info_dict):
     """
     input_data : pdf 경로(pdf_path), png 저장소 경로(png_lake)
+
+    작업을 작업 큐에 넣고 job id와 json 저장 경로를 return 한다.
+    큐가 가득 차서 거절된 경우 STATUS가 503이다.
     """
     # json이 저장될 hdfs의 디렉토리 경로
     json_path = "/tmp_json"
@@ -32,8 +85,76 @@ def inference_dataframe(input_data, model_info_dict):
     model_info_dict["pdf_path"] = pdf_path
     model_info_dict["png_lake"] = png_lake_path
 
-    argument = (model_info_dict["pdf_path"], model_info_dict["png_lake"], model_info_dict["tesseract"], model_info_dict["easyocr"], json_path)
-    thread = threading.Thread(target = execute_fulltext_api, args = argument)
-    thread.start()
+    argument = (pdf_path, png_lake_path, model_info_dict["tesseract"], model_info_dict["easyocr"], json_path)
+    job = model_info_dict["scheduler"].submit(*argument)
+
+    output = {
+        "STATUS" : "202",
+        "STATUS_RESULT" : "접수",
+        "JOB_ID" : job["JOB_ID"],
+        "JOB_STATE" : job["STATE"],
+        "JSON_PATH" : json_path
+    }
+
+    if job["STATE"] == JOB_REJECTED:
+        output["STATUS"] = "503"
+        output["STATUS_RESULT"] = "작업 큐가 가득 찼습니다. 잠시 후 다시 요청해주세요."
+
+    return output
+
+def inference_job_status(input_data, model_info_dict):
+    """
+    input_data : 조회할 작업의 job id(job_id)
+
+    작업의 상태(QUEUED, RUNNING, DONE, FAILED, REJECTED)와 끝난 작업의 결과 요약(STATUS, PAGE_COUNT, 결과 파일 경로 등)을 return 한다.
+    """
+    job = model_info_dict["scheduler"].get_status(input_data["job_id"])
+
+    if job is None:
+        return {
+            "STATUS" : "404",
+            "STATUS_RESULT" : "존재하지 않는 작업입니다.",
+            "JOB_ID" : input_data["job_id"]
+        }
+
+    output = {
+        "STATUS" : "200",
+        "STATUS_RESULT" : "성공"
+    }
+    output.update(job)
+
+    return output
+
+def inference_metrics(input_data, model_info_dict):
+    """
+    input_data : 사용하지 않음
+
+    'metrics_sink'가 prometheus일 때 지금까지 처리한 문서들의 단계 별 측정값을 Prometheus text 형식으로 return 한다.
+    """
+    metrics_sink = model_info_dict.get("metrics_sink")
+
+    if not isinstance(metrics_sink, PrometheusMetricsSink):
+        return {
+            "STATUS" : "404",
+            "STATUS_RESULT" : "prometheus 측정 sink가 설정되지 않았습니다."
+        }
+
+    return {
+        "STATUS" : "200",
+        "STATUS_RESULT" : "성공",
+        "METRICS" : metrics_sink.render()
+    }
+
+def inference_startup(input_data, model_info_dict):
+    """
+    input_data : 사용하지 않음
+
+    서비스 시작 단계 별 시간(import, 모델 load, warm-up 등)을 return 한다.
+    """
+    output = {
+        "STATUS" : "200",
+        "STATUS_RESULT" : "성공"
+    }
+    output.update(model_info_dict["startup"])
 
-    return json_path
\ No newline at end of file
+    return output
@@ -0,0 +1,183 @@
+import queue
+import threading
+import uuid
+import time
+from collections import OrderedDict
+from error_status import *
+import logging
+
+# 작업 상태
+JOB_QUEUED = "QUEUED"
+JOB_RUNNING = "RUNNING"
+JOB_DONE = "DONE"
+JOB_FAILED = "FAILED"
+JOB_REJECTED = "REJECTED"
+
+# 끝난 작업의 상태에 남길 결과값 항목 (FULL_TEXT, PAGES 등 큰 항목은 보관하지 않는다)
+JOB_RESULT_FIELDS = ("STATUS", "STATUS_RESULT", "PAGE_COUNT", "FAILED_PAGES", "RESULT_PATH")
+
+class JobScheduler:
+    """
+    # 작업 큐와 worker pool
+
+    요청마다 thread를 새로 만들지 않고, 크기가 제한된 작업 큐에 넣은 뒤 정해진 개수의 worker thread가 꺼내서 처리한다.
+
+    큐가 가득 차면 admission 설정에 따라 요청을 거절(reject)하거나 자리가 날 때까지 기다린다(block).
+
+    작업마다 job id를 발급하고, 'get_status'로 진행 상태와 결과를 조회할 수 있다.
+
+    끝난 작업은 history_size개까지 보관하므로, 결과값은 'JOB_RESULT_FIELDS' 항목만 요약해서 남긴다. (전체 결과는 결과 파일에 있다)
+    """
+    def __init__(self, target, worker_count=2, queue_size=32, admission="reject", block_timeout=30, history_size=1000):
+        """
+        target : 작업으로 실행할 함수 (결과값 dict에 'STATUS'가 있으면 성공 여부 판단에 사용)
+        worker_count : worker thread 개수
+        queue_size : 대기 중인 작업의 최대 개수
+        admission : 큐가 가득 찼을 때의 동작 ("reject" : 바로 거절, "block" : block_timeout 초까지 대기 후 거절)
+        block_timeout : admission이 "block"일 때 최대 대기 시간(초)
+        history_size : 끝난 작업의 상태를 보관할 최대 개수 (넘으면 오래된 작업부터 삭제)
+        """
+        self.target = target
+        self.admission = admission
+        self.block_timeout = block_timeout
+        self.history_size = history_size
+
+        self.job_queue = queue.Queue(maxsize=queue_size)
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.workers = []
+        for worker_num in range(worker_count):
+            worker = threading.Thread(target=self.run_worker, name=f"fulltext-worker-{worker_num + 1}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    # ================================================================================================================
+    def submit(self, *args, **kwargs):
+        """
+        args, kwargs : target 함수에 넘길 인자
+
+        작업을 큐에 넣고 작업 상태 dict를 return 한다. 큐가 가득 차서 거절되면 STATE가 REJECTED이다.
+        """
+        job_id = uuid.uuid4().hex
+        job = {
+            "JOB_ID" : job_id,
+            "STATE" : JOB_QUEUED,
+            "SUBMITTED_AT" : time.time(),
+            "STARTED_AT" : None,
+            "FINISHED_AT" : None,
+            "RESULT" : None
+        }
+
+        with self.lock:
+            self.jobs[job_id] = job
+
+        try:
+            if self.admission == "block":
+                self.job_queue.put((job_id, args, kwargs), timeout=self.block_timeout)
+            else:
+                self.job_queue.put_nowait((job_id, args, kwargs))
+
+        except queue.Full:
+            # 큐가 가득 차면 작업 거절
+            with self.lock:
+                job["STATE"] = JOB_REJECTED
+                job["FINISHED_AT"] = time.time()
+                self.trim_history()
+            logging.warning("job queue is full, rejected job : {}".format(job_id))
+
+        return self.get_status(job_id)
+
+    # ================================================================================================================
+    def get_status(self, job_id):
+        """
+        job_id : 'submit'에서 발급된 작업 id
+
+        작업 상태 dict의 복사본을 return 한다. 대기 중인 작업은 앞에 대기 중인 작업 수(QUEUE_POSITION)가 함께 나온다.
+
+        존재하지 않거나 기록이 삭제된 작업이면 None을 return 한다.
+        """
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+
+            status = dict(job)
+            if job["STATE"] == JOB_QUEUED:
+                status["QUEUE_POSITION"] = sum(1 for other in self.jobs.values() if other["STATE"] == JOB_QUEUED and other["SUBMITTED_AT"] < job["SUBMITTED_AT"])
+
+        return status
+
+    # ================================================================================================================
+    def queue_length(self):
+        return self.job_queue.qsize()
+
+    # ================================================================================================================
+    def run_worker(self):
+        """
+        큐에서 작업을 하나씩 꺼내서 실행하고 결과를 작업 상태에 기록한다.
+        """
+        while True:
+            job_id, args, kwargs = self.job_queue.get()
+
+            # 종료 신호
+            if job_id is None:
+                self.job_queue.task_done()
+                return
+
+            with self.lock:
+                job = self.jobs[job_id]
+                job["STATE"] = JOB_RUNNING
+                job["STARTED_AT"] = time.time()
+
+            try:
+                result = self.target(*args, **kwargs)
+                state = JOB_DONE
+                if isinstance(result, dict) and result.get("STATUS") not in (None, "200"):
+                    state = JOB_FAILED
+
+            except Exception:
+                # 에러 발생 시 에러 정보 추출
+                result = extract_error_status({"STATUS" : "", "STATUS_RESULT" : ""})
+                state = JOB_FAILED
+
+            with self.lock:
+                job["STATE"] = state
+                job["RESULT"] = summarize_result(result)
+                job["FINISHED_AT"] = time.time()
+                self.trim_history()
+
+            self.job_queue.task_done()
+
+    # ================================================================================================================
+    def trim_history(self):
+        """
+        끝난 작업이 history_size를 넘으면 오래된 작업부터 기록을 삭제한다. (lock을 잡은 상태에서 호출)
+        """
+        finished = [job_id for job_id, job in self.jobs.items() if job["FINISHED_AT"] is not None]
+        for job_id in finished[:max(0, len(finished) - self.history_size)]:
+            del self.jobs[job_id]
+
+    # ================================================================================================================
+    def shutdown(self, wait=True):
+        """
+        대기 중인 작업을 모두 처리한 뒤 worker thread를 종료한다.
+        """
+        for _ in self.workers:
+            self.job_queue.put((None, None, None))
+
+        if wait:
+            for worker in self.workers:
+                worker.join()
+
+# ================================================================================================================
+def summarize_result(result):
+    """
+    result : target 함수의 결과값
+
+    결과값이 dict이면 'JOB_RESULT_FIELDS' 항목만 남긴 dict를, 아니면 그대로 return 한다.
+    """
+    if not isinstance(result, dict):
+        return result
+
+    return {field : result[field] for field in JOB_RESULT_FIELDS if field in result}
@@ -0,0 +1,447 @@
+import os
+import io
+import json
+import time
+import resource
+import threading
+from collections import defaultdict
+import logging
+
+# 측정 단계 이름
+STAGE_HDFS_READ = "hdfs_read"
+STAGE_CLASSIFY = "classify"
+STAGE_RENDER = "render"
+STAGE_ORIENTATION = "orientation"
+STAGE_INNER_IMAGE = "inner_image"
+STAGE_LOAD_IMAGES = "load_images"
+STAGE_ERASE_LINE = "erase_line"
+STAGE_OCR = "ocr"
+STAGE_PNG_WRITE = "png_write"
+STAGE_JSON_WRITE = "json_write"
+STAGE_CHECKPOINT = "checkpoint"
+
+# sink 별로 한 번만 생성해서 재사용하는 객체
+metrics_sinks = {}
+metrics_sinks_lock = threading.Lock()
+
+# ================================================================================================================
+def get_peak_rss():
+    """
+    현재 프로세스의 최대 메모리 사용량(peak RSS, byte)을 return 한다. (linux의 ru_maxrss는 KB 단위)
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def get_current_rss():
+    """
+    현재 프로세스의 메모리 사용량(RSS, byte)을 '/proc/self/statm'에서 읽어서 return 한다. (읽을 수 없으면 0)
+
+    'get_peak_rss'는 프로세스 시작부터의 최대값이라 줄어들지 않으므로, 단계 별 메모리 변화는 이 값으로 측정한다.
+    """
+    try:
+        with open("/proc/self/statm") as fp:
+            resident_pages = int(fp.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return 0
+
+    return resident_pages * os.sysconf("SC_PAGE_SIZE")
+
+# ================================================================================================================
+class StageTimer:
+    """
+    # 단계 측정
+
+    with 문 안의 wall time, CPU time, 읽고 쓴 byte 수와 시작, 끝의 RSS를 측정해서 끝날 때 MetricsRecorder에 기록한다.
+    """
+    def __init__(self, recorder, name, pages):
+        self.recorder = recorder
+        self.record = {
+            "STAGE" : name,
+            "PAGES" : [page_num + 1 for page_num in pages] if pages is not None else [],
+            "WALL_SECONDS" : 0.0,
+            "CPU_SECONDS" : 0.0,
+            "BYTES_READ" : 0,
+            "BYTES_WRITTEN" : 0,
+            "RSS_BEFORE_BYTES" : 0,
+            "RSS_AFTER_BYTES" : 0
+        }
+
+    def __enter__(self):
+        self.recorder.active_records.append(self.record)
+        self.record["RSS_BEFORE_BYTES"] = get_current_rss()
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.record["WALL_SECONDS"] = time.perf_counter() - self.wall_start
+        self.record["CPU_SECONDS"] = time.process_time() - self.cpu_start
+        self.record["RSS_AFTER_BYTES"] = get_current_rss()
+
+        self.recorder.active_records.remove(self.record)
+        self.recorder.records.append(self.record)
+        return False
+
+class NullStageTimer:
+    """
+    # 측정을 하지 않을 때 사용하는 with 문 객체 (아무 일도 하지 않는다)
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+NULL_STAGE_TIMER = NullStageTimer()
+
+# ================================================================================================================
+class MetricsRecorder:
+    """
+    # 문서 처리 측정 기록
+
+    문서 하나를 처리하는 동안의 단계 별 wall time, CPU time, 읽고 쓴 byte 수, RSS 변화를 기록한다.
+
+    CPU time과 RSS는 프로세스 전체 기준이므로 여러 문서를 동시에 처리하면 다른 문서의 CPU time, 메모리가 함께 포함된다.
+    (전처리 프로세스 pool의 CPU time은 포함되지 않는다)
+
+    단계는 중첩될 수 있으며(예 : 렌더링을 이미지 불러오기 중에 하는 경우) 읽고 쓴 byte는 진행 중인 모든 단계에 더해진다.
+    """
+    enabled = True
+
+    def __init__(self, document_name, sink=None):
+        """
+        document_name : 문서 이름 (pdf 경로)
+        sink : 문서 처리가 끝나면 측정 결과를 넘겨받을 sink 객체 (None이면 output에만 기록)
+        """
+        self.document_name = document_name
+        self.sink = sink
+        self.records = []
+        self.active_records = []
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        self.rss_start = get_current_rss()
+
+    def stage(self, name, pages=None):
+        """
+        name : 단계 이름
+        pages : 단계에서 처리하는 페이지 번호(0부터 시작)들의 리스트
+
+        with 문으로 사용하는 단계 측정 객체를 return 한다.
+        """
+        return StageTimer(self, name, pages)
+
+    def add_bytes_read(self, size):
+        self.bytes_read += size
+        for record in self.active_records:
+            record["BYTES_READ"] += size
+
+    def add_bytes_written(self, size):
+        self.bytes_written += size
+        for record in self.active_records:
+            record["BYTES_WRITTEN"] += size
+
+    def wrap_fs(self, fs):
+        """
+        읽고 쓴 byte 수를 세는 HdfsClient를 return 한다.
+        """
+        if isinstance(fs, MeteredHdfsClient):
+            return fs
+
+        return MeteredHdfsClient(fs, self)
+
+    def summary(self):
+        """
+        output의 'METRICS'에 기록할 측정 결과를 return 한다.
+
+        1. DOCUMENT : 문서 전체 (측정 시작부터 지금까지, 시작과 지금의 RSS, 프로세스 전체의 peak RSS)
+        2. STAGES : 단계 이름 별 합계 (RSS는 단계 한 번 실행 중 가장 많이 늘어난 값)
+        3. PAGES : 페이지 별 단계 wall time (여러 페이지를 함께 처리한 단계는 페이지 수로 나눈 값)
+        """
+        stages = {}
+        pages = defaultdict(lambda : defaultdict(float))
+
+        for record in self.records:
+            stage = stages.setdefault(record["STAGE"], {
+                "COUNT" : 0,
+                "WALL_SECONDS" : 0.0,
+                "CPU_SECONDS" : 0.0,
+                "BYTES_READ" : 0,
+                "BYTES_WRITTEN" : 0,
+                "MAX_RSS_GROWTH_BYTES" : 0
+            })
+            stage["COUNT"] += 1
+            for key in ("WALL_SECONDS", "CPU_SECONDS", "BYTES_READ", "BYTES_WRITTEN"):
+                stage[key] += record[key]
+            stage["MAX_RSS_GROWTH_BYTES"] = max(stage["MAX_RSS_GROWTH_BYTES"], record["RSS_AFTER_BYTES"] - record["RSS_BEFORE_BYTES"])
+
+            for page_number in record["PAGES"]:
+                pages[page_number][record["STAGE"]] += record["WALL_SECONDS"] / len(record["PAGES"])
+
+        return {
+            "DOCUMENT" : {
+                "NAME" : self.document_name,
+                "WALL_SECONDS" : time.perf_counter() - self.wall_start,
+                "CPU_SECONDS" : time.process_time() - self.cpu_start,
+                "BYTES_READ" : self.bytes_read,
+                "BYTES_WRITTEN" : self.bytes_written,
+                "RSS_START_BYTES" : self.rss_start,
+                "RSS_END_BYTES" : get_current_rss(),
+                "PROCESS_PEAK_RSS_BYTES" : get_peak_rss()
+            },
+            "STAGES" : stages,
+            "PAGES" : [{"page_number" : str(page_number), "STAGE_WALL_SECONDS" : dict(page_stages)} for page_number, page_stages in sorted(pages.items())]
+        }
+
+    def finish(self, output):
+        """
+        output : 문서 처리 결과값
+
+        문서 처리가 끝나면 측정 결과를 sink로 보낸다. sink 에러는 문서 처리 결과에 영향을 주지 않는다.
+        """
+        if self.sink is None:
+            return
+
+        try:
+            self.sink.emit(self.summary(), output.get("STATUS", ""))
+        except Exception:
+            logging.exception("metrics sink emit failed : {}".format(type(self.sink).__name__))
+
+class NullMetricsRecorder:
+    """
+    # 측정을 하지 않을 때 사용하는 기록 객체
+
+    MetricsRecorder와 같은 메소드를 가지지만 아무것도 기록하지 않는다. (시간 측정, fs 감싸기 없음)
+    """
+    enabled = False
+
+    def stage(self, name, pages=None):
+        return NULL_STAGE_TIMER
+
+    def add_bytes_read(self, size):
+        pass
+
+    def add_bytes_written(self, size):
+        pass
+
+    def wrap_fs(self, fs):
+        return fs
+
+    def summary(self):
+        return None
+
+    def finish(self, output):
+        pass
+
+NULL_METRICS = NullMetricsRecorder()
+
+# ================================================================================================================
+class MeteredReader(io.RawIOBase):
+    """
+    # 읽은 byte 수를 세는 파일 객체
+    """
+    def __init__(self, fp, recorder):
+        self.fp = fp
+        self.recorder = recorder
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        data = self.fp.read() if size is None or size < 0 else self.fp.read(size)
+        self.recorder.add_bytes_read(len(data))
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        self.fp.close()
+        super().close()
+
+class MeteredHdfsClient:
+    """
+    # 읽고 쓴 byte 수를 세는 HdfsClient
+
+    pyhdfs HdfsClient를 감싸서 open, create, append의 byte 수를 MetricsRecorder에 기록한다. 나머지 메소드는 그대로 넘긴다.
+    """
+    def __init__(self, fs, recorder):
+        self.fs = fs
+        self.recorder = recorder
+
+    def __getattr__(self, name):
+        return getattr(self.fs, name)
+
+    def open(self, path, **kwargs):
+        return MeteredReader(self.fs.open(path, **kwargs), self.recorder)
+
+    def count_data(self, data):
+        # bytes는 길이를 바로 더하고, 파일 객체는 읽는 만큼 센다
+        if isinstance(data, (bytes, bytearray)):
+            self.recorder.add_bytes_written(len(data))
+            return data
+
+        return MeteredWriterSource(data, self.recorder)
+
+    def create(self, path, data, **kwargs):
+        return self.fs.create(path, self.count_data(data), **kwargs)
+
+    def append(self, path, data, **kwargs):
+        return self.fs.append(path, self.count_data(data), **kwargs)
+
+class MeteredWriterSource(MeteredReader):
+    """
+    # hdfs에 쓰기 위해 읽히는 파일 객체 (읽힌 byte 수를 쓴 byte 수로 센다)
+    """
+    def read(self, size=-1):
+        data = self.fp.read() if size is None or size < 0 else self.fp.read(size)
+        self.recorder.add_bytes_written(len(data))
+        return data
+
+    # 전송할 크기를 알 수 있도록 위치 이동은 원본 파일 객체에 넘긴다
+    def seekable(self):
+        return self.fp.seekable()
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        return self.fp.seek(offset, whence)
+
+    def tell(self):
+        return self.fp.tell()
+
+    def close(self):
+        # 호출한 쪽의 파일 객체는 호출한 쪽에서 닫는다
+        io.RawIOBase.close(self)
+
+# ================================================================================================================
+class JsonlMetricsSink:
+    """
+    # JSONL 파일 sink
+
+    문서 하나의 측정 결과를 한 줄의 json으로 로컬 파일에 추가한다.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def emit(self, summary, status):
+        line = json.dumps({"TIME" : time.time(), "STATUS" : status, "METRICS" : summary})
+
+        with self.lock:
+            with open(self.path, "a") as fp:
+                fp.write(line + "\n")
+
+class PrometheusMetricsSink:
+    """
+    # Prometheus text sink
+
+    문서들의 측정 결과를 단계 별 누적값으로 모아두고, Prometheus text exposition 형식으로 돌려준다. ('render' 메소드)
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.documents = defaultdict(int)
+        self.document_seconds = 0.0
+        self.stages = defaultdict(lambda : defaultdict(float))
+        # 서비스 시작 단계 별 시간
+        self.startup = {}
+
+    def set_startup(self, report):
+        """
+        report : StartupTimer.report()의 결과
+
+        서비스 시작 단계 별 시간을 gauge로 내보내도록 저장한다.
+        """
+        with self.lock:
+            self.startup = dict(report["STAGES"], total=report["TOTAL_SECONDS"])
+
+    def emit(self, summary, status):
+        with self.lock:
+            self.documents[status] += 1
+            self.document_seconds += summary["DOCUMENT"]["WALL_SECONDS"]
+
+            for name, stage in summary["STAGES"].items():
+                for key in ("COUNT", "WALL_SECONDS", "CPU_SECONDS", "BYTES_READ", "BYTES_WRITTEN"):
+                    self.stages[name][key] += stage[key]
+
+    def render(self):
+        """
+        Prometheus text exposition 형식의 문자열을 return 한다.
+        """
+        metric_names = [
+            ("COUNT", "fulltext_stage_runs_total", "Number of times each stage ran"),
+            ("WALL_SECONDS", "fulltext_stage_wall_seconds_total", "Wall time spent in each stage"),
+            ("CPU_SECONDS", "fulltext_stage_cpu_seconds_total", "Process CPU time spent in each stage"),
+            ("BYTES_READ", "fulltext_stage_bytes_read_total", "Bytes read from HDFS in each stage"),
+            ("BYTES_WRITTEN", "fulltext_stage_bytes_written_total", "Bytes written to HDFS in each stage"),
+        ]
+
+        with self.lock:
+            lines = [
+                "# HELP fulltext_documents_total Number of processed documents by status",
+                "# TYPE fulltext_documents_total counter"
+            ]
+            for status, count in sorted(self.documents.items()):
+                lines.append(f'fulltext_documents_total{{status="{status}"}} {count}')
+
+            lines += [
+                "# HELP fulltext_document_wall_seconds_total Wall time spent on documents",
+                "# TYPE fulltext_document_wall_seconds_total counter",
+                f"fulltext_document_wall_seconds_total {self.document_seconds}",
+                "# HELP fulltext_peak_rss_bytes Peak resident set size of the process",
+                "# TYPE fulltext_peak_rss_bytes gauge",
+                f"fulltext_peak_rss_bytes {get_peak_rss()}",
+                "# HELP fulltext_rss_bytes Current resident set size of the process",
+                "# TYPE fulltext_rss_bytes gauge",
+                f"fulltext_rss_bytes {get_current_rss()}"
+            ]
+
+            for key, metric_name, description in metric_names:
+                lines += [f"# HELP {metric_name} {description}", f"# TYPE {metric_name} counter"]
+                for name, stage in sorted(self.stages.items()):
+                    lines.append(f'{metric_name}{{stage="{name}"}} {stage[key]}')
+
+            if self.startup:
+                lines += ["# HELP fulltext_startup_seconds Time spent in each service startup stage", "# TYPE fulltext_startup_seconds gauge"]
+                for name, seconds in self.startup.items():
+                    lines.append(f'fulltext_startup_seconds{{stage="{name}"}} {seconds}')
+
+        return "\n".join(lines) + "\n"
+
+# ================================================================================================================
+def get_metrics_sink(config):
+    """
+    config : 파이프라인 설정값 dict
+
+    'metrics_sink' 설정값("jsonl", "prometheus")에 맞는 sink를 한 번만 만들어 재사용한다. 설정하지 않았으면 None을 return 한다.
+    """
+    sink_type = config["metrics_sink"]
+    if not sink_type:
+        return None
+
+    sink_id = (sink_type, config["metrics_sink_path"])
+    with metrics_sinks_lock:
+        if sink_id not in metrics_sinks:
+            if sink_type == "prometheus":
+                metrics_sinks[sink_id] = PrometheusMetricsSink()
+            else:
+                metrics_sinks[sink_id] = JsonlMetricsSink(config["metrics_sink_path"])
+
+    return metrics_sinks[sink_id]
+
+def make_metrics(config, document_name):
+    """
+    config : 파이프라인 설정값 dict
+    document_name : 문서 이름 (pdf 경로)
+
+    'metrics'가 True이면 문서 하나의 MetricsRecorder를, 아니면 아무것도 하지 않는 NULL_METRICS를 return 한다.
+    """
+    if not config["metrics"]:
+        return NULL_METRICS
+
+    return MetricsRecorder(document_name, get_metrics_sink(config))
@@ -0,0 +1,191 @@
+import os
+import json
+import argparse
+from config import get_config
+from hdfs_client import make_hdfs_client
+
+# NDJSON 줄 종류
+RECORD_TYPE_PAGE = "PAGE"
+RECORD_TYPE_SUMMARY = "SUMMARY"
+
+# 요약 줄만 찾을 때 파일 끝에서부터 읽는 크기
+SUMMARY_TAIL_BYTES = 64 * 1024
+
+# 기존 json 결과값의 key 순서
+legacy_output_fields = ["STATUS", "STATUS_RESULT", "PAGE_COUNT", "DOC_SEARCHABLE", "FULL_TEXT", "DEDUPLICATED_IMAGE_COUNT", "SKIPPED_IMAGE_COUNT", "SKIPPED_OCR_SECONDS", "FAILED_PAGES", "RESUMED_PAGE_COUNT", "PAGES"]
+
+# ================================================================================================================
+def make_ndjson_path(json_path, file_name):
+    """
+    json_path : json파일이 저장될 hdfs의 json 저장소의 경로
+    file_name : pdf 파일의 이름
+
+    NDJSON 결과 파일 경로를 return 한다.
+    """
+    return os.path.join(json_path, f"{file_name}.ndjson")
+
+def make_page_line(record, full_text):
+    return {"RECORD_TYPE" : RECORD_TYPE_PAGE, "PAGE" : record, "FULL_TEXT" : full_text}
+
+def make_summary_line(output):
+    summary = {field : value for field, value in output.items() if field not in ("FULL_TEXT", "PAGES", "OUTPUT_PATH")}
+    return dict(RECORD_TYPE=RECORD_TYPE_SUMMARY, **summary)
+
+# ================================================================================================================
+class NdjsonOutputWriter:
+    """
+    # NDJSON 결과 저장
+
+    'extract_text' 결과를 한 파일에 페이지 하나당 한 줄씩 쓰고, 마지막 줄에 문서 요약(STATUS, PAGE_COUNT 등)을 쓴다.
+
+    페이지 줄 : {"RECORD_TYPE" : "PAGE", "PAGE" : PAGES의 페이지 정보, "FULL_TEXT" : 페이지가 문서 전체 텍스트에 추가하는 텍스트}
+    요약 줄 : {"RECORD_TYPE" : "SUMMARY", 결과값에서 FULL_TEXT, PAGES를 뺀 항목들}
+
+    'add_page'로 모은 줄은 'flush'를 호출할 때 hdfs에 한 번에 추가되므로, 처리가 끝나기 전에도 앞 페이지들을 읽을 수 있다.
+    요약 줄이 없는 파일은 아직 처리 중이거나 중간에 멈춘 문서이다.
+    """
+    def __init__(self, fs, path):
+        """
+        fs : hdfs client
+        path : NDJSON 결과 파일 경로
+        """
+        self.fs = fs
+        self.path = path
+        self.lines = []
+        self.created = False
+
+    def add_page(self, record, full_text):
+        self.lines.append(json.dumps(make_page_line(record, full_text), ensure_ascii=False))
+
+    def flush(self):
+        """
+        모아둔 줄들을 hdfs에 쓴다. 처음 쓸 때는 이전 실행의 파일을 덮어쓴다.
+        """
+        if not self.lines:
+            return
+
+        data = ("\n".join(self.lines) + "\n").encode("utf-8")
+        self.lines = []
+
+        if self.created:
+            self.fs.append(self.path, data)
+        else:
+            self.fs.create(self.path, data, overwrite=True)
+            self.created = True
+
+    def finish(self, output):
+        """
+        output : FULL_TEXT, PAGES를 뺀 'extract_text' 결과값
+
+        남은 페이지 줄과 요약 줄을 쓴다.
+        """
+        self.lines.append(json.dumps(make_summary_line(output), ensure_ascii=False))
+        self.flush()
+
+# ================================================================================================================
+def read_ndjson_lines(fs, path, offset=0):
+    with fs.open(path, offset=offset) as fp:
+        data = fp.read().decode("utf-8")
+
+    return data.splitlines()
+
+def read_ndjson_summary(fs, path):
+    """
+    fs : hdfs client
+    path : NDJSON 결과 파일 경로
+
+    파일 끝부분만 읽어서 요약 줄을 return 한다. 파일이 없거나 요약 줄이 없으면 None을 return 한다.
+    """
+    if not fs.exists(path):
+        return None
+
+    length = fs.get_file_status(path)["length"]
+    offset = max(0, length - SUMMARY_TAIL_BYTES)
+    lines = read_ndjson_lines(fs, path, offset)
+
+    # 요약 줄이 끝부분보다 길면 파일 전체를 읽는다
+    if offset and len(lines) < 2:
+        lines = read_ndjson_lines(fs, path)
+
+    if not lines:
+        return None
+
+    try:
+        summary = json.loads(lines[-1])
+    except json.JSONDecodeError:
+        return None
+
+    return summary if summary.get("RECORD_TYPE") == RECORD_TYPE_SUMMARY else None
+
+def read_ndjson_output(fs, path):
+    """
+    fs : hdfs client
+    path : NDJSON 결과 파일 경로
+
+    NDJSON 결과 파일을 읽어서 기존 단일 json 형식의 결과값 dict로 만든다.
+
+    요약 줄이 없으면(처리 중이거나 중간에 멈춘 문서) 읽은 페이지들만 넣고 STATUS는 빈 값으로 둔다.
+    """
+    output = {field : "" for field in legacy_output_fields}
+    output["FAILED_PAGES"] = []
+    pages = []
+    full_texts = []
+
+    for line in read_ndjson_lines(fs, path):
+        if not line:
+            continue
+
+        record = json.loads(line)
+        if record["RECORD_TYPE"] == RECORD_TYPE_PAGE:
+            pages.append(record["PAGE"])
+            full_texts.append(record["FULL_TEXT"])
+        else:
+            output.update({field : value for field, value in record.items() if field != "RECORD_TYPE"})
+
+    # 캐시 결과값으로 만든 파일은 요약 줄에 문서 전체 텍스트가 들어 있다
+    if not output["FULL_TEXT"]:
+        output["FULL_TEXT"] = "".join(full_texts)
+    output["PAGES"] = pages
+
+    return output
+
+def write_ndjson_output(fs, output, path):
+    """
+    기존 단일 json 형식의 결과값을 NDJSON 결과 파일로 쓴다. (결과값 캐시에서 불러온 결과값 저장용)
+
+    페이지 별 FULL_TEXT는 기존 형식에 없으므로 문서 전체 텍스트는 요약 줄에 그대로 넣는다.
+    """
+    writer = NdjsonOutputWriter(fs, path)
+    for record in output.get("PAGES", []):
+        writer.add_page(record, "")
+
+    summary = {field : value for field, value in output.items() if field != "PAGES"}
+    writer.lines.append(json.dumps(dict(RECORD_TYPE=RECORD_TYPE_SUMMARY, **summary), ensure_ascii=False))
+    writer.flush()
+
+# ================================================================================================================
+def convert_ndjson_to_json(fs, ndjson_path, json_file_path):
+    """
+    NDJSON 결과 파일을 기존 단일 json 파일로 변환해서 저장하고 결과값을 return 한다.
+    """
+    output = read_ndjson_output(fs, ndjson_path)
+    fs.create(json_file_path, json.dumps(output).encode(), overwrite=True)
+
+    return output
+
+def main():
+    parser = argparse.ArgumentParser(description="NDJSON Full Text 결과를 기존 json 형식으로 변환")
+    parser.add_argument("ndjson_path", help="NDJSON 결과 파일의 hdfs 경로")
+    parser.add_argument("json_path", nargs="?", default=None, help="저장할 json 파일의 hdfs 경로 (기본값 : 확장자만 .json으로 변경)")
+    parser.add_argument("--hdfs-hosts", default="hdfs.kdap.svc.cluster.local:9870")
+    parser.add_argument("--config", default="{}", help="파이프라인 설정값 json (예 : '{\"hdfs_backend\": \"local\"}')")
+    args = parser.parse_args()
+
+    fs = make_hdfs_client(args.hdfs_hosts, get_config(json.loads(args.config)))
+    json_path = args.json_path or os.path.splitext(args.ndjson_path)[0] + ".json"
+
+    output = convert_ndjson_to_json(fs, args.ndjson_path, json_path)
+    print(f"{args.ndjson_path} -> {json_path} : {output['STATUS']} ({len(output['PAGES'])} pages)")
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,127 @@
 import os
-import fitz
+import threading
+import numpy as np
+import torch
 from easyocr import easyocr
+from easyocr.utils import get_image_list, reformat_input
+from easyocr.recognition import get_text
+from easyocr.config import imgH
 from error_status import *
 import logging
 
+# OCR 모델 실행 방식
+# easyocr : easyocr(PyTorch) 모델 그대로 실행, onnx : detector와 recognizer를 ONNX Runtime(CPU)으로 실행
+OCR_BACKEND_EASYOCR = "easyocr"
+OCR_BACKEND_ONNX = "onnx"
+
+# ONNX 모델 변환은 프로세스 안에서 한 번에 하나만
+onnx_export_lock = threading.Lock()
+
+# ================================================================================================================
+def box_bounds(box):
+    """
+    box : easyocr 글자 영역의 꼭짓점 좌표 리스트 [[x, y], ...]
+
+    글자 영역을 감싸는 [x0, y0, x1, y1]을 return 한다.
+    """
+    xs = [point[0] for point in box]
+    ys = [point[1] for point in box]
+
+    return [int(min(xs)), int(min(ys)), int(max(xs)), int(max(ys))]
+
+# ================================================================================================================
+class OnnxModel:
+    """
+    # ONNX Runtime 모델
+
+    easyocr가 PyTorch 모델을 호출하는 방식(model(x), model.eval())대로 ONNX Runtime session을 실행한다.
+    """
+    def __init__(self, session):
+        self.session = session
+        self.input_name = session.get_inputs()[0].name
+
+    def eval(self):
+        return self
+
+    def to(self, *args, **kwargs):
+        return self
+
+    def run(self, tensor):
+        return [torch.from_numpy(output) for output in self.session.run(None, {self.input_name : tensor.detach().cpu().numpy()})]
+
+class OnnxDetector(OnnxModel):
+    # CRAFT detector : (score map, feature)를 return
+    def __call__(self, x):
+        y, feature = self.run(x)
+        return y, feature
+
+class OnnxRecognizer(OnnxModel):
+    # recognizer : 글자 별 예측값을 return (text는 학습용 입력이라 사용하지 않는다)
+    def __call__(self, image, text=None):
+        return self.run(image)[0]
+
+# ================================================================================================================
+def export_onnx_models(reader, directory):
+    """
+    reader : CPU에서 양자화 없이 불러온 easyocr Reader
+    directory : ONNX 모델을 저장할 로컬 디렉토리
+
+    easyocr의 detector(CRAFT)와 recognizer를 입력 크기가 바뀌어도 실행되는 ONNX 모델로 변환하고 (detector 경로, recognizer 경로)를 return 한다.
+
+    이미 변환한 모델이 있으면 다시 변환하지 않는다.
+    """
+    os.makedirs(directory, exist_ok=True)
+    detector_path = os.path.join(directory, f"{reader.detect_network}.onnx")
+    recognizer_path = os.path.join(directory, f"{reader.model_lang}_recognizer.onnx")
+
+    class RecognizerExport(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, image):
+            return self.model(image, None)
+
+    exports = [
+        (detector_path, reader.detector, torch.zeros(1, 3, 640, 640), ["image"], ["y", "feature"],
+         {"image" : {0 : "batch", 2 : "height", 3 : "width"}, "y" : {0 : "batch", 1 : "score_height", 2 : "score_width"}, "feature" : {0 : "batch", 2 : "score_height", 3 : "score_width"}}),
+        (recognizer_path, RecognizerExport(reader.recognizer), torch.zeros(1, 1, imgH, 256), ["image"], ["preds"],
+         {"image" : {0 : "batch", 3 : "width"}, "preds" : {0 : "batch", 1 : "steps"}})
+    ]
+
+    with onnx_export_lock:
+        for path, model, dummy_input, input_names, output_names, dynamic_axes in exports:
+            if os.path.exists(path):
+                continue
+
+            logging.info("export onnx model : {}".format(path))
+            # 변환 도중의 파일을 읽지 않도록 임시 파일에 쓴 후 이름 변경
+            tmp_path = path + ".tmp"
+            model.eval()
+            with torch.no_grad():
+                torch.onnx.export(model, dummy_input, tmp_path, input_names=input_names, output_names=output_names, dynamic_axes=dynamic_axes, opset_version=13)
+            os.replace(tmp_path, path)
+
+    return detector_path, recognizer_path
+
+def quantize_onnx_model(path):
+    """
+    path : ONNX 모델 경로
+
+    가중치를 int8로 동적 양자화한 모델('.int8.onnx')을 만들고 경로를 return 한다. 이미 있으면 다시 만들지 않는다.
+    """
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    quantized_path = path[:-len(".onnx")] + ".int8.onnx"
+    with onnx_export_lock:
+        if not os.path.exists(quantized_path):
+            logging.info("quantize onnx model : {}".format(quantized_path))
+            tmp_path = quantized_path[:-len(".onnx")] + ".tmp.onnx"
+            quantize_dynamic(path, tmp_path, weight_type=QuantType.QInt8)
+            os.replace(tmp_path, quantized_path)
+
+    return quantized_path
+
 # ================================================================================================================
 class ModelLoader:
     """
@@ -11,17 +129,98 @@ class ModelLoader:
 
     # 20240207 Edit by YOUNGRAE CHO
     """
-    def __init__(self):
+    def __init__(self, gpu=True, backend=OCR_BACKEND_EASYOCR, onnx_directory=None, quantize=True, intra_op_threads=0, inter_op_threads=0,
+                 model_directory=None, download_enabled=True):
+        """
+        gpu : GPU 사용 여부 (False이면 CPU에서 실행)
+
+        backend : 모델 실행 방식 (OCR_BACKEND_EASYOCR, OCR_BACKEND_ONNX)
+        onnx_directory : ONNX로 변환한 모델을 저장, 재사용할 로컬 디렉토리 (onnx일 때 사용)
+        quantize : onnx일 때 가중치를 int8로 동적 양자화할지 여부
+        intra_op_threads : 연산 하나에 사용할 CPU thread 수 (0이면 라이브러리 기본값)
+        inter_op_threads : 독립된 연산들을 동시에 실행할 thread 수 (0이면 라이브러리 기본값)
+        model_directory : easyocr 모델 가중치 파일 디렉토리 (None이면 easyocr 기본 경로 ~/.EasyOCR/model)
+        download_enabled : 가중치 파일이 없을 때 내려받을지 여부 (False이면 네트워크에 접속하지 않고 로컬 파일만 사용)
+        """
+        self.gpu = gpu
+        self.backend = backend
+        self.onnx_directory = os.path.expanduser(onnx_directory or "~/.EasyOCR/onnx")
+        self.quantize = quantize
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.model_directory = os.path.expanduser(model_directory) if model_directory else None
+        self.download_enabled = download_enabled
+
+        # CPU에서 실행하면 PyTorch 연산 thread 수 지정 (onnx도 전처리, 후처리는 PyTorch)
+        if not gpu or backend == OCR_BACKEND_ONNX:
+            self.set_torch_threads()
 
         # easyocr 모델 객체 선언
-        self.easyocr = self.load_easyocr()
+        if backend == OCR_BACKEND_ONNX:
+            self.easyocr = self.load_onnx()
+        else:
+            self.easyocr = self.load_easyocr()
 
     # easyocr 모델 load
     def load_easyocr(self):
 
-        reader = easyocr.Reader(['ko', 'en'], gpu=True)
+        reader = easyocr.Reader(['ko', 'en'], gpu=self.gpu, model_storage_directory=self.model_directory, download_enabled=self.download_enabled)
+
+        return reader
+
+    # ================================================================================================================
+    # easyocr 모델의 detector, recognizer를 ONNX Runtime으로 교체해서 load
+    def load_onnx(self):
+        """
+        1. easyocr 모델을 CPU에서 PyTorch 양자화 없이 불러오기 (전처리, 후처리, 글자 목록은 easyocr 그대로 사용)
+        2. detector, recognizer를 ONNX로 변환해서 onnx_directory에 저장 (한 번만)
+        3. quantize가 True이면 int8 동적 양자화 모델을 만들어서 사용 (한 번만)
+        4. 지정한 thread 수로 ONNX Runtime session을 만들어 reader의 detector, recognizer를 교체
+        """
+        reader = easyocr.Reader(['ko', 'en'], gpu=False, quantize=False, model_storage_directory=self.model_directory, download_enabled=self.download_enabled)
+
+        model_paths = export_onnx_models(reader, self.onnx_directory)
+        if self.quantize:
+            model_paths = [quantize_onnx_model(path) for path in model_paths]
+
+        # (detector 경로, recognizer 경로), OCR worker 프로세스에서 session을 다시 만들 때 사용
+        self.onnx_model_paths = model_paths
+        self.attach_onnx_sessions(reader, self.intra_op_threads, self.inter_op_threads)
 
         return reader
+
+    def attach_onnx_sessions(self, reader, intra_op_threads, inter_op_threads):
+        """
+        reader : 'load_onnx'로 불러온 easyocr Reader
+        intra_op_threads, inter_op_threads : ONNX Runtime session의 thread 수 (0이면 라이브러리 기본값)
+
+        지정한 thread 수로 ONNX Runtime session을 만들어 reader의 detector, recognizer를 교체한다.
+
+        session의 thread pool은 fork한 프로세스로 이어지지 않으므로 OCR worker 프로세스는 이 메소드로 session을 다시 만든다.
+        """
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        if inter_op_threads:
+            options.inter_op_num_threads = inter_op_threads
+            options.execution_mode = onnxruntime.ExecutionMode.ORT_PARALLEL
+
+        detector_path, recognizer_path = self.onnx_model_paths
+        reader.detector = OnnxDetector(onnxruntime.InferenceSession(detector_path, options, providers=["CPUExecutionProvider"]))
+        reader.recognizer = OnnxRecognizer(onnxruntime.InferenceSession(recognizer_path, options, providers=["CPUExecutionProvider"]))
+
+    def set_torch_threads(self):
+        if self.intra_op_threads:
+            torch.set_num_threads(self.intra_op_threads)
+        if self.inter_op_threads:
+            try:
+                torch.set_num_interop_threads(self.inter_op_threads)
+            except RuntimeError:
+                # 병렬 연산이 한 번이라도 실행된 후에는 바꿀 수 없다
+                logging.warning("torch inter-op threads already set")
     
 # ================================================================================================================
     
@@ -32,11 +231,21 @@ class Inference:
     # 20240214 Edit by YOUNGRAE CHO
     """
     # 인스턴스 생성시 모델 load
-    def __init__(self):
-        self.reader = ModelLoader().easyocr
+    def __init__(self, batch_size=16, gpu=True, backend=OCR_BACKEND_EASYOCR, onnx_directory=None, quantize=True, intra_op_threads=0, inter_op_threads=0,
+                 model_directory=None, download_enabled=True):
+        """
+        batch_size : 'extract_text_batch'에서 recognizer에 한 번에 넣을 글자 영역(crop) 수
+        gpu : GPU 사용 여부 (False이면 CPU에서 실행)
+        backend, onnx_directory, quantize, intra_op_threads, inter_op_threads : 모델 실행 방식 (ModelLoader 참고)
+        model_directory, download_enabled : 모델 가중치 파일 위치 (ModelLoader 참고)
+        """
+        self.model_loader = ModelLoader(gpu, backend, onnx_directory, quantize, intra_op_threads, inter_op_threads, model_directory, download_enabled)
+        self.reader = self.model_loader.easyocr
+        self.batch_size = batch_size
+        self.backend = backend
 
     # ocr로 텍스트 추출
-    def extract_text(self, image):
+    def extract_text(self, image, return_boxes=False):
 
         # return할 결과값 형식 지정
         output = {
@@ -56,10 +265,137 @@ class Inference:
             for line in result:
                 output["TEXT"] += (" " + line[1])
 
+            # 글자 영역 좌표 (tile OCR 결과를 합칠 때 사용)
+            if return_boxes:
+                output["BOXES"] = [box_bounds(line[0]) + [line[1]] for line in result]
+
         except Exception:
             # 에러 발생 시 에러 정보 추출 후 output에 결과 반영
             output = extract_error_status(output)
 
             return output
         
-        return output
\ No newline at end of file
+        return output
+
+    # ================================================================================================================
+    # 여러 이미지를 한 번에 ocr로 텍스트 추출
+    def extract_text_batch(self, images, batch_size=None, return_boxes=False):
+        """
+        images : 전처리된 이미지들의 리스트 (여러 페이지, 여러 삽입 이미지)
+        batch_size : recognizer에 한 번에 넣을 글자 영역 수 (None이면 인스턴스의 batch_size)
+        return_boxes : 결과값에 글자 영역 좌표 리스트('BOXES' : [[x0, y0, x1, y1, 텍스트], ...])를 함께 넣을지 여부
+
+        1. 크기가 같은 이미지끼리 묶어서 detector를 한 번에 실행
+        2. 모든 이미지의 글자 영역(crop)을 모아 폭이 비슷한 것끼리 batch_size 단위로 recognizer 실행
+        3. 결과를 이미지 별로 다시 나눠서 'extract_text'와 같은 형식의 output 리스트를 입력 순서대로 return 한다.
+
+        batch 처리 중 에러가 발생하면 이미지 한 장씩 'extract_text'로 다시 처리한다.
+        """
+        if batch_size is None:
+            batch_size = self.batch_size
+
+        if not images:
+            return []
+
+        try:
+            # 이미지 별 (글자 영역 좌표, crop 이미지) 리스트
+            image_crops = self.detect_batch(images)
+
+            # 모든 이미지의 crop을 (이미지 순번, 영역 순번, crop) 형태로 모으고 폭 순서로 정렬
+            crops = [(image_idx, crop_idx, crop) for image_idx, image_crop in enumerate(image_crops) for crop_idx, crop in enumerate(image_crop)]
+            crops.sort(key=lambda item: item[2][1].shape[1])
+
+            # ignore 할 글자 (Reader.recognize와 동일한 기준)
+            ignore_char = ''.join(set(self.reader.character) - set(self.reader.lang_char))
+
+            texts = [[None] * len(image_crop) for image_crop in image_crops]
+            for batch_start in range(0, len(crops), batch_size):
+                batch = crops[batch_start:batch_start + batch_size]
+
+                # batch 안에서 가장 넓은 crop 기준으로 폭을 맞춤
+                max_width = int(np.ceil(max(crop[1].shape[1] for _, _, crop in batch) / imgH)) * imgH
+                result = get_text(self.reader.character, imgH, max_width, self.reader.recognizer, self.reader.converter,
+                                  [crop for _, _, crop in batch], ignore_char, batch_size=len(batch), workers=0, device=self.reader.device)
+
+                for (image_idx, crop_idx, _), line in zip(batch, result):
+                    texts[image_idx][crop_idx] = line[1]
+
+        except Exception:
+            # batch 처리 실패 시 한 장씩 처리
+            return [self.extract_text(image, return_boxes) for image in images]
+
+        outputs = []
+        for image_crop, image_texts in zip(image_crops, texts):
+            output = {
+                "STATUS" : "200",
+                "STATUS_RESULT" : "성공",
+                "TEXT" : ""
+            }
+
+            # easyocr 결과값에서 텍스트 부분만 정리
+            for text in image_texts:
+                output["TEXT"] += (" " + text)
+
+            # 글자 영역 좌표 (tile OCR 결과를 합칠 때 사용)
+            if return_boxes:
+                output["BOXES"] = [box_bounds(box) + [text] for (box, _), text in zip(image_crop, image_texts)]
+
+            outputs.append(output)
+
+        return outputs
+
+    # ================================================================================================================
+    # 여러 이미지의 글자 영역 검출
+    def detect_batch(self, images):
+        """
+        images : 전처리된 이미지들의 리스트
+
+        크기가 같은 이미지끼리 묶어서 detector를 실행하고, 이미지 별로 recognizer에 넣을 crop 리스트를 입력 순서대로 return 한다.
+        """
+        # 크기가 같은 이미지끼리 묶기
+        shape_groups = {}
+        for image_idx, image in enumerate(images):
+            shape_groups.setdefault(image.shape, []).append(image_idx)
+
+        image_crops = [None] * len(images)
+        for image_indexes in shape_groups.values():
+            reformatted = [reformat_input(images[image_idx]) for image_idx in image_indexes]
+            color_images = np.array([color for color, _ in reformatted])
+
+            horizontal_list_agg, free_list_agg = self.reader.detect(color_images, reformat=False)
+
+            for (_, grey_image), image_idx, horizontal_list, free_list in zip(reformatted, image_indexes, horizontal_list_agg, free_list_agg):
+                image_list, _ = get_image_list(horizontal_list, free_list, grey_image, model_height=imgH)
+                image_crops[image_idx] = image_list
+
+        return image_crops
+
+# ================================================================================================================
+def make_inference(config):
+    """
+    config : 파이프라인 설정값 dict
+
+    'ocr_backend', 'ocr_gpu' 등 OCR 설정값으로 Inference 객체를 만든다.
+
+    'ocr_workers'가 1 이상이면 모델을 한 번 불러온 후 fork한 worker 프로세스들이 모델을 공유하는 OcrWorkerPool을 return 한다. (CPU 전용)
+    """
+    inference = Inference(batch_size=config["ocr_batch_size"],
+                     gpu=config["ocr_gpu"],
+                     backend=config["ocr_backend"],
+                     onnx_directory=config["ocr_onnx_directory"],
+                     quantize=config["ocr_onnx_quantize"],
+                     intra_op_threads=config["ocr_intra_op_threads"],
+                     inter_op_threads=config["ocr_inter_op_threads"],
+                     model_directory=config["ocr_model_directory"],
+                     download_enabled=config["ocr_download_enabled"])
+
+    if not config["ocr_workers"] or config["ocr_workers"] <= 0:
+        return inference
+
+    # CUDA가 초기화된 프로세스는 fork 할 수 없다
+    if config["ocr_gpu"]:
+        logging.warning("ocr_workers is ignored when ocr_gpu is True")
+        return inference
+
+    from ocr_pool import OcrWorkerPool
+    return OcrWorkerPool(inference, config["ocr_workers"], config["ocr_worker_threads"], config["ocr_worker_timeout"])
@@ -0,0 +1,104 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+# 문서 간에 공유하는 OCR 결과 LRU (최대 개수 별로 한 번만 생성)
+shared_ocr_caches = {}
+shared_ocr_caches_lock = threading.Lock()
+
+# ================================================================================================================
+def make_image_key(image):
+    """
+    image : 전처리 전의 numpy 이미지
+
+    이미지의 크기와 픽셀 값으로 hash key를 만든다. 같은 로고, 도장, 표제란 이미지는 같은 key가 나온다.
+    """
+    hasher = hashlib.blake2b(digest_size=20)
+    hasher.update(str((image.shape, image.dtype.str)).encode())
+    hasher.update(image.tobytes())
+
+    return hasher.hexdigest()
+
+# ================================================================================================================
+class OcrLruCache:
+    """
+    # 문서 간 OCR 결과 LRU 캐시
+
+    여러 문서에서 반복되는 이미지의 OCR 결과를 max_entries 개까지 보관한다. (여러 worker thread에서 공유)
+    """
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def put(self, key, result):
+        with self.lock:
+            self.entries[key] = result
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+# ================================================================================================================
+class OcrMemo:
+    """
+    # 이미지 OCR 결과 memoization
+
+    문서 하나를 처리하는 동안 같은 픽셀의 이미지는 전처리와 OCR을 한 번만 하도록 결과를 기억한다.
+
+    shared_cache가 있으면 문서 간에도 결과를 재사용한다.
+    """
+    def __init__(self, shared_cache=None):
+        """
+        shared_cache : 문서 간에 공유하는 OcrLruCache 객체 (None이면 문서 안에서만 재사용)
+        """
+        self.results = {}
+        self.shared_cache = shared_cache
+        # 전처리, OCR을 건너뛴 이미지 수
+        self.deduplicated_count = 0
+
+    def lookup(self, key):
+        """
+        기억된 OCR 결과를 return 한다. 없으면 None을 return 한다.
+        """
+        result = self.results.get(key)
+
+        if result is None and self.shared_cache is not None:
+            result = self.shared_cache.get(key)
+            if result is not None:
+                self.results[key] = result
+
+        return result
+
+    def remember(self, key, result):
+        """
+        성공한 OCR 결과만 기억한다.
+        """
+        if result["STATUS"] != "200":
+            return
+
+        self.results[key] = result
+        if self.shared_cache is not None:
+            self.shared_cache.put(key, result)
+
+# ================================================================================================================
+def get_shared_ocr_cache(max_entries):
+    """
+    max_entries : 문서 간 OCR 결과 캐시의 최대 개수 (0 이하이면 사용하지 않는다)
+
+    최대 개수에 맞는 OcrLruCache를 한 번만 만들어 재사용한다. 사용하지 않으면 None을 return 한다.
+    """
+    if not max_entries or max_entries <= 0:
+        return None
+
+    with shared_ocr_caches_lock:
+        if max_entries not in shared_ocr_caches:
+            shared_ocr_caches[max_entries] = OcrLruCache(max_entries)
+
+    return shared_ocr_caches[max_entries]
@@ -0,0 +1,504 @@
+import gc
+import os
+import math
+import time
+import signal
+import socket
+import logging
+import threading
+import collections
+import multiprocessing
+from multiprocessing import resource_tracker
+from multiprocessing.connection import Listener, Client
+import numpy as np
+import torch
+from ocr import OCR_BACKEND_ONNX
+from preprocess_pool import to_shared_memory, attach_shared_memory
+from error_status import *
+
+# fork한 worker 프로세스가 부모 프로세스에서 물려받아 사용하는 ocr.Inference 객체
+worker_inference = None
+
+# 생성 직후 비정상 종료된 worker를 다시 만들기 전에 기다리는 시간(초) (초기화 에러로 fork가 반복되지 않게 한다)
+RESPAWN_DELAY = 1.0
+
+# ================================================================================================================
+def share_model_memory(inference):
+    """
+    inference : CPU에서 불러온 ocr.Inference 객체
+
+    PyTorch 모델(detector, recognizer)의 가중치를 shared memory로 옮긴다.
+
+    fork한 worker들이 같은 물리 메모리의 가중치를 읽으며, 한 프로세스가 가중치 근처의 메모리를 건드려도 복사(copy-on-write)되지 않는다.
+    """
+    for model in (inference.reader.detector, inference.reader.recognizer):
+        if isinstance(model, torch.nn.Module):
+            model.share_memory()
+
+def init_ocr_worker(threads):
+    """
+    threads : worker 하나가 사용할 연산 thread 수
+
+    fork 직후 worker 프로세스에서 연산 thread 수를 맞춘다. ONNX Runtime session은 fork로 이어지지 않으므로 다시 만든다.
+    """
+    torch.set_num_threads(threads)
+
+    if worker_inference.backend == OCR_BACKEND_ONNX:
+        worker_inference.model_loader.attach_onnx_sessions(worker_inference.reader, threads, 0)
+
+def ocr_worker(method, image_infos, kwargs):
+    """
+    method : 실행할 ocr.Inference 메소드 이름 ("extract_text", "extract_text_batch")
+    image_infos : 이미지들의 shared memory 정보 리스트
+    kwargs : 메소드에 넘길 인자
+
+    worker 프로세스에서 shared memory의 이미지를 복사 없이 연결해서 OCR 하고, 이미지 별 결과값 리스트를 return 한다.
+    """
+    shms = []
+    images = []
+
+    try:
+        for image_info in image_infos:
+            shm, image = attach_shared_memory(image_info)
+            shms.append(shm)
+            images.append(image)
+
+        if method == "extract_text":
+            return [worker_inference.extract_text(images[0], **kwargs)]
+
+        return worker_inference.extract_text_batch(images, **kwargs)
+
+    finally:
+        del images
+        for shm in shms:
+            shm.close()
+
+def run_ocr_worker(address, authkey, threads):
+    """
+    address : 부모 프로세스의 worker 접속 주소 (multiprocessing.connection.Listener)
+    authkey : 접속 인증 key
+    threads : worker 하나가 사용할 연산 thread 수
+
+    worker 프로세스의 작업 loop. 부모 프로세스에 접속해서 pid를 보낸 후, 자기 연결로 (메소드 이름, 이미지 정보, 인자)를 받아서 OCR 하고 결과를 보낸다.
+
+    worker마다 연결이 따로 있으므로 다른 worker와 lock을 나눠 쓰지 않는다. None을 받거나 부모 프로세스의 연결이 끊기면 끝난다.
+    """
+    init_ocr_worker(threads)
+
+    # pool이 종료되어 접속할 수 없으면 정상 종료 (template이 다시 만들지 않는다)
+    try:
+        conn = Client(address, authkey=authkey)
+        conn.send(os.getpid())
+    except (OSError, EOFError):
+        return
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+
+        method, image_infos, kwargs = task
+        try:
+            outputs = ocr_worker(method, image_infos, kwargs)
+        except Exception:
+            # 이미지 별 결과값 리스트 대신 에러 결과값 하나를 보낸다
+            outputs = extract_error_status({"STATUS" : "", "STATUS_RESULT" : "", "TEXT" : ""})
+
+        conn.send(outputs)
+
+def run_worker_template(process_count, threads, address, authkey):
+    """
+    # OCR worker template 프로세스
+
+    process_count : worker 프로세스 개수
+    threads : worker 하나가 사용할 연산 thread 수
+    address, authkey : 부모 프로세스의 worker 접속 주소와 인증 key
+
+    pool을 만들 때 부모 프로세스에서 한 번 fork한 프로세스로, OCR을 실행하지 않고 thread도 만들지 않은 상태를 유지하면서 worker들을 fork 한다.
+
+    worker가 비정상 종료되면 이 프로세스에서 새 worker를 fork 한다.
+    (서비스의 thread, OpenMP thread가 생긴 부모 프로세스를 다시 fork 하지 않는다)
+
+    모든 worker가 정상 종료(exit code 0)하면 끝난다.
+    """
+    def spawn_worker():
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                run_ocr_worker(address, authkey, threads)
+            except BaseException:
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+
+        return pid
+
+    # {pid : fork 한 시각}
+    workers = {}
+    for _ in range(process_count):
+        workers[spawn_worker()] = time.monotonic()
+
+    while workers:
+        pid, status = os.wait()
+        if pid not in workers:
+            continue
+
+        spawned_at = workers.pop(pid)
+        exit_code = os.waitstatus_to_exitcode(status)
+        if exit_code == 0:
+            continue
+
+        logging.error("ocr worker {} died (exit code {})".format(pid, exit_code))
+        if time.monotonic() - spawned_at < RESPAWN_DELAY:
+            time.sleep(RESPAWN_DELAY)
+        workers[spawn_worker()] = time.monotonic()
+
+# ================================================================================================================
+class OcrTask:
+    """
+    worker 하나에 넘길 이미지 그룹의 작업 상태. 결과값(이미지 별 결과값 리스트 또는 에러 결과값 dict)이 오면 'finish'로 기록한다.
+    """
+    def __init__(self, message):
+        """
+        message : worker에 보낼 (메소드 이름, 이미지 정보, 인자)
+        """
+        self.message = message
+        self.event = threading.Event()
+        self.outputs = None
+        # 작업을 넘겨받은 OcrWorker (넘기기 전이면 None)
+        self.worker = None
+
+    def finish(self, outputs):
+        if self.event.is_set():
+            return
+
+        self.outputs = outputs
+        self.event.set()
+
+class OcrWorker:
+    """
+    부모 프로세스에 접속한 worker 프로세스 하나의 연결과 넘겨준 작업
+    """
+    def __init__(self, pid, conn):
+        self.pid = pid
+        self.conn = conn
+        # 실행 중인 OcrTask (쉬고 있으면 None)
+        self.task = None
+
+def make_worker_error(status_result):
+    return {"STATUS" : "500", "STATUS_RESULT" : status_result, "TEXT" : ""}
+
+class OcrWorkerPool:
+    """
+    # OCR worker 프로세스 pool
+
+    부모 프로세스에서 한 번 불러온 모델을 fork한 worker 프로세스들이 공유해서 OCR 한다.
+
+    1. 가중치는 shared memory로 옮긴 후 fork 하므로 worker마다 모델을 다시 불러오지 않고, worker 당 추가 메모리는 실행 중의 중간 결과 정도이다.
+    2. 'extract_text', 'extract_text_batch'는 ocr.Inference와 같은 형식이며, 이미지는 shared memory로 worker에 넘긴다.
+    3. 'extract_text_batch'는 이미지들을 worker 수만큼 나눠서 동시에 처리하고 결과는 입력 순서대로 return 한다.
+    4. 작업은 부모 프로세스가 쉬고 있는 worker를 골라서 그 worker의 연결로만 보낸다. (worker끼리 나눠 쓰는 queue, lock이 없다)
+    5. worker가 비정상 종료(OOM, timeout으로 종료 등)되면 연결이 끊기므로 그 worker에 넘긴 작업은 바로 에러 결과값을 return 하고,
+       template 프로세스가 새 worker를 만든다.
+
+    template 프로세스를 생성할 때 한 번 fork 하므로, 서비스의 worker thread를 시작하기 전이고 부모 프로세스에서 OCR을 실행하기 전(OpenMP thread 생성 전)에 만들어야 한다.
+    """
+    def __init__(self, inference, process_count, threads=1, timeout=600):
+        """
+        inference : CPU에서 불러온 ocr.Inference 객체
+        process_count : worker 프로세스 개수
+        threads : worker 하나가 사용할 연산 thread 수
+        timeout : worker 하나에 넘긴 이미지들의 결과를 기다리는 최대 시간(초) (넘으면 worker를 종료시키고 에러 결과값을 넣는다)
+        """
+        global worker_inference
+
+        self.batch_size = inference.batch_size
+        self.backend = inference.backend
+        self.process_count = process_count
+        self.timeout = timeout
+
+        share_model_memory(inference)
+        worker_inference = inference
+
+        # worker들이 shared memory를 부모 프로세스의 resource tracker에 등록하도록 fork 전에 시작 (unlink는 부모 프로세스에서만 한다)
+        resource_tracker.ensure_running()
+
+        # worker들이 각자 접속할 주소 (worker 마다 따로 연결된다)
+        self.authkey = os.urandom(32)
+        self.listener = Listener(family="AF_UNIX", backlog=max(1, process_count), authkey=self.authkey)
+
+        self.lock = threading.Lock()
+        # 접속한 worker {pid : OcrWorker}
+        self.workers = {}
+        # 작업을 기다리는 worker와 worker를 기다리는 작업
+        self.idle_workers = []
+        self.pending_tasks = collections.deque()
+        self.closing = False
+
+        # 부모 프로세스의 객체들을 gc 대상에서 빼서 template, worker의 gc가 객체 header를 건드려 메모리가 복사되지 않게 한다
+        gc.collect()
+        gc.freeze()
+
+        context = multiprocessing.get_context("fork")
+        self.template = context.Process(target=run_worker_template,
+                                        args=(process_count, threads, self.listener.address, self.authkey),
+                                        name="ocr-worker-template",
+                                        daemon=True)
+        self.template.start()
+
+        # 오래 실행되는 서비스 프로세스에서는 이후에 만든 객체들이 다시 gc 대상이 되도록 되돌린다 (template은 fork 시점의 상태 유지)
+        gc.unfreeze()
+
+        self.acceptor = threading.Thread(target=self.accept_workers, name="ocr-worker-accept", daemon=True)
+        self.acceptor.start()
+        self.receivers = []
+
+    def accept_workers(self):
+        """
+        worker 프로세스의 접속을 받아서 등록하고, worker 별 결과 수신 thread를 시작하는 thread.
+        """
+        while True:
+            try:
+                conn = self.listener.accept()
+            except Exception:
+                # 종료 중이면 'shutdown'이 인증 없이 접속해서 깨운 것이므로 끝난다
+                if self.closing:
+                    return
+                logging.exception("ocr worker accept failed")
+                continue
+
+            if self.closing:
+                # 종료 중에 새로 만들어진 worker는 바로 끝낸다
+                try:
+                    conn.send(None)
+                except OSError:
+                    pass
+                conn.close()
+                continue
+
+            try:
+                worker = OcrWorker(conn.recv(), conn)
+            except Exception:
+                logging.exception("invalid ocr worker message")
+                conn.close()
+                continue
+
+            receiver = threading.Thread(target=self.receive_results, args=(worker,), name="ocr-worker-{}".format(worker.pid), daemon=True)
+            with self.lock:
+                self.workers[worker.pid] = worker
+                self.idle_workers.append(worker)
+                self.receivers = [thread for thread in self.receivers if thread.is_alive()] + [receiver]
+                self.dispatch()
+            receiver.start()
+
+    def receive_results(self, worker):
+        """
+        worker 하나의 결과를 받아서 작업 상태에 기록하는 thread.
+
+        연결이 끊기면(worker 종료) 넘겨준 작업을 기다리지 않고 바로 에러 결과값으로 끝낸다.
+        """
+        while True:
+            try:
+                outputs = worker.conn.recv()
+            except (EOFError, OSError):
+                break
+            except Exception:
+                logging.exception("invalid ocr worker message")
+                break
+
+            with self.lock:
+                task, worker.task = worker.task, None
+                if task is not None:
+                    task.finish(outputs)
+                if not self.closing:
+                    self.idle_workers.append(worker)
+                    self.dispatch()
+
+        with self.lock:
+            self.workers.pop(worker.pid, None)
+            if worker in self.idle_workers:
+                self.idle_workers.remove(worker)
+            task, worker.task = worker.task, None
+            closing = self.closing
+
+        worker.conn.close()
+        if task is not None:
+            task.finish(make_worker_error("ocr worker {} died".format(worker.pid)))
+        if not closing:
+            logging.error("ocr worker {} disconnected".format(worker.pid))
+
+    def dispatch(self):
+        """
+        기다리는 작업을 쉬고 있는 worker에 넘긴다. (self.lock을 잡은 상태에서 호출)
+
+        보낸 작업은 worker에 기록해서, worker가 작업을 시작하기 전에 종료되어도 그 작업이 바로 에러로 끝나게 한다.
+        """
+        while self.pending_tasks and self.idle_workers and not self.closing:
+            worker = self.idle_workers.pop(0)
+            task = self.pending_tasks.popleft()
+            try:
+                worker.conn.send(task.message)
+            except OSError:
+                # 종료된 worker (수신 thread가 정리한다)
+                self.pending_tasks.appendleft(task)
+                continue
+
+            worker.task = task
+            task.worker = worker
+
+    def submit(self, method, image_infos, kwargs):
+        task = OcrTask((method, image_infos, kwargs))
+        with self.lock:
+            if self.closing:
+                task.finish(make_worker_error("ocr worker pool is shut down"))
+                return task
+
+            self.pending_tasks.append(task)
+            self.dispatch()
+
+        return task
+
+    def wait(self, task):
+        """
+        작업의 결과값을 timeout 까지 기다린다. 시간 안에 끝나지 않으면 실행 중인 worker를 종료시키고 에러 결과값을 return 한다.
+        """
+        if task.event.wait(self.timeout):
+            return task.outputs
+
+        with self.lock:
+            if task.event.is_set():
+                return task.outputs
+
+            if task in self.pending_tasks:
+                self.pending_tasks.remove(task)
+            worker = task.worker
+            task.finish(make_worker_error("ocr worker timeout ({} seconds)".format(self.timeout)))
+
+        if worker is not None:
+            # 멈춘 worker는 종료시키고 template이 새로 만든다
+            try:
+                os.kill(worker.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+        return task.outputs
+
+    def run(self, method, image_groups, kwargs):
+        """
+        image_groups : worker 하나에 넘길 이미지 리스트들의 리스트
+
+        이미지 그룹 별로 worker에서 'ocr_worker'를 실행하고 결과값들을 입력 순서대로 이어서 return 한다.
+
+        worker가 비정상 종료되었거나 timeout 안에 결과를 받지 못한 그룹은 이미지 별 에러 결과값을 넣는다.
+        """
+        shms = []
+        tasks = []
+        outputs = []
+
+        try:
+            for images in image_groups:
+                image_infos = []
+                for image in images:
+                    shm, image_info = to_shared_memory(np.ascontiguousarray(image))
+                    shms.append(shm)
+                    image_infos.append(image_info)
+
+                tasks.append((self.submit(method, image_infos, kwargs), len(images)))
+
+            for task, image_count in tasks:
+                task_outputs = self.wait(task)
+                if isinstance(task_outputs, dict):
+                    logging.error("ocr worker failed : {}".format(task_outputs["STATUS_RESULT"]))
+                    task_outputs = [dict(task_outputs) for _ in range(image_count)]
+                outputs += task_outputs
+
+        finally:
+            # 에러로 중간에 멈췄으면 아직 넘기지 않은 작업은 취소
+            with self.lock:
+                for task, _ in tasks:
+                    if task in self.pending_tasks:
+                        self.pending_tasks.remove(task)
+
+            for shm in shms:
+                shm.close()
+                shm.unlink()
+
+        return outputs
+
+    # ocr로 텍스트 추출
+    def extract_text(self, image, return_boxes=False):
+        return self.run("extract_text", [[image]], {"return_boxes" : return_boxes})[0]
+
+    # 여러 이미지를 worker들에 나눠서 ocr로 텍스트 추출
+    def extract_text_batch(self, images, batch_size=None, return_boxes=False):
+        """
+        images : 전처리된 이미지들의 리스트
+        batch_size : recognizer에 한 번에 넣을 글자 영역 수 (None이면 인스턴스의 batch_size)
+        return_boxes : 결과값에 글자 영역 좌표 리스트를 함께 넣을지 여부
+
+        이미지들을 순서대로 worker 수만큼 나눠서 worker 별로 'extract_text_batch'를 실행한다.
+        """
+        if not images:
+            return []
+
+        group_size = math.ceil(len(images) / self.process_count)
+        image_groups = [images[start:start + group_size] for start in range(0, len(images), group_size)]
+
+        return self.run("extract_text_batch", image_groups, {"batch_size" : batch_size if batch_size is not None else self.batch_size, "return_boxes" : return_boxes})
+
+    def shutdown(self, timeout=5):
+        """
+        worker들에 종료 신호를 보내고 timeout 초 안에 끝나지 않으면 worker와 template 프로세스를 종료시킨다.
+
+        기다리던 작업과 끝나지 않은 작업은 에러 결과값으로 끝낸다.
+        """
+        with self.lock:
+            self.closing = True
+            pending_tasks = list(self.pending_tasks)
+            self.pending_tasks.clear()
+            workers = list(self.workers.values())
+
+        for task in pending_tasks:
+            task.finish(make_worker_error("ocr worker pool is shut down"))
+
+        # 실행 중인 worker는 작업을 끝낸 후 종료 신호를 읽는다
+        for worker in workers:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+
+        # 접속을 기다리는 thread를 인증 없는 접속으로 깨워서 끝내고 listener를 닫는다
+        # (이후에 만들어지는 worker는 접속하지 못하고 정상 종료한다)
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as wakeup:
+                wakeup.connect(self.listener.address)
+        except OSError:
+            pass
+        self.acceptor.join(timeout)
+        self.listener.close()
+
+        self.template.join(timeout)
+        if self.template.is_alive():
+            self.template.terminate()
+            self.template.join()
+
+            for worker in workers:
+                try:
+                    os.kill(worker.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+        with self.lock:
+            receivers = list(self.receivers)
+        for receiver in receivers:
+            receiver.join(timeout)
+
+        for worker in workers:
+            task, worker.task = worker.task, None
+            if task is not None:
+                task.finish(make_worker_error("ocr worker pool is shut down"))
@@ -0,0 +1,174 @@
+import cv2
+import fitz
+from classify_page import get_page_block_info, classify_page
+
+# 페이지 회전 각도를 결정한 단계
+# text : 텍스트 라인 방향, page_rotate : 페이지 /Rotate 값, image_transform : 삽입 이미지의 변환 행렬
+# osd : 축소 흑백 이미지의 Tesseract OSD, osd_error : OSD 에러 (회전하지 않음)
+ORIENTATION_TIER_TEXT = "text"
+ORIENTATION_TIER_PAGE_ROTATE = "page_rotate"
+ORIENTATION_TIER_IMAGE_TRANSFORM = "image_transform"
+ORIENTATION_TIER_OSD = "osd"
+ORIENTATION_TIER_OSD_ERROR = "osd_error"
+
+# ================================================================================================================
+def rotation_of_vector(x, y):
+    """
+    x, y : 화면 좌표계(y축 아래 방향)의 방향 벡터
+
+    벡터가 가리키는 방향을 0, 90, 180, 270 중 하나로 return 한다. (시계방향 기준)
+    """
+    if abs(x) >= abs(y):
+        return 0 if x > 0 else 180
+
+    return 90 if y > 0 else 270
+
+# ================================================================================================================
+def detect_text_rotation(page, min_chars=20, min_ratio=0.8):
+    """
+    # 텍스트 라인 방향으로 회전 각도 감지
+
+    page : fitz 모듈로 연 pdf 문서의 페이지
+    min_chars : 판단에 필요한 최소 글자 수
+    min_ratio : 가장 많은 방향의 글자 비율이 이 값 이상일 때만 판단
+
+    'get_text("dict")'의 라인 방향(dir)을 페이지 /Rotate가 적용된 화면 방향으로 바꿔서 글자 수로 투표한다.
+
+    렌더링된 이미지를 시계방향으로 회전시켜야 할 각도를 return 한다. 판단할 수 없으면 None을 return 한다.
+    """
+    # 텍스트 좌표는 회전 전 페이지 기준이므로 화면 방향으로 변환
+    matrix = page.rotation_matrix
+
+    votes = {0 : 0, 90 : 0, 180 : 0, 270 : 0}
+    for block in page.get_text("dict", flags=0)["blocks"]:
+        for line in block.get("lines", []):
+            cos, sin = line["dir"]
+            char_count = sum(len(span["text"].strip()) for span in line["spans"])
+
+            x = matrix.a * cos + matrix.c * sin
+            y = matrix.b * cos + matrix.d * sin
+            votes[rotation_of_vector(x, y)] += char_count
+
+    total_chars = sum(votes.values())
+    text_direction = max(votes, key=votes.get)
+
+    if total_chars < min_chars or votes[text_direction] < total_chars * min_ratio:
+        return None
+
+    # 글자가 시계방향으로 text_direction 만큼 누워 있으므로 나머지 각도만큼 더 돌리면 바로 선다
+    return (360 - text_direction) % 360
+
+# ================================================================================================================
+def detect_page_rotate(page, min_chars=1, min_ratio=0.5):
+    """
+    # 페이지 /Rotate 값으로 회전 각도 감지
+
+    page : fitz 모듈로 연 pdf 문서의 페이지
+    min_chars : /Rotate와 비교할 텍스트의 최소 글자 수
+    min_ratio : 가장 많은 방향의 글자 비율이 이 값 이상일 때만 비교
+
+    페이지에 /Rotate 값이 지정되어 있고, /Rotate가 적용된 화면에서 텍스트 레이어가 바로 서 있으면 0을 return 한다.
+
+    텍스트 단계보다 적은 글자로도 판단하지만, /Rotate 값만으로는 판단하지 않는다. (도면처럼 /Rotate가 있어도 옆으로 누운 페이지가 있다)
+
+    렌더링 결과에는 /Rotate가 이미 적용되어 있으므로 추가 회전은 없다. 텍스트가 없거나 방향이 다르면 None을 return 한다. (OSD로 넘긴다)
+
+    스캔 이미지가 있는 페이지는 텍스트 레이어가 있어도 스캔 자체가 뒤집혀 있을 수 있으므로 판단하지 않고 None을 return 한다.
+    """
+    if page.rotation % 360 == 0 or has_scanned_image(page):
+        return None
+
+    if detect_text_rotation(page, min_chars, min_ratio) != 0:
+        return None
+
+    return 0
+
+def has_scanned_image(page, min_coverage=0.5):
+    """
+    page : fitz 모듈로 연 pdf 문서의 페이지
+    min_coverage : 페이지 면적 대비 이미지 면적의 최소 비율
+
+    DeviceGray 이미지 블록이 있거나('classify_page'와 같은 기준) 페이지 대부분을 덮는 이미지가 있으면 True를 return 한다.
+    """
+    if classify_page(get_page_block_info(page))["devicegray"]:
+        return True
+
+    page_area = abs(page.rect)
+    for image_info in page.get_image_info():
+        if abs(fitz.Rect(image_info["bbox"]) & page.rect) >= page_area * min_coverage:
+            return True
+
+    return False
+
+# ================================================================================================================
+def detect_image_transform_rotation(page, min_coverage=0.5):
+    """
+    # 삽입 이미지 변환 행렬로 회전 각도 감지
+
+    page : fitz 모듈로 연 pdf 문서의 페이지
+    min_coverage : 페이지 면적 대비 이미지 면적의 최소 비율
+
+    페이지 대부분을 덮는 스캔 이미지가 90도 단위로 회전되어 배치되어 있으면, 스캔 후에 방향을 맞춘 것으로 보고 0을 return 한다.
+
+    회전 없이 배치된 이미지는 스캔한 방향 그대로일 수 있으므로 판단하지 않고 None을 return 한다.
+    """
+    page_area = abs(page.rect)
+    if page_area == 0:
+        return None
+
+    for image_info in page.get_image_info():
+        if abs(fitz.Rect(image_info["bbox"]) & page.rect) < page_area * min_coverage:
+            continue
+
+        # 이미지 변환 행렬에 페이지 /Rotate를 합친 화면 기준 회전
+        matrix = fitz.Matrix(image_info["transform"]) * page.rotation_matrix
+        if rotation_of_vector(matrix.a, matrix.b) != 0:
+            return 0
+
+    return None
+
+# ================================================================================================================
+def detect_free_rotation(page, tiers, min_text_chars=20):
+    """
+    # 메타데이터로 회전 각도 감지
+
+    page : fitz 모듈로 연 pdf 문서의 페이지
+    tiers : 사용할 단계들의 리스트 (ORIENTATION_TIER_TEXT, ORIENTATION_TIER_PAGE_ROTATE, ORIENTATION_TIER_IMAGE_TRANSFORM)
+    min_text_chars : 텍스트 단계에서 판단에 필요한 최소 글자 수
+
+    렌더링, OSD 없이 PyMuPDF 정보만으로 단계 순서대로 회전 각도를 찾는다.
+
+    (시계방향으로 회전되어야 할 각도, 결정한 단계)를 return 한다. 판단할 수 없으면 (None, None)을 return 한다.
+    """
+    detectors = {
+        ORIENTATION_TIER_TEXT : lambda : detect_text_rotation(page, min_text_chars),
+        ORIENTATION_TIER_PAGE_ROTATE : lambda : detect_page_rotate(page),
+        ORIENTATION_TIER_IMAGE_TRANSFORM : lambda : detect_image_transform_rotation(page),
+    }
+
+    for tier in tiers:
+        if tier not in detectors:
+            continue
+
+        degree = detectors[tier]()
+        if degree is not None:
+            return degree, tier
+
+    return None, None
+
+# ================================================================================================================
+def make_osd_thumbnail(gray_image, max_size):
+    """
+    gray_image : 흑백 이미지
+    max_size : 긴 변의 최대 길이 (0 이하이면 축소하지 않는다)
+
+    OSD에 사용할 축소 흑백 이미지를 return 한다. 이미 작으면 원본을 그대로 return 한다.
+    """
+    height, width = gray_image.shape[:2]
+    long_side = max(height, width)
+
+    if max_size <= 0 or long_side <= max_size:
+        return gray_image
+
+    scale = max_size / long_side
+    return cv2.resize(gray_image, (max(1, round(width * scale)), max(1, round(height * scale))), interpolation=cv2.INTER_AREA)
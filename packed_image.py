@@ -0,0 +1,145 @@
+import json
+import struct
+import tempfile
+
+# 패킹 파일 footer 형식 : magic(8 bytes) + index offset(8 bytes) + index length(8 bytes)
+PACK_MAGIC = b"KPNGPACK"
+PACK_FOOTER = struct.Struct(">8sQQ")
+
+# 패킹 파일에 저장되는 이미지 종류
+PAGE_IMAGE = "page"
+INNER_IMAGE = "inner"
+
+# ================================================================================================================
+def make_pack_path(png_output_directory):
+    """
+    png_output_directory : 디렉토리 방식에서 pdf 문서의 png가 저장되는 디렉토리 경로
+
+    같은 문서의 패킹 파일 경로를 return 한다.
+    ex) /sdata/gpudir/lake/png/pdf_name => /sdata/gpudir/lake/png/pdf_name.pack
+    """
+    return png_output_directory.rstrip("/") + ".pack"
+
+def make_inner_image_manifest_path(png_output_directory):
+    """
+    png_output_directory : 디렉토리 방식에서 pdf 문서의 png가 저장되는 디렉토리 경로
+
+    디렉토리 방식에서 여러 번 참조되는 삽입 이미지의 참조 목록(manifest) 파일 경로를 return 한다.
+    ex) /sdata/gpudir/lake/png/pdf_name => /sdata/gpudir/lake/png/pdf_name/inner_images.json
+    """
+    return png_output_directory.rstrip("/") + "/inner_images.json"
+
+# ================================================================================================================
+class PackedImageWriter:
+    """
+    # 문서 단위 이미지 패킹
+
+    문서 하나의 페이지 이미지와 삽입 이미지들을 하나의 파일로 묶어 hdfs에 저장한다.
+
+    파일 구조 : [이미지 데이터들][index json][footer]
+
+    index에는 이미지 별로 종류, 페이지 번호, 순번, offset, length가 기록되어 range read로 이미지 하나만 읽을 수 있다.
+    """
+    def __init__(self, fs, pack_path, spool_size=64 * 1024 * 1024):
+        """
+        fs : pyhdfs의 HdfsClient 객체
+        pack_path : 패킹 파일이 저장될 hdfs 경로
+        spool_size : 메모리에 버퍼링할 최대 크기 (넘으면 로컬 임시 파일로 넘긴다)
+        """
+        self.fs = fs
+        self.pack_path = pack_path
+        self.buffer = tempfile.SpooledTemporaryFile(max_size=spool_size)
+        self.entries = []
+        self.offset = 0
+        # (종류, 페이지 번호, 순번) => index entry ('add_reference'에서 같은 데이터를 가리킬 때 사용)
+        self.entry_map = {}
+
+    def add_image(self, kind, page_num, index, image_content):
+        """
+        kind : 이미지 종류 (PAGE_IMAGE, INNER_IMAGE)
+        page_num : 페이지 번호(0부터 시작)
+        index : 페이지 안에서의 이미지 순번(0부터 시작, 페이지 이미지는 0)
+        image_content : 이미지 파일의 바이너리 데이터
+        """
+        self.buffer.write(image_content)
+        self.entries.append({
+                            "kind" : kind,
+                            "page" : page_num,
+                            "index" : index,
+                            "offset" : self.offset,
+                            "length" : len(image_content)
+                            })
+        self.entry_map[(kind, page_num, index)] = self.entries[-1]
+        self.offset += len(image_content)
+
+    def add_reference(self, kind, page_num, index, target):
+        """
+        kind, page_num, index : 추가할 이미지의 종류, 페이지 번호, 순번
+        target : 이미 추가한 같은 이미지의 (종류, 페이지 번호, 순번)
+
+        데이터를 다시 쓰지 않고 이미 추가한 이미지와 같은 offset, length를 가리키는 index entry만 추가한다.
+        """
+        target_entry = self.entry_map[target]
+        self.entries.append({
+                            "kind" : kind,
+                            "page" : page_num,
+                            "index" : index,
+                            "offset" : target_entry["offset"],
+                            "length" : target_entry["length"]
+                            })
+
+    def close(self):
+        """
+        index와 footer를 붙여서 hdfs에 한 번에 저장한다.
+        """
+        index = json.dumps({"version" : 1, "entries" : self.entries}).encode()
+        self.buffer.write(index)
+        self.buffer.write(PACK_FOOTER.pack(PACK_MAGIC, self.offset, len(index)))
+
+        self.buffer.seek(0)
+        self.fs.create(self.pack_path, self.buffer, overwrite=True)
+        self.buffer.close()
+
+    def abort(self):
+        """
+        저장하지 않고 버퍼만 정리한다.
+        """
+        self.buffer.close()
+
+# ================================================================================================================
+class PackedImageReader:
+    """
+    # 패킹 파일 읽기
+
+    footer와 index만 먼저 읽은 뒤, 요청한 이미지 하나만 range read로 불러온다.
+    """
+    def __init__(self, fs, pack_path):
+        """
+        fs : pyhdfs의 HdfsClient 객체
+        pack_path : 패킹 파일의 hdfs 경로
+        """
+        self.fs = fs
+        self.pack_path = pack_path
+
+        # footer 읽기
+        file_length = self.fs.get_file_status(pack_path).length
+        magic, index_offset, index_length = PACK_FOOTER.unpack(self.read_range(file_length - PACK_FOOTER.size, PACK_FOOTER.size))
+        if magic != PACK_MAGIC:
+            raise ValueError(f"not a packed image file : {pack_path}")
+
+        # index 읽기
+        index = json.loads(self.read_range(index_offset, index_length))
+        self.entries = {(entry["kind"], entry["page"], entry["index"]) : entry for entry in index["entries"]}
+
+    def read_range(self, offset, length):
+        with self.fs.open(self.pack_path, offset=offset, length=length) as fp:
+            return fp.read()
+
+    # 이미지 하나 불러오기
+    def read_image(self, kind, page_num, index=0):
+        entry = self.entries[(kind, page_num, index)]
+        return self.read_range(entry["offset"], entry["length"])
+
+    # 페이지의 삽입 이미지 개수
+    def count_inner_images(self, page_num):
+        return sum(1 for kind, page, index in self.entries if kind == INNER_IMAGE and page == page_num)
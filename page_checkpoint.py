@@ -0,0 +1,156 @@
+import os
+import json
+import logging
+
+# ================================================================================================================
+def make_checkpoint_path(json_path, file_name):
+    """
+    json_path : json파일이 저장될 hdfs의 json 저장소의 경로
+    file_name : pdf 파일의 이름
+
+    문서의 페이지 체크포인트 경로를 return 한다. (결과 json 옆에 '.pages.jsonl'로 저장)
+    """
+    return os.path.join(json_path, f"{file_name}.pages.jsonl")
+
+def is_valid_entry(entry):
+    """
+    entry : 체크포인트 파일의 한 줄을 json으로 읽은 값
+
+    'extract_text'가 결과값을 만들 때 사용하는 필드들이 모두 맞는 형태로 들어있으면 True를 return 한다.
+    """
+    if not isinstance(entry, dict) or not isinstance(entry.get("RECORD"), dict):
+        return False
+
+    record = entry["RECORD"]
+    return (
+        isinstance(entry.get("PAGE"), int)
+        and isinstance(entry.get("SCANNED_COUNT"), int)
+        and isinstance(entry.get("FULL_TEXT"), str)
+        and "PAGE_KIND" in entry
+        and isinstance(record.get("page_status"), str)
+        and "page_number" in record
+    )
+
+# ================================================================================================================
+class PageCheckpoint:
+    """
+    # 페이지 단위 체크포인트
+
+    'extract_text'가 끝낸 페이지의 결과를 hdfs의 jsonl 파일에 window 단위로 추가한다.
+
+    첫 줄은 pdf 내용과 설정으로 만든 key를 기록한 header이며, 다음 줄부터 페이지 하나의 결과가 한 줄씩 들어간다.
+    {"PAGE", "PAGE_KIND", "SCANNED_COUNT", "FULL_TEXT", "RECORD"}
+
+    같은 문서를 다시 처리할 때 key가 같으면 성공한 페이지의 결과를 그대로 사용하고, 실패했거나 기록이 없는 페이지만 다시 처리한다.
+
+    문서의 모든 페이지가 성공하면 체크포인트를 삭제한다.
+    """
+    def __init__(self, fs, path, key):
+        """
+        fs : hdfs client
+        path : 체크포인트 파일 경로
+        key : pdf 내용과 결과값에 영향을 주는 설정으로 만든 key (result_cache.make_cache_key)
+        """
+        self.fs = fs
+        self.path = path
+        self.key = key
+        # 이번 실행에서 체크포인트 파일을 사용할 수 있는 상태인지 여부 (header가 맞는 파일이 있거나 새로 만들었으면 True)
+        self.opened = False
+        # 불러올 때 hdfs에 체크포인트 파일이 있었는지 여부 (key가 달라도 True)
+        self.found = False
+        # 쓰기가 한 번 실패하면 이번 실행에서는 더 이상 기록하지 않는다
+        self.disabled = False
+        self._entries = None
+
+    def load(self):
+        """
+        key가 같은 체크포인트에서 성공한 페이지들의 결과를 {page_number : 페이지 결과} 형태로 return 한다.
+
+        파일이 없거나, key가 다르거나, 읽을 수 없으면 빈 dict를 return 한다.
+        """
+        if self._entries is not None:
+            return self._entries
+
+        self._entries = {}
+        try:
+            if not self.fs.exists(self.path):
+                return self._entries
+
+            self.found = True
+            with self.fs.open(self.path) as fp:
+                lines = fp.read().decode("utf-8").splitlines()
+
+        except Exception:
+            logging.exception("page checkpoint read failed : {}".format(self.path))
+            return self._entries
+
+        if not lines or not self.is_valid_header(lines[0]):
+            logging.info("page checkpoint is stale, ignored : {}".format(self.path))
+            return self._entries
+
+        self.opened = True
+
+        # 같은 페이지가 여러 번 기록되어 있으면 마지막 기록을 사용
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # 빈 줄 또는 쓰는 도중 끊긴 줄
+                continue
+
+            # json 형식은 맞지만 페이지 결과 형태가 아닌 줄도 무시
+            if not is_valid_entry(entry):
+                continue
+
+            if entry["RECORD"]["page_status"] == "200":
+                self._entries[entry["PAGE"]] = entry
+            else:
+                self._entries.pop(entry["PAGE"], None)
+
+        logging.info("page checkpoint loaded : {} pages".format(len(self._entries)))
+
+        return self._entries
+
+    def is_valid_header(self, line):
+        try:
+            return json.loads(line).get("CHECKPOINT_KEY") == self.key
+        except (json.JSONDecodeError, AttributeError):
+            return False
+
+    def write(self, entries):
+        """
+        entries : 'extract_page_text' 함수가 return 한 페이지 결과들의 리스트
+
+        페이지 결과들을 체크포인트에 추가한다. 처음 쓸 때는 header와 함께 파일을 새로 만든다.
+
+        체크포인트는 문서 처리의 부가 기록이므로 쓰기에 실패해도 에러를 올리지 않고, 로그를 남긴 후 이번 실행의 기록을 중단한다.
+        """
+        if not entries or self.disabled:
+            return
+
+        data = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries)
+
+        try:
+            if self.opened:
+                # 이전 쓰기가 줄 중간에서 끊겼어도 새 기록이 그 줄에 붙지 않도록 줄바꿈부터 쓴다 (빈 줄은 읽을 때 무시)
+                self.fs.append(self.path, ("\n" + data).encode("utf-8"))
+            else:
+                header = json.dumps({"CHECKPOINT_KEY" : self.key}) + "\n"
+                self.fs.create(self.path, (header + data).encode("utf-8"), overwrite=True)
+                self.opened = True
+
+        except Exception:
+            logging.exception("page checkpoint write failed, checkpoint disabled : {}".format(self.path))
+            self.disabled = True
+
+    def remove(self):
+        """
+        이번 실행에서 쓰거나 불러온 체크포인트 파일이 있으면 삭제한다. (실패하면 로그만 남긴다)
+        """
+        if self.opened or self.found:
+            try:
+                self.fs.delete(self.path)
+            except Exception:
+                logging.exception("page checkpoint remove failed : {}".format(self.path))
+        self.opened = False
+        self.found = False
@@ -0,0 +1,79 @@
+import math
+import fitz
+from PIL import Image
+
+# 페이지 렌더링 방식
+# pymupdf : 페이지 별 DPI로 흑백 pixmap 렌더링, pdf2image : poppler로 고정 DPI(200) RGB 렌더링 (기존 방식)
+RENDER_ENGINE_PYMUPDF = "pymupdf"
+RENDER_ENGINE_PDF2IMAGE = "pdf2image"
+
+# pdf 좌표(point)의 인치 당 크기
+POINTS_PER_INCH = 72
+
+# ================================================================================================================
+def scan_image_dpi(page, min_coverage=0.3):
+    """
+    # 삽입 스캔 이미지 해상도
+
+    page : fitz 모듈로 연 pdf 문서의 페이지
+    min_coverage : 페이지 면적 대비 이미지 면적의 최소 비율 (작은 로고, 도장 등은 제외)
+
+    페이지의 큰 삽입 이미지들 중 가장 높은 해상도(DPI)를 return 한다. 해당하는 이미지가 없으면 None을 return 한다.
+
+    이미지의 픽셀 수와 페이지에 배치된 면적으로 계산하므로 이미지가 회전되어 배치되어도 같은 값이 나온다.
+    """
+    page_area = abs(page.rect)
+    if page_area == 0:
+        return None
+
+    dpi = None
+    for image_info in page.get_image_info():
+        bbox = fitz.Rect(image_info["bbox"])
+        if abs(bbox & page.rect) < page_area * min_coverage:
+            continue
+
+        area_inches = abs(bbox) / POINTS_PER_INCH ** 2
+        image_dpi = math.sqrt(image_info["width"] * image_info["height"] / area_inches)
+        dpi = image_dpi if dpi is None else max(dpi, image_dpi)
+
+    return dpi
+
+def compute_render_dpi(page, default_dpi=200, min_dpi=100, max_dpi=300, max_pixels=100000000):
+    """
+    # 페이지 별 렌더링 DPI
+
+    page : fitz 모듈로 연 pdf 문서의 페이지
+    default_dpi : 스캔 이미지가 없는 페이지(벡터 도면, 빈 페이지)의 DPI
+    min_dpi, max_dpi : DPI의 하한, 상한
+    max_pixels : 렌더링한 이미지의 최대 픽셀 수 (페이지의 실제 크기로 DPI를 낮춘다, 0이면 제한 없음)
+
+    1. 스캔 이미지가 있으면 스캔 해상도보다 높게 렌더링하지 않는다. (저해상도 스캔을 늘려도 글자 정보는 늘지 않는다)
+    2. min_dpi ~ max_dpi 범위로 맞춘다.
+    3. A0 도면처럼 큰 페이지는 픽셀 수가 max_pixels를 넘지 않도록 DPI를 낮춘다. (min_dpi보다 우선)
+    """
+    dpi = scan_image_dpi(page)
+    if dpi is None:
+        dpi = default_dpi
+
+    dpi = min(max(dpi, min_dpi), max_dpi)
+
+    area_inches = abs(page.rect) / POINTS_PER_INCH ** 2
+    if max_pixels and area_inches > 0 and dpi ** 2 * area_inches > max_pixels:
+        dpi = math.sqrt(max_pixels / area_inches)
+
+    return max(1, int(dpi))
+
+def render_page_gray(page, dpi):
+    """
+    # 흑백 페이지 렌더링
+
+    page : fitz 모듈로 연 pdf 문서의 페이지
+    dpi : 렌더링 DPI
+
+    페이지를 흑백 pixmap으로 렌더링해서 PIL 흑백("L") 이미지로 return 한다. (/Rotate 적용, RGB 버퍼를 만들지 않는다)
+    """
+    pixmap = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    image = Image.frombytes("L", (pixmap.width, pixmap.height), pixmap.samples)
+    del pixmap
+
+    return image
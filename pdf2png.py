@@ -1,42 +1,92 @@
-import pdf2image
+import fitz
 import os
 import io
+import json
 import cv2
 import numpy as np
 import re
 from PIL import Image
 from erase_table_line import EraseTableLine
 from error_status import *
-import pyhdfs
+from config import get_config
+from classify_page import classify_pages
+from packed_image import PackedImageWriter, make_pack_path, make_inner_image_manifest_path, PAGE_IMAGE, INNER_IMAGE
+from preprocess_pool import erase_and_detect_rotation, rotate_erased_image, get_preprocess_pool
+from metrics import NULL_METRICS, STAGE_HDFS_READ, STAGE_CLASSIFY, STAGE_RENDER, STAGE_ORIENTATION, STAGE_INNER_IMAGE, STAGE_PNG_WRITE
+from orientation import detect_free_rotation, make_osd_thumbnail, ORIENTATION_TIER_OSD, ORIENTATION_TIER_OSD_ERROR
+from hdfs_client import make_hdfs_client, bulk_call, BulkUploader
+from page_render import compute_render_dpi, render_page_gray, RENDER_ENGINE_PDF2IMAGE
+from pdf_source import PdfSource, load_pdf_source
 import logging
 
+# ================================================================================================================
+def pil_to_gray(pil_image):
+    """
+    pil_image : 렌더링된 페이지의 PIL 이미지 (RGB 또는 흑백)
+
+    흑백 openCV 이미지로 변환한다. 이미 흑백("L")이면 변환하지 않는다.
+    """
+    if pil_image.mode == "L":
+        return np.array(pil_image)
+
+    return cv2.cvtColor(np.array(pil_image.convert("RGB")), cv2.COLOR_RGB2GRAY)
+
+# ================================================================================================================
 class MakePngLake:
     """
     # pdf2png 변환
 
     # 20240215 Edit by YOUNGRAE CHO
     """
-    def __init__(self, pdf_path, png_lake, tesseract, hdfs_hosts="hdfs.kdap.svc.cluster.local:9870"):
+    def __init__(self, pdf_path, png_lake, tesseract, hdfs_hosts="hdfs.kdap.svc.cluster.local:9870", config=None, fs=None, content=None, metrics=None):
         """
         pdf_path : pdf 문서의 경로
         png_lake : pdf 문서의 페이지 별 이미지들이 저장될 directory의 경로
         tesseract : pytesseract model
+        config : 기본 설정값을 덮어쓸 설정값 dict (config.py 참고)
+        fs : 재사용할 pyhdfs의 HdfsClient 객체 (None이면 프로세스에서 공유하는 HdfsStorage 사용)
+        content : 이미 불러온 pdf 파일의 바이트 데이터 또는 PdfSource 객체 (None이면 hdfs에서 불러온다)
+        metrics : 단계 별 측정을 기록할 MetricsRecorder 객체 (None이면 측정하지 않는다)
 
         인스턴스 생성 후 execute_pdf2png_function 메소드를 실행한다.
         """
-        # hdfs와의 통신을 위한 객체 설정
-        self.fs = pyhdfs.HdfsClient(hosts=hdfs_hosts)
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self.config = get_config(config)
+
+        # hdfs와의 통신을 위한 객체 설정 (측정 중이면 읽고 쓴 byte 수를 센다)
+        self.fs = self.metrics.wrap_fs(fs if fs is not None else make_hdfs_client(hdfs_hosts, self.config))
 
         self.pdf_path = pdf_path
 
-        # hdfs에 있는 pdf 파일을 바이트 형태로 불러오기
-        with self.fs.open(self.pdf_path) as fp:
-            self.content = fp.read()
+        # hdfs에 있는 pdf 파일 불러오기 (큰 pdf는 로컬 임시 파일로 내려받는다)
+        if content is None:
+            with self.metrics.stage(STAGE_HDFS_READ):
+                content = load_pdf_source(self.fs, self.pdf_path, self.config)
+        elif not isinstance(content, PdfSource):
+            content = PdfSource(content=content)
+        self.source = content
 
         self.png_lake = png_lake
         self.tesseract = tesseract
         self.pdf_file_name = os.path.splitext(os.path.basename(pdf_path))[0]
 
+        # png_storage가 packed일 때 이미지를 모아서 저장할 객체
+        self.packed_writer = None
+        # png_storage가 directory일 때 이미지들을 동시에 저장할 객체
+        self.png_uploader = None
+        # 이미 생성한 삽입 이미지 디렉토리의 페이지 번호들
+        self.inner_image_directory_pages = set()
+        # 저장한 삽입 이미지의 xref 별 (페이지 번호, 순번) (같은 xref는 한 번만 저장)
+        self.stored_inner_images = {}
+        # 디렉토리 방식에서 이미 저장한 이미지를 가리키는 삽입 이미지 참조 목록
+        self.inner_image_references = []
+        # 문서의 png 디렉토리 경로 ('prepare_png_storage'에서 지정)
+        self.png_output_directory = None
+        # 렌더링한 페이지 별로 회전 각도를 결정한 단계 {page_number : tier}
+        self.orientation_tiers = {}
+        # 렌더링한 페이지 별 DPI {page_number : dpi} ('render_engine'이 pymupdf일 때)
+        self.render_dpis = {}
+
     # ================================================================================================================
     """
     # 이미지 방향 수정
@@ -54,39 +104,92 @@ class MakePngLake:
 
         해당 함수는 'pdf2png' 함수에 내장된다.
         """
-        # PIL 이미지를 Numpy array로 변환
-        numpy_image = np.array(pil_image)
-        # openCV 이미지로 변환
-        cv_img = cv2.cvtColor(numpy_image, cv2.COLOR_RGB2BGR)
-        # 이미지 전처리
-        erased_line_image = EraseTableLine(cv_img).execute_all_erase_function()
+        degree, _ = self.detect_page_rotation(pil_image)
 
-        try:
-            # OSD
-            osd = self.tesseract.image_to_osd(erased_line_image)
+        return degree
+
+    def detect_page_rotation(self, pil_image):
+        """
+        pil_image : osd를 적용할 pil 이미지 객체
 
-            # OSD 결과값에서 필요한 회전 각도 값을 찾는 패턴
-            rotation_pattern = re.compile(r"Rotate:\s(\d+)")
+        'fix_direction_for_png'와 같지만 (회전 각도 또는 에러 객체, 전처리된 흑백 이미지)를 return 한다.
 
-            # 필요한 회전 각도 값 찾기
-            degree = int(rotation_pattern.findall(osd)[0])
-        except Exception as e:
-            return e
-        
-        return degree
+        전처리는 BGR 변환 없이 흑백 이미지로 바로 한다. (BGR을 거쳐 흑백으로 바꾼 것과 같은 결과)
+
+        'osd_thumbnail_size'보다 큰 이미지는 축소한 뒤 OSD를 하며, 이때 전처리 이미지는 OCR에 쓸 수 없으므로 None을 return 한다.
+        """
+        # PIL 이미지를 흑백 openCV 이미지로 변환
+        gray_img = pil_to_gray(pil_image)
+        thumbnail = make_osd_thumbnail(gray_img, self.config["osd_thumbnail_size"])
+
+        # 이미지 전처리 후 OSD
+        degree, erased_line_image = erase_and_detect_rotation(thumbnail, self.tesseract, self.config["erase_line_engine"])
+
+        return degree, erased_line_image if thumbnail is gray_img else None
+
+    def detect_window_rotations(self, png_images, page_numbers, doc=None, preprocess_pool=None):
+        """
+        png_images : 렌더링된 페이지의 PIL 이미지들의 리스트
+        page_numbers : 이미지들의 페이지 번호(0부터 시작)들의 리스트
+        doc : fitz 모듈로 연 pdf 문서 (None이면 메타데이터 단계를 건너뛴다)
+        preprocess_pool : OSD를 병렬로 실행할 PreprocessPool 객체 (None이면 순차 실행)
+
+        페이지 별 회전 각도를 단계적으로 찾아서 [(회전 각도, 결정한 단계, 전처리 이미지 또는 None), ...]를 페이지 순서대로 return 한다.
+
+        1. 'orientation_tiers'에 지정된 PyMuPDF 정보(텍스트 라인 방향, /Rotate, 이미지 변환 행렬)로 판단
+        2. 판단할 수 없는 페이지만 축소 흑백 이미지로 Tesseract OSD
+        """
+        rotations = [None] * len(png_images)
+
+        # 렌더링 결과 없이 PyMuPDF 정보만으로 판단
+        if doc is not None:
+            for offset, page_number in enumerate(page_numbers):
+                degree, tier = detect_free_rotation(doc[page_number], self.config["orientation_tiers"], self.config["orientation_text_min_chars"])
+                if tier is not None:
+                    rotations[offset] = (degree, tier, None)
+
+        osd_offsets = [offset for offset, rotation in enumerate(rotations) if rotation is None]
+
+        # OSD가 필요한 페이지가 여러 장이면 병렬로 실행 (결과는 페이지 순서 그대로)
+        osd_results = None
+        if preprocess_pool is not None and len(osd_offsets) > 1:
+            gray_images = [pil_to_gray(png_images[offset]) for offset in osd_offsets]
+            thumbnails = [make_osd_thumbnail(gray_image, self.config["osd_thumbnail_size"]) for gray_image in gray_images]
+            try:
+                degrees, erased_line_images = preprocess_pool.detect_rotations(thumbnails, self.tesseract, self.config["erase_line_engine"])
+
+                osd_results = []
+                for gray_image, thumbnail, degree, erased_line_image in zip(gray_images, thumbnails, degrees, erased_line_images):
+                    osd_results.append((degree, erased_line_image if thumbnail is gray_image else None))
+            except Exception:
+                # worker가 비정상 종료되는 등 병렬 실행이 실패하면 한 장씩 다시 OSD
+                logging.exception("parallel osd failed, retry one by one")
+            del gray_images, thumbnails
+
+        if osd_results is None:
+            osd_results = [self.detect_page_rotation(png_images[offset]) for offset in osd_offsets]
+
+        for offset, (degree, erased_line_image) in zip(osd_offsets, osd_results):
+            tier = ORIENTATION_TIER_OSD if type(degree) == int else ORIENTATION_TIER_OSD_ERROR
+            rotations[offset] = (degree, tier, erased_line_image)
+
+        return rotations
     
     # ================================================================================================================
     """
     # 디렉토리 생성
     """
-    def make_png_directory(self, doc):
+    def make_png_directory(self, doc, page_numbers=None):
         """
         # 20240206 Edit by YOUNGRAE CHO
 
         doc : fitz 모듈로 연 pdf 문서
+        page_numbers : 디렉토리를 생성할 페이지 번호(0부터 시작)들의 리스트 (None이면 모든 페이지)
 
         1. PDF 파일 이름을 딴 폴더 생성
         2. 그 안에 페이지별 폴더 생성
+
+        page_dir_paths는 모든 페이지의 경로를 담고, 실제 디렉토리는 page_numbers의 페이지만 생성한다.
         """
         # 문서 열어서 페이지 개수 정보 획득
         page_count = doc.page_count
@@ -99,56 +202,394 @@ class MakePngLake:
         png_output_directory = os.path.join(self.png_lake, self.pdf_file_name)
         self.fs.mkdirs(png_output_directory)
 
-        # hdfs에 png 디렉토리 안에 페이지 별로 디렉토리 생성
+        if page_numbers is None:
+            page_numbers = range(page_count)
+        page_numbers = set(page_numbers)
+
+        # 페이지 별 디렉토리 경로
         for page_num in range(page_count):
             png_page_output_directory = os.path.join(png_output_directory, f"page_{str(page_num + 1).zfill(4)}")
             page_dir_paths.append(png_page_output_directory)
-            self.fs.mkdirs(png_page_output_directory)
+
+        # hdfs에 png 디렉토리 안에 페이지 별로 디렉토리 생성 (동시에 요청)
+        bulk_call(self.fs.mkdirs, [page_dir_paths[page_num] for page_num in sorted(page_numbers)], self.config["hdfs_bulk_workers"])
 
         return page_dir_paths, png_output_directory
     
     # ================================================================================================================
     """
-    # png 변환
+    # 이미지 경로
     """
-    def pdf2png(self, page_dir_paths):
+    def make_page_image_path(self, page_dir_paths, page_number):
         """
-        # 20240206 Edit by YOUNGRAE CHO
-
         page_dir_paths : 문서의 페이지 이미지가 저장되는 디렉토리 경로들의 리스트
+        page_number : 페이지 번호(0부터 시작)
 
-        하나의 pdf 파일의 각 페이지를 Tesseract OSD를 이용해 알맞은 각도로 조정한다.
+        페이지 이미지가 저장될 png 경로를 return 한다.
+        """
+        return f"{page_dir_paths[page_number]}/{self.pdf_file_name}-i{str(page_number + 1).zfill(4)}.png"
 
-        조정된 페이지를  png로 변환한다.
+    # ================================================================================================================
+    """
+    # 이미지 방향 정상화
+    """
+    def rotate_page_image(self, image):
+        """
+        image : 렌더링된 페이지의 PIL 이미지 객체
 
-        원본 이미지의 크기와 해상도 그대로 변환한다.
+        Tesseract OSD를 이용해 페이지를 알맞은 각도로 조정한 PIL 이미지를 return 한다.
+
+        OSD 에러가 발생하면 원본 이미지를 그대로 return 한다.
         """
+        # OSD로 회전시킬 각도 구하기
+        degree = self.fix_direction_for_png(None, image)
 
-        # 페이지 별로 png 추출, 저장
-        png_images = pdf2image.convert_from_bytes(self.content)
+        return self.apply_rotation(image, degree)
+
+    # ================================================================================================================
+    def apply_rotation(self, image, degree):
+        """
+        image : 렌더링된 페이지의 PIL 이미지 객체
+        degree : 시계방향으로 회전되어야 할 각도 (정수가 아니면 OSD 에러를 의미)
+
+        각도만큼 회전한 PIL 이미지를 return 한다. 각도가 정수가 아니면 원본 이미지를 그대로 return 한다.
+        """
+        if type(degree) == int:
+            # degree 적용해서 이미지 회전
+            return image.rotate(-degree, expand=True)
 
-        for page_number, image in enumerate(png_images):
-            # 저장될 이미지 경로 지정
-            image_path = f"{page_dir_paths[page_number]}/{self.pdf_file_name}-i{str(page_number + 1).zfill(4)}.png"
+        # degree 결과 값이 정수가 아닌 경우 osd 에러를 의미 => 원본 이미지를 사용
+        return image
+
+    # ================================================================================================================
+    """
+    # png 저장
+    """
+    def save_png(self, image_path, image):
+        """
+        image_path : 저장될 이미지의 경로
+        image : 방향이 조정된 페이지의 PIL 이미지 객체
+
+        PIL 이미지를 png로 hdfs에 저장한다.
+        """
+        # hdfs 저장을 위해 PIL 이미지를 바이너리 데이터로 변환
+        byte_img = io.BytesIO()
+        image.save(byte_img, format='png')
+
+        self.write_image(image_path, byte_img.getvalue())
+
+    def write_image(self, image_path, image_content):
+        """
+        이미지 파일을 hdfs에 쓴다. 저장소를 준비한 상태면 다른 이미지들과 동시에 쓰고, 'finish_png_storage'에서 끝날 때까지 기다린다.
+        """
+        if self.png_uploader is not None:
+            self.png_uploader.put(image_path, image_content)
+        else:
+            self.fs.create(image_path, image_content, overwrite=True)
+
+    # ================================================================================================================
+    """
+    # 이미지 저장소 준비
+    """
+    def prepare_png_storage(self, doc, page_numbers=None):
+        """
+        doc : fitz 모듈로 연 pdf 문서
+        page_numbers : 이미지를 저장할 페이지 번호(0부터 시작)들의 리스트 (None이면 모든 페이지)
+
+        'png_storage' 설정값에 따라 이미지 저장소를 준비하고 (page_dir_paths, png_output_directory)를 return 한다.
+
+        1. directory : 문서 폴더와 페이지 별 폴더를 생성 (기존 방식, 이미지 파일들은 'hdfs_bulk_workers'개씩 동시에 저장)
+        2. packed : 폴더를 만들지 않고 문서 하나당 패킹 파일 하나에 모든 이미지를 저장
+        """
+        self.stored_inner_images = {}
+        self.inner_image_references = []
+
+        if self.config["png_storage"] != "packed":
+            self.png_uploader = BulkUploader(self.fs, self.config["hdfs_bulk_workers"])
+            page_dir_paths, self.png_output_directory = self.make_png_directory(doc, page_numbers)
+            return page_dir_paths, self.png_output_directory
+
+        png_output_directory = os.path.join(self.png_lake, self.pdf_file_name)
+        page_dir_paths = [os.path.join(png_output_directory, f"page_{str(page_num + 1).zfill(4)}") for page_num in range(doc.page_count)]
+
+        self.fs.mkdirs(self.png_lake)
+        self.packed_writer = PackedImageWriter(self.fs, make_pack_path(png_output_directory))
+        self.png_output_directory = png_output_directory
+
+        return page_dir_paths, png_output_directory
+
+    # ================================================================================================================
+    """
+    # 이미지 저장소 마무리
+    """
+    def finish_png_storage(self, success=True):
+        """
+        success : 이미지 저장이 모두 끝났는지 여부 (False이면 패킹 파일을 저장하지 않는다)
+
+        packed 방식일 때 모아둔 이미지와 index를 패킹 파일 하나로 저장한다.
+
+        directory 방식일 때 동시에 저장 중인 이미지들이 모두 써질 때까지 기다린다.
+
+        directory 방식에서 여러 번 참조된 삽입 이미지가 있으면 참조 목록(inner_images.json)을 함께 저장한다. 없으면 이전 실행의 참조 목록을 삭제한다.
+        """
+        if self.png_uploader is not None:
+            png_uploader, self.png_uploader = self.png_uploader, None
+            if success:
+                # 같은 이름의 pdf를 다시 처리한 경우 이전 실행의 참조 목록이 남지 않도록 덮어쓰거나 삭제한다
+                manifest_path = make_inner_image_manifest_path(self.png_output_directory)
+                if self.inner_image_references:
+                    manifest = {"version" : 1, "references" : self.inner_image_references}
+                    png_uploader.put(manifest_path, json.dumps(manifest).encode())
+                else:
+                    self.fs.delete(manifest_path)
+
+                with self.metrics.stage(STAGE_PNG_WRITE):
+                    png_uploader.close()
+            else:
+                png_uploader.abort()
+
+        if self.packed_writer is None:
+            return
+
+        if success:
+            with self.metrics.stage(STAGE_PNG_WRITE):
+                self.packed_writer.close()
+        else:
+            self.packed_writer.abort()
+        self.packed_writer = None
+
+    # ================================================================================================================
+    """
+    # 페이지 이미지 저장
+    """
+    def store_page_image(self, page_dir_paths, page_number, image):
+        """
+        page_dir_paths : 문서의 페이지 이미지가 저장되는 디렉토리 경로들의 리스트
+        page_number : 페이지 번호(0부터 시작)
+        image : 방향이 조정된 페이지의 PIL 이미지 객체
 
-            # OSD로 회전시킬 각도 구하기
-            degree = self.fix_direction_for_png(image_path, image)
+        저장 방식에 맞게 페이지 이미지를 png로 저장한다.
+        """
+        with self.metrics.stage(STAGE_PNG_WRITE, [page_number]):
+            if self.packed_writer is None:
+                self.save_png(self.make_page_image_path(page_dir_paths, page_number), image)
+                return
 
-            # hdfs 저장을 위해 PIL 이미지를 바이너리 데이터로 변환
             byte_img = io.BytesIO()
+            image.save(byte_img, format='png')
+            self.packed_writer.add_image(PAGE_IMAGE, page_number, 0, byte_img.getvalue())
+
+    # ================================================================================================================
+    """
+    # 삽입 이미지 저장
+    """
+    def store_inner_image(self, page_dir_paths, page_number, idx, image_content, xref=None):
+        """
+        page_dir_paths : 문서의 페이지 이미지가 저장되는 디렉토리 경로들의 리스트
+        page_number : 이미지가 존재하는 페이지 번호(0부터 시작)
+        idx : 페이지 안에서의 삽입 이미지 순번(0부터 시작)
+        image_content : 추출된 삽입 이미지의 바이너리 데이터
+
+        저장 방식에 맞게 삽입 이미지를 저장한다. 디렉토리 방식에서 삽입 이미지 디렉토리는 페이지 당 한 번만 생성한다.
+
+        xref : pdf 안에서의 이미지 번호 (지정하면 같은 xref의 다음 참조는 'store_inner_image_reference'로 저장)
+        """
+        with self.metrics.stage(STAGE_PNG_WRITE, [page_number]):
+            if xref is not None:
+                self.stored_inner_images[xref] = (page_number, idx)
+
+            if self.packed_writer is not None:
+                self.packed_writer.add_image(INNER_IMAGE, page_number, idx, image_content)
+                return
+
+            if page_number not in self.inner_image_directory_pages:
+                self.make_inner_image_directory(page_dir_paths, page_number)
+                self.inner_image_directory_pages.add(page_number)
+
+            self.write_image(self.make_inner_image_path(page_dir_paths, page_number, idx), image_content)
+
+    def store_inner_image_reference(self, page_dir_paths, page_number, idx, xref):
+        """
+        page_dir_paths : 문서의 페이지 이미지가 저장되는 디렉토리 경로들의 리스트
+        page_number : 이미지가 존재하는 페이지 번호(0부터 시작)
+        idx : 페이지 안에서의 삽입 이미지 순번(0부터 시작)
+        xref : pdf 안에서의 이미지 번호
+
+        같은 xref의 이미지를 이미 저장했으면 이미지를 다시 저장하지 않고 참조만 기록한 후 True를 return 한다. 처음 보는 xref면 False를 return 한다.
+
+        1. packed : 패킹 파일 index에 이미 저장한 데이터의 offset을 가리키는 entry 추가
+        2. directory : 참조 목록에 추가 ('finish_png_storage'에서 inner_images.json으로 한 번에 저장)
+        """
+        if xref not in self.stored_inner_images:
+            return False
+
+        target_page, target_idx = self.stored_inner_images[xref]
+
+        if self.packed_writer is not None:
+            self.packed_writer.add_reference(INNER_IMAGE, page_number, idx, (INNER_IMAGE, target_page, target_idx))
+        else:
+            self.inner_image_references.append({
+                "page" : page_number,
+                "index" : idx,
+                "path" : self.make_inner_image_path(page_dir_paths, target_page, target_idx)
+            })
 
-            if type(degree) == int:
-                # degree 적용해서 이미지 덮어쓰기
-                rotate = image.rotate(-degree, expand=True)
-                rotate.save(byte_img, format='png')
-                byte_img = byte_img.getvalue()
-                self.fs.create(image_path, byte_img, overwrite=True)
+        return True
 
-            # degree 결과 값이 정수가 아닌 경우 osd 에러를 의미 => 원본 이미지를 저장
+    def make_inner_image_path(self, page_dir_paths, page_number, idx):
+        # 디렉토리 방식의 삽입 이미지 경로
+        return f"{page_dir_paths[page_number]}/inner_images/image-{str(idx + 1).zfill(3)}.png"
+
+    # ================================================================================================================
+    """
+    # 렌더링 범위 계산
+    """
+    def make_render_windows(self, page_numbers):
+        """
+        page_numbers : 렌더링할 페이지 번호(0부터 시작)들의 리스트
+
+        연속된 페이지끼리 묶은 뒤 'render_window_size' 단위로 잘라서 (first_page, last_page) 범위 리스트를 return 한다.
+
+        범위는 pdf2image 기준(1부터 시작, last_page 포함)이며 렌더링이 필요 없는 페이지는 범위에 포함되지 않는다.
+        """
+        window_size = max(1, int(self.config["render_window_size"]))
+
+        windows = []
+        for page_number in sorted(set(page_numbers)):
+            # 이전 범위와 이어지고, 범위가 가득 차지 않았으면 이어 붙이기
+            if windows and windows[-1][1] == page_number and windows[-1][1] - windows[-1][0] + 1 < window_size:
+                windows[-1][1] = page_number + 1
             else:
-                image.save(byte_img, format='png')
-                byte_img = byte_img.getvalue()
-                self.fs.create(image_path, byte_img, overwrite=True)
+                windows.append([page_number + 1, page_number + 1])
+
+        return [tuple(window) for window in windows]
+
+    # ================================================================================================================
+    """
+    # 페이지 렌더링
+    """
+    def render_pages(self, page_numbers, doc=None):
+        """
+        page_numbers : 렌더링할 페이지 번호(0부터 시작)들의 리스트
+        doc : fitz 모듈로 연 pdf 문서 (있으면 OSD 전에 PyMuPDF 정보로 방향을 먼저 판단한다)
+
+        페이지를 'render_window_size' 단위로 렌더링하고 방향을 조정해서 (page_number, PIL 이미지, 전처리 이미지)를 페이지 순서대로 yield 한다.
+
+        전처리 이미지는 OSD를 위해 만든 EraseTableLine 결과를 페이지와 같은 방향으로 회전한 것으로, OCR 단계에서 다시 전처리하지 않고 사용할 수 있다.
+        (OSD를 하지 않았거나 축소 이미지로 OSD를 한 페이지는 None)
+
+        페이지 별로 회전 각도를 결정한 단계는 'orientation_tiers' 속성에 기록한다.
+
+        문서 전체를 한 번에 렌더링하지 않으며, yield 된 이미지는 다음 페이지로 넘어갈 때 메모리에서 해제된다.
+
+        'preprocess_processes'가 1 이상이면 window 안의 페이지들의 OSD를 여러 프로세스에서 병렬로 실행한다.
+
+        'render_engine'이 pymupdf이면 페이지 크기와 스캔 이미지 해상도로 페이지 별 DPI를 정해서 흑백("L") 이미지로 렌더링하고,
+        pdf2image이면 기존처럼 poppler로 RGB 이미지를 렌더링한다.
+        """
+        render_windows = self.make_render_windows(page_numbers)
+        preprocess_pool = get_preprocess_pool(self.config["preprocess_processes"])
+
+        # 렌더링할 페이지가 없으면 pdf를 임시 파일로 쓰지 않고 종료
+        if not render_windows:
+            return
+
+        if self.config["render_engine"] != RENDER_ENGINE_PDF2IMAGE:
+            # 전달받은 문서가 없으면 pdf 내용으로 한 번만 열기
+            render_doc = doc if doc is not None else self.source.open_document()
+            try:
+                yield from self.orient_render_windows(render_windows, doc, preprocess_pool,
+                                                      lambda first_page, last_page: self.render_gray_pages(render_doc, range(first_page - 1, last_page)))
+            finally:
+                if render_doc is not doc:
+                    render_doc.close()
+            return
+
+        # pdf2image는 이 방식에서만 사용하므로 필요할 때 import
+        import pdf2image
+
+        # poppler가 매 렌더링마다 pdf를 다시 쓰지 않도록 임시 파일에 한 번만 기록 (pdf를 로컬 임시 파일로 내려받았으면 그 파일을 그대로 사용)
+        with self.source.local_path() as pdf_file_path:
+            yield from self.orient_render_windows(render_windows, doc, preprocess_pool,
+                                                  lambda first_page, last_page: pdf2image.convert_from_path(pdf_file_path, first_page=first_page, last_page=last_page))
+
+    def render_gray_pages(self, doc, page_numbers):
+        """
+        doc : fitz 모듈로 연 pdf 문서
+        page_numbers : 렌더링할 페이지 번호(0부터 시작)들
+
+        페이지 별 DPI('render_dpi', 'render_min_dpi', 'render_max_dpi', 'render_max_pixels')로 흑백 렌더링한 PIL 이미지 리스트를 return 한다.
+        """
+        images = []
+        for page_number in page_numbers:
+            page = doc[page_number]
+            dpi = compute_render_dpi(page, self.config["render_dpi"], self.config["render_min_dpi"], self.config["render_max_dpi"], self.config["render_max_pixels"])
+            self.render_dpis[page_number] = dpi
+            images.append(render_page_gray(page, dpi))
+
+        return images
+
+    def orient_render_windows(self, render_windows, doc, preprocess_pool, render_window):
+        """
+        render_windows : 'make_render_windows'가 return 한 (first_page, last_page) 범위 리스트
+        doc : fitz 모듈로 연 pdf 문서 (None이면 메타데이터 단계를 건너뛴다)
+        preprocess_pool : OSD를 병렬로 실행할 PreprocessPool 객체 (None이면 순차 실행)
+        render_window : (first_page, last_page) 범위의 PIL 이미지 리스트를 return 하는 함수
+
+        window 단위로 렌더링하고 방향을 조정해서 (page_number, PIL 이미지, 전처리 이미지)를 페이지 순서대로 yield 한다.
+        """
+        # window 단위로 페이지 범위를 지정해서 렌더링
+        for first_page, last_page in render_windows:
+            with self.metrics.stage(STAGE_RENDER, range(first_page - 1, last_page)):
+                png_images = render_window(first_page, last_page)
+
+            # window 안의 페이지 방향 찾기
+            window_pages = list(range(first_page - 1, last_page))
+            with self.metrics.stage(STAGE_ORIENTATION, window_pages):
+                rotations = self.detect_window_rotations(png_images, window_pages, doc, preprocess_pool)
+
+            for offset, image in enumerate(png_images):
+                page_number = window_pages[offset]
+
+                degree, tier, erased_line_image = rotations[offset]
+                rotations[offset] = None
+                self.orientation_tiers[page_number] = tier
+
+                rotated_image = self.apply_rotation(image, degree)
+                yield page_number, rotated_image, rotate_erased_image(erased_line_image, degree)
+
+                # 사용이 끝난 페이지는 바로 메모리에서 해제
+                rotated_image.close()
+                image.close()
+
+            del png_images
+
+    # ================================================================================================================
+    """
+    # png 변환
+    """
+    def pdf2png(self, page_dir_paths, page_numbers=None, doc=None):
+        """
+        # 20240206 Edit by YOUNGRAE CHO
+
+        page_dir_paths : 문서의 페이지 이미지가 저장되는 디렉토리 경로들의 리스트
+        page_numbers : 렌더링할 페이지 번호(0부터 시작)들의 리스트 (None이면 모든 페이지)
+        doc : fitz 모듈로 연 pdf 문서 (방향 판단에 사용)
+
+        하나의 pdf 파일의 각 페이지를 PyMuPDF 정보 또는 Tesseract OSD를 이용해 알맞은 각도로 조정한다.
+
+        조정된 페이지를  png로 변환한다.
+
+        원본 이미지의 크기와 해상도 그대로 변환한다.
+
+        문서 전체를 한 번에 렌더링하지 않고 'render_window_size' 페이지 단위로 렌더링, 저장한 뒤 메모리에서 해제한다.
+        """
+        if page_numbers is None:
+            page_numbers = range(len(page_dir_paths))
+
+        # 페이지 별로 png 추출, 저장
+        for page_number, image, _ in self.render_pages(page_numbers, doc):
+            self.store_page_image(page_dir_paths, page_number, image)
 
     # ================================================================================================================
     """
@@ -176,35 +617,63 @@ class MakePngLake:
     """
     # 삽입된 이미지 추출
     """
-    def extract_inner_image_per_one_pdf(self, doc, page_dir_paths):
+    def extract_inner_image_per_one_pdf(self, doc, page_dir_paths, page_numbers=None):
         """
         # 20240206 Edit by YOUNGRAE CHO
 
         doc : fitz 모듈로 연 pdf 문서
         page_dir_paths : 문서의 페이지 이미지가 저장되는 디렉토리 경로들의 리스트
+        page_numbers : 삽입 이미지를 추출할 페이지 번호(0부터 시작)들의 리스트 (None이면 모든 페이지)
 
         각 페이지에서 삽입된 이미지를 추출한다.
 
         추출된 이미지를 알맞은 경로와 이름을 지정하여 저장한다.
 
         해당 함수는 'execute_png_function' 함수에 내장된다.
-        """
-        # 문서 하나의 모든 추출된 이미지가 저장될 리스트
-        page_images_list = []
 
-        # 페이지 별로 이미지 추출
-        for page_number, page in enumerate(doc):
-            page_images = [io.BytesIO(doc.extract_image(i[0])["image"]) for i in doc.get_page_images(page_number, full=True)]
-            page_images_list.append(page_images)
+        문서 전체의 이미지를 메모리에 모으지 않고 페이지 하나씩 추출해서 바로 저장한다. (메모리에는 한 페이지의 이미지와 저장 중인 이미지들만 남는다)
 
-        # 삽입 이미지가 저장될 디렉토리 생성 후 이미지 저장
-        for page_number, page_images in enumerate(page_images_list):
-            if page_images:
-                for idx, image in enumerate(page_images):
-                    inner_image_output_directory = self.make_inner_image_directory(page_dir_paths, page_number)
-                    image_path = f"{inner_image_output_directory}/image-{str(idx + 1).zfill(3)}.png"
+        여러 페이지에서 참조하는 같은 이미지(xref)는 처음 한 번만 추출, 저장하고 다음 참조는 'store_inner_image_reference'로 참조만 기록한다.
+        """
+        if page_numbers is None:
+            page_numbers = range(doc.page_count)
+        page_numbers = sorted(set(page_numbers))
+
+        stored_count = 0
+        reference_count = 0
+
+        for page_number in page_numbers:
+            # 페이지의 (순번, xref, 이미지 데이터) 리스트 (이미 추출한 xref는 데이터 없이 None)
+            page_images = []
+            with self.metrics.stage(STAGE_INNER_IMAGE, [page_number]):
+                extracted_xrefs = set()
+                for idx, image_info in enumerate(doc.get_page_images(page_number, full=True)):
+                    xref = image_info[0]
+                    if xref in self.stored_inner_images or xref in extracted_xrefs:
+                        page_images.append((idx, xref, None))
+                        continue
+
+                    page_images.append((idx, xref, doc.extract_image(xref)["image"]))
+                    extracted_xrefs.add(xref)
+
+            # 삽입 이미지 저장 (디렉토리 방식이면 디렉토리는 처음 저장할 때 생성)
+            for idx, xref, image_content in page_images:
+                if image_content is None and self.store_inner_image_reference(page_dir_paths, page_number, idx, xref):
+                    reference_count += 1
+                    continue
+
+                self.store_inner_image(page_dir_paths, page_number, idx, image_content, xref)
+                stored_count += 1
+
+        logging.info("inner images : {} stored, {} references".format(stored_count, reference_count))
 
-                    self.fs.create(image_path, image, overwrite=True)
+    # ================================================================================================================
+    # pdf 원본 정리
+    def close_source(self):
+        """
+        pdf를 로컬 임시 파일로 내려받았으면 삭제한다. 작업이 끝난 후 호출한다.
+        """
+        self.source.close()
 
     # ================================================================================================================
     # png lake에 각 pdf의 새 디렉토리 생성 후 png 변환
@@ -214,9 +683,14 @@ class MakePngLake:
 
         하나의 pdf 문서를 대상으로 한다.
 
-        1. PNG 디렉토리 생성
+        0. 페이지 블록 정보로 Scanned 페이지 분류
+        1. PNG 디렉토리 생성 (packed 방식이면 패킹 파일 준비)
         2. 페이지 별로 png 이미지 변환
         3. 페이지 별로 삽입 이미지 추출 및 저장
+        4. (packed 방식이면) 패킹 파일 저장
+
+        렌더링, OSD, png 저장은 페이지 전체 OCR이 필요한 페이지(DeviceGray, 빈 페이지)만,
+        삽입 이미지 추출은 ICCBased 페이지만 대상으로 한다.
         """
 
         output = {
@@ -225,19 +699,30 @@ class MakePngLake:
         }
 
         try:
-            doc = fitz.open(stream=self.content)
-            # 디렉토리 생성
-            page_dir_paths, png_output_directory = self.make_png_directory(doc)
+            doc = self.source.open_document()
+
+            # 페이지 분류 (렌더링 없이 블록 정보만 사용)
+            with self.metrics.stage(STAGE_CLASSIFY):
+                page_kinds = classify_pages(doc)
+            render_pages = [page_num for page_num, page_kind in enumerate(page_kinds) if page_kind["needs_render"]]
+            inner_image_pages = [page_num for page_num, page_kind in enumerate(page_kinds) if page_kind["needs_inner_images"]]
+            logging.info("scanned pages : {} / {}".format(len(render_pages), doc.page_count))
+
+            # 디렉토리 생성 (packed 방식이면 패킹 파일 준비)
+            page_dir_paths, png_output_directory = self.prepare_png_storage(doc, sorted(set(render_pages + inner_image_pages)))
             logging.info("maked png directory : {}".format(png_output_directory))
 
             # 페이지 별 png 변환
-            self.pdf2png(page_dir_paths)
+            self.pdf2png(page_dir_paths, render_pages, doc)
             logging.info("saved png")
 
             # inner image 추출
-            self.extract_inner_image_per_one_pdf(doc, page_dir_paths)
+            self.extract_inner_image_per_one_pdf(doc, page_dir_paths, inner_image_pages)
             logging.info("saved inner_images")
 
+            # packed 방식이면 패킹 파일 저장
+            self.finish_png_storage()
+
             # 문서 닫기
             doc.close()
 
@@ -247,6 +732,7 @@ class MakePngLake:
         except Exception:
             # 에러 발생 시 에러 정보 추출
             output = extract_error_status(output)
+            self.finish_png_storage(success=False)
 
             return output
         
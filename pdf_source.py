@@ -0,0 +1,121 @@
+import os
+import shutil
+import hashlib
+import tempfile
+import contextlib
+import fitz
+import logging
+
+# pdf 파일 hash를 계산할 때 한 번에 읽는 크기
+HASH_CHUNK_BYTES = 8 * 1024 * 1024
+
+# ================================================================================================================
+class PdfSource:
+    """
+    # pdf 원본 데이터
+
+    hdfs에서 불러온 pdf를 메모리(bytes) 또는 로컬 임시 파일(spill)로 가지고 있으며, 문서 열기, 렌더러용 로컬 경로, 내용 hash를 같은 방식으로 제공한다.
+
+    로컬 임시 파일이면 fitz가 파일에서 필요한 부분만 읽으므로 큰 pdf 전체가 메모리에 올라오지 않고, pdf2image(poppler)도 같은 파일을 그대로 사용한다.
+
+    작업이 끝나면 'close'로 임시 파일을 삭제한다.
+    """
+    def __init__(self, content=None, path=None):
+        """
+        content : pdf 파일의 바이트 데이터 (메모리 방식)
+        path : pdf를 내려받은 로컬 임시 파일 경로 (spill 방식)
+        """
+        self.content = content
+        self.path = path
+        self._digest = None
+
+    @property
+    def spilled(self):
+        return self.path is not None
+
+    @property
+    def size(self):
+        return os.path.getsize(self.path) if self.spilled else len(self.content)
+
+    def open_document(self):
+        """
+        fitz 문서를 연다. spill 방식이면 파일 경로로 열어서 pdf 내용을 메모리에 올리지 않는다.
+        """
+        if self.spilled:
+            return fitz.open(self.path)
+
+        return fitz.open(stream=self.content)
+
+    @contextlib.contextmanager
+    def local_path(self):
+        """
+        poppler 등 파일 경로가 필요한 렌더러에 넘길 로컬 pdf 경로를 yield 한다.
+
+        spill 방식이면 임시 파일을 그대로 넘기고, 메모리 방식이면 with 블록 동안만 임시 파일에 한 번 기록한다.
+        """
+        if self.spilled:
+            yield self.path
+            return
+
+        with tempfile.NamedTemporaryFile(suffix=".pdf") as pdf_file:
+            pdf_file.write(self.content)
+            pdf_file.flush()
+            yield pdf_file.name
+
+    def digest(self):
+        """
+        pdf 내용의 sha256 digest를 return 한다. (spill 방식은 파일을 나눠서 읽는다, 한 번만 계산)
+        """
+        if self._digest is None:
+            if self.spilled:
+                hasher = hashlib.sha256()
+                with open(self.path, "rb") as fp:
+                    for chunk in iter(lambda: fp.read(HASH_CHUNK_BYTES), b""):
+                        hasher.update(chunk)
+                self._digest = hasher.digest()
+            else:
+                self._digest = hashlib.sha256(self.content).digest()
+
+        return self._digest
+
+    def close(self):
+        """
+        spill 방식의 로컬 임시 파일을 삭제한다. 여러 번 호출해도 된다.
+        """
+        if self.spilled and os.path.exists(self.path):
+            os.remove(self.path)
+        self.content = None
+
+# ================================================================================================================
+def load_pdf_source(fs, pdf_path, config):
+    """
+    # hdfs pdf 불러오기
+
+    fs : hdfs client
+    pdf_path : pdf 문서의 hdfs 경로
+    config : 파이프라인 설정값 dict
+
+    'pdf_spill_bytes' 이상인 pdf는 'pdf_spill_chunk_bytes' 단위로 나눠서 로컬 임시 파일('pdf_spill_directory')에 한 번만 내려받고,
+    작은 pdf는 기존처럼 메모리로 불러와서 PdfSource로 return 한다. ('pdf_spill_bytes'가 0이면 항상 메모리)
+    """
+    spill_bytes = config["pdf_spill_bytes"]
+
+    if not spill_bytes or fs.get_file_status(pdf_path).length < spill_bytes:
+        with fs.open(pdf_path) as fp:
+            return PdfSource(content=fp.read())
+
+    spill_directory = config["pdf_spill_directory"]
+    if spill_directory:
+        os.makedirs(spill_directory, exist_ok=True)
+
+    spill_file = tempfile.NamedTemporaryFile(suffix=".pdf", prefix="fulltext_", dir=spill_directory, delete=False)
+    try:
+        with spill_file, fs.open(pdf_path) as fp:
+            shutil.copyfileobj(fp, spill_file, config["pdf_spill_chunk_bytes"])
+    except Exception:
+        os.remove(spill_file.name)
+        raise
+
+    logging.info("spilled pdf to local file : {} ({} bytes)".format(spill_file.name, os.path.getsize(spill_file.name)))
+
+    return PdfSource(path=spill_file.name)
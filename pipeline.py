@@ -0,0 +1,229 @@
+import os
+import cv2
+import numpy as np
+from pdf2png import MakePngLake
+from full_text import extract_text, decode_image
+from classify_page import classify_pages
+from config import get_config
+from result_cache import get_result_cache, make_cache_key, save_cached_result
+from metrics import NULL_METRICS, STAGE_HDFS_READ, STAGE_CLASSIFY
+from error_status import *
+from hdfs_client import make_hdfs_client
+from page_checkpoint import PageCheckpoint, make_checkpoint_path
+from pdf_source import load_pdf_source
+import logging
+
+class MemoryImageLoader:
+    """
+    # 메모리 이미지 로더
+
+    렌더링 단계에서 만든 페이지 이미지와 문서에서 추출한 삽입 이미지를 hdfs를 거치지 않고 'extract_text' 함수에 바로 넘긴다.
+
+    save_png가 True이면 넘겨주는 이미지를 png lake에도 저장한다. (저장은 부수 효과일 뿐 데이터 경로가 아니다)
+    """
+    def __init__(self, make_png, doc, render_pages, page_dir_paths=None, save_png=False):
+        """
+        make_png : 렌더링을 담당하는 MakePngLake 객체
+        doc : fitz 모듈로 연 pdf 문서
+        render_pages : 렌더링할 페이지 번호(0부터 시작)들의 리스트
+        page_dir_paths : 문서의 페이지 이미지가 저장되는 디렉토리 경로들의 리스트 (save_png가 True일 때 사용)
+        save_png : png lake 저장 여부
+        """
+        self.make_png = make_png
+        self.doc = doc
+        self.page_dir_paths = page_dir_paths
+        self.save_png = save_png
+        self.render_page_numbers = sorted(render_pages)
+        # OSD 단계에서 전처리한 페이지 이미지 (OCR 단계에서 한 번만 꺼내 쓴다)
+        self.erased_page_images = {}
+
+        # 페이지 순서대로 렌더링 결과를 넘겨주는 generator
+        self.rendered_pages = make_png.render_pages(self.render_page_numbers, doc)
+
+    # 페이지 이미지 불러오기
+    def load_page_image(self, page_num):
+        # extract_text는 페이지 순서대로 요청하므로 요청한 페이지가 나올 때까지 렌더링을 진행
+        try:
+            rendered_page = self.next_rendered_page(page_num)
+        except Exception:
+            # 렌더링 중 에러가 나면 generator가 끝나므로, 다음 페이지부터 다시 렌더링하도록 새로 만든다
+            self.rendered_pages.close()
+            self.rendered_pages = self.make_png.render_pages([page_number for page_number in self.render_page_numbers if page_number > page_num], self.doc)
+            raise
+
+        if rendered_page is None:
+            raise KeyError(f"page {page_num + 1} is not rendered")
+
+        page_number, image, erased_line_image = rendered_page
+        self.erased_page_images[page_number] = erased_line_image
+
+        if self.save_png:
+            self.make_png.store_page_image(self.page_dir_paths, page_number, image)
+
+        # 흑백으로 렌더링한 이미지는 그대로, PIL(RGB) 이미지는 opencv(BGR) 이미지로 변환
+        if image.mode == "L":
+            return np.array(image)
+        return cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+
+    def finish(self):
+        """
+        'extract_text'가 모든 페이지를 처리한 후 결과를 저장하기 전에 호출한다.
+
+        png lake에 저장 중인 이미지들이 모두 써질 때까지 기다리고, 저장 에러는 그대로 올려서 문서 처리 에러로 만든다.
+        """
+        self.make_png.finish_png_storage(success=True)
+
+    def next_rendered_page(self, page_num):
+        for rendered_page in self.rendered_pages:
+            if rendered_page[0] == page_num:
+                return rendered_page
+
+        return None
+
+    # OSD 단계의 전처리 결과 꺼내기 (없으면 None)
+    def pop_erased_image(self, page_num):
+        return self.erased_page_images.pop(page_num, None)
+
+    # 페이지의 삽입 이미지들을 순서대로 불러오기 (png lake에는 같은 xref의 이미지를 한 번만 저장)
+    def load_inner_images(self, page_num):
+        for idx, image_info in enumerate(self.doc.get_page_images(page_num, full=True)):
+            xref = image_info[0]
+            image_content = self.doc.extract_image(xref)["image"]
+
+            if self.save_png and not self.make_png.store_inner_image_reference(self.page_dir_paths, page_num, idx, xref):
+                self.make_png.store_inner_image(self.page_dir_paths, page_num, idx, image_content, xref)
+
+            yield decode_image(image_content)
+
+    # 렌더링 중인 generator 정리 (임시 파일 삭제)
+    def close(self):
+        self.rendered_pages.close()
+
+# ================================================================================================================
+class DocumentPipeline:
+    """
+    # 단일 패스 Full Text 파이프라인
+
+    pdf를 hdfs에서 한 번만 불러오고 fitz 문서도 한 번만 열어서 분류, 렌더링, 전처리, OCR까지 메모리 안에서 처리한다.
+
+    렌더링한 페이지 이미지는 png로 인코딩, 저장, 재다운로드, 디코딩을 거치지 않고 바로 EraseTableLine과 OCR에 넘어간다.
+    """
+    def __init__(self, pdf_path, png_lake, tesseract, easyocr, json_path, hdfs_hosts="hdfs.kdap.svc.cluster.local:9870", config=None, metrics=None):
+        """
+        pdf_path : pdf 문서의 경로
+        png_lake : pdf 문서의 페이지 별 이미지들이 저장될 directory의 경로
+        tesseract : pytesseract model
+        easyocr : easyocr model
+        json_path : json파일이 저장될 hdfs의 json 저장소의 경로
+        config : 기본 설정값을 덮어쓸 설정값 dict (config.py 참고)
+        metrics : 단계 별 측정을 기록할 MetricsRecorder 객체 (None이면 측정하지 않는다)
+
+        인스턴스 생성 후 execute 메소드를 실행한다.
+        """
+        self.pdf_path = pdf_path
+        self.png_lake = png_lake
+        self.tesseract = tesseract
+        self.easyocr = easyocr
+        self.json_path = json_path
+        self.hdfs_hosts = hdfs_hosts
+        self.config = get_config(config)
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+
+    # ================================================================================================================
+    def execute(self):
+        """
+        하나의 pdf 문서를 대상으로 한다.
+
+        1. hdfs에서 pdf를 한 번만 불러와서 문서 열기 (결과값 캐시에 같은 pdf가 있으면 저장된 결과값을 바로 return)
+        2. 페이지 블록 정보로 Scanned 페이지 분류 (페이지 체크포인트에서 성공한 페이지는 제외)
+        3. (save_png가 True이면) PNG 디렉토리 생성 또는 패킹 파일 준비
+        4. 렌더링 결과를 메모리로 넘겨받아 텍스트 추출 및 json 저장
+        5. (save_png가 True이면) 동시에 저장 중인 이미지 마무리, packed 방식이면 패킹 파일 저장
+        """
+        output = {
+            "STATUS" : "",
+            "STATUS_RESULT" : ""
+        }
+
+        doc = None
+        source = None
+        image_loader = None
+        make_png = None
+
+        try:
+            # hdfs와의 통신을 위한 객체 설정 (렌더링, 텍스트 추출 단계가 공유)
+            fs = self.metrics.wrap_fs(make_hdfs_client(self.hdfs_hosts, self.config))
+
+            # hdfs에 있는 pdf 파일을 한 번만 불러오기 (큰 pdf는 로컬 임시 파일로 내려받아 문서 열기와 렌더링이 같은 파일을 사용)
+            with self.metrics.stage(STAGE_HDFS_READ):
+                source = load_pdf_source(fs, self.pdf_path, self.config)
+
+            make_png = MakePngLake(self.pdf_path, self.png_lake, self.tesseract, config=self.config, fs=fs, content=source, metrics=self.metrics)
+
+            # 결과값 캐시, 페이지 체크포인트에 사용할 key (pdf 내용 hash 기준)
+            result_cache = get_result_cache(self.config, self.hdfs_hosts)
+            cache_key = make_cache_key(source, self.config) if result_cache is not None or self.config["page_checkpoint"] else None
+
+            # 결과값 캐시 확인
+            if result_cache is not None:
+                cached_output = result_cache.get(cache_key)
+                logging.info("result cache {} : {}".format("hit" if cached_output is not None else "miss", result_cache.stats()))
+
+                if cached_output is not None:
+                    save_cached_result(fs, cached_output, self.json_path, make_png.pdf_file_name, self.config["output_format"])
+                    return cached_output
+
+            doc = source.open_document()
+
+            # 페이지 분류 (렌더링 없이 블록 정보만 사용)
+            with self.metrics.stage(STAGE_CLASSIFY):
+                page_kinds = classify_pages(doc)
+            # 이전 실행의 체크포인트에서 성공한 페이지는 렌더링, 이미지 추출에서 제외
+            checkpoint = None
+            resumed_pages = {}
+            if self.config["page_checkpoint"]:
+                checkpoint = PageCheckpoint(fs, make_checkpoint_path(self.json_path, make_png.pdf_file_name), cache_key)
+                resumed_pages = checkpoint.load()
+
+            render_pages = [page_num for page_num, page_kind in enumerate(page_kinds) if page_kind["needs_render"] and page_num not in resumed_pages]
+            inner_image_pages = [page_num for page_num, page_kind in enumerate(page_kinds) if page_kind["needs_inner_images"] and page_num not in resumed_pages]
+            logging.info("scanned pages : {} / {}".format(len(render_pages), doc.page_count))
+
+            # png lake 저장은 선택 사항
+            save_png = self.config["save_png"]
+            png_output_directory = os.path.join(self.png_lake, make_png.pdf_file_name)
+            page_dir_paths = None
+            if save_png:
+                page_dir_paths, png_output_directory = make_png.prepare_png_storage(doc, sorted(set(render_pages + inner_image_pages)))
+                logging.info("maked png directory : {}".format(png_output_directory))
+
+            image_loader = MemoryImageLoader(make_png, doc, render_pages, page_dir_paths, save_png)
+
+            # pdf 문서의 full text 추출
+            # png lake에 저장 중인 이미지는 'extract_text'가 결과를 저장하기 전에 image_loader.finish로 마무리한다 (저장 에러도 문서 처리 에러로 return)
+            output = extract_text(self.pdf_path, make_png.pdf_file_name, png_output_directory, self.easyocr, self.json_path, fs=fs, doc=doc, image_loader=image_loader, config=self.config, orientation_tiers=make_png.orientation_tiers, metrics=self.metrics, checkpoint=checkpoint)
+
+            # 성공한 결과값은 캐시에 저장
+            if result_cache is not None:
+                result_cache.put(cache_key, output)
+
+        except Exception:
+            # 에러 발생 시 에러 정보 추출 (이미 성공으로 기록된 STATUS가 남지 않도록 지운다)
+            output["STATUS"] = ""
+            output["STATUS_RESULT"] = ""
+            output = extract_error_status(output)
+
+        finally:
+            if image_loader is not None:
+                image_loader.close()
+            # 저장하지 못한 이미지 정리 (이미 마무리했으면 아무것도 하지 않는다)
+            if make_png is not None:
+                make_png.finish_png_storage(success=False)
+            # 문서 닫기
+            if doc is not None:
+                doc.close()
+            # pdf를 로컬 임시 파일로 내려받았으면 삭제
+            if source is not None:
+                source.close()
+
+        return output
@@ -0,0 +1,272 @@
+import re
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+import numpy as np
+from erase_table_line import EraseTableLine, ERASE_ENGINE_VECTORIZED
+
+# OSD 결과값에서 필요한 회전 각도 값을 찾는 패턴
+rotation_pattern = re.compile(r"Rotate:\s(\d+)")
+
+# 프로세스 수 별로 한 번만 생성해서 재사용하는 pool
+preprocess_pools = {}
+preprocess_pools_lock = threading.Lock()
+
+# ================================================================================================================
+def detect_osd_rotation(cv_image, tesseract, erase_engine=ERASE_ENGINE_VECTORIZED):
+    """
+    # OSD 회전 각도 감지
+
+    cv_image : opencv(BGR) 이미지 또는 흑백 이미지
+    tesseract : pytesseract model
+    erase_engine : EraseTableLine 구분선 검출 방식
+
+    이미지의 표를 제거하는 전처리를 한 후, OSD를 통해 시계방향으로 회전되어야 할 각도를 리턴한다.
+
+    OSD 에러가 발생하면 에러 객체를 리턴한다.
+    """
+    degree, _ = erase_and_detect_rotation(cv_image, tesseract, erase_engine)
+
+    return degree
+
+def erase_and_detect_rotation(cv_image, tesseract, erase_engine=ERASE_ENGINE_VECTORIZED):
+    """
+    cv_image : opencv(BGR) 이미지 또는 흑백 이미지
+    tesseract : pytesseract model
+    erase_engine : EraseTableLine 구분선 검출 방식
+
+    'detect_osd_rotation'과 같지만 (회전 각도 또는 에러 객체, 전처리된 흑백 이미지)를 return 한다.
+
+    OCR 단계에서 같은 페이지를 다시 전처리하지 않도록 전처리 결과를 함께 넘겨준다.
+    """
+    # 이미지 전처리
+    erased_line_image = EraseTableLine(cv_image, erase_engine).execute_all_erase_function()
+
+    try:
+        # OSD
+        osd = tesseract.image_to_osd(erased_line_image)
+
+        # 필요한 회전 각도 값 찾기
+        degree = int(rotation_pattern.findall(osd)[0])
+    except Exception as e:
+        return e, erased_line_image
+
+    return degree, erased_line_image
+
+# ================================================================================================================
+def rotate_erased_image(erased_line_image, degree):
+    """
+    erased_line_image : 회전 전 페이지를 전처리한 흑백 이미지 (None이면 그대로 return)
+    degree : 시계방향으로 회전되어야 할 각도 (정수가 아니면 OSD 에러를 의미)
+
+    전처리 결과를 페이지 이미지와 같은 방향(PIL rotate(-degree, expand=True))으로 회전한다.
+
+    OSD 각도는 90도 단위이므로 보간 없이 numpy로 회전하며, 회전한 페이지를 다시 전처리한 결과와 사실상 같다.
+    """
+    if erased_line_image is None or type(degree) != int:
+        return erased_line_image
+
+    return np.ascontiguousarray(np.rot90(erased_line_image, -(degree // 90)))
+
+# ================================================================================================================
+def to_shared_memory(image):
+    """
+    image : numpy 이미지
+
+    이미지를 shared memory에 복사하고 (SharedMemory 객체, worker에 넘길 정보)를 return 한다.
+    """
+    shm = shared_memory.SharedMemory(create=True, size=max(1, image.nbytes))
+    shared_image = np.ndarray(image.shape, dtype=image.dtype, buffer=shm.buf)
+    shared_image[...] = image
+
+    return shm, (shm.name, image.shape, image.dtype.str)
+
+def attach_shared_memory(shm_info):
+    """
+    shm_info : 'to_shared_memory'가 return 한 worker에 넘길 정보
+
+    worker 프로세스에서 shared memory의 이미지를 복사 없이 numpy array로 연결한다.
+    """
+    name, shape, dtype = shm_info
+    # spawn으로 생성된 worker는 부모 프로세스의 resource tracker를 공유하므로 unlink는 부모 프로세스에서만 한다
+    shm = shared_memory.SharedMemory(name=name)
+
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+# ================================================================================================================
+def erase_line_worker(image_info, result_info, erase_engine):
+    """
+    image_info : 원본 이미지의 shared memory 정보
+    result_info : 전처리 결과가 저장될 shared memory 정보
+    erase_engine : EraseTableLine 구분선 검출 방식
+
+    worker 프로세스에서 EraseTableLine 전처리를 하고 결과를 result shared memory에 바로 쓴다.
+    """
+    image_shm, image = attach_shared_memory(image_info)
+    result_shm, result = attach_shared_memory(result_info)
+
+    try:
+        result[...] = EraseTableLine(image, erase_engine).execute_all_erase_function()
+    finally:
+        del image, result
+        image_shm.close()
+        result_shm.close()
+
+def osd_worker(image_info, result_info, tesseract_cmd, erase_engine):
+    """
+    image_info : 원본 이미지(BGR 또는 흑백)의 shared memory 정보
+    result_info : 전처리 결과가 저장될 shared memory 정보
+    tesseract_cmd : tesseract 실행 파일 경로
+    erase_engine : EraseTableLine 구분선 검출 방식
+
+    worker 프로세스에서 OSD로 회전 각도를 구한다. 에러가 발생하면 None을 return 한다.
+
+    OSD를 위해 전처리한 이미지는 result shared memory에 바로 쓴다.
+    """
+    import pytesseract
+    pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+
+    image_shm, image = attach_shared_memory(image_info)
+    result_shm, result = attach_shared_memory(result_info)
+
+    try:
+        degree, result[...] = erase_and_detect_rotation(image, pytesseract, erase_engine)
+    finally:
+        del image, result
+        image_shm.close()
+        result_shm.close()
+
+    return degree if type(degree) == int else None
+
+# ================================================================================================================
+class PreprocessPool:
+    """
+    # 전처리, OSD 프로세스 pool
+
+    CPU를 많이 쓰는 EraseTableLine 전처리와 Tesseract OSD를 여러 프로세스에서 병렬로 실행한다.
+
+    이미지는 pickle로 복사하지 않고 shared memory로 worker에 넘기며, 결과는 입력한 이미지 순서(페이지 순서) 그대로 return 한다.
+
+    worker가 비정상 종료(OOM 등)되면 그 작업은 BrokenProcessPool 에러를 올리고, 다음 작업부터는 새로 만든 프로세스들을 사용한다.
+    """
+    def __init__(self, process_count):
+        """
+        process_count : worker 프로세스 개수
+        """
+        self.process_count = process_count
+        self.lock = threading.Lock()
+        self.executor = self.make_executor()
+
+    def make_executor(self):
+        # 서비스의 worker thread와 충돌하지 않도록 fork가 아닌 spawn으로 프로세스 생성
+        return ProcessPoolExecutor(max_workers=self.process_count, mp_context=multiprocessing.get_context("spawn"))
+
+    def replace_broken_executor(self, executor):
+        """
+        executor : BrokenProcessPool 에러가 난 executor
+
+        깨진 executor는 이후의 모든 작업에서 에러를 내므로 새 executor로 바꾼다. (다른 thread가 이미 바꿨으면 그대로 둔다)
+        """
+        with self.lock:
+            if self.executor is executor:
+                logging.warning("preprocess worker died, restart preprocess pool")
+                self.executor = self.make_executor()
+
+        executor.shutdown(wait=False)
+
+    # 이미지 여러 장 전처리
+    def erase_lines(self, images, erase_engine=ERASE_ENGINE_VECTORIZED):
+        """
+        images : opencv(BGR) 이미지 또는 흑백 이미지들의 리스트
+        erase_engine : EraseTableLine 구분선 검출 방식
+
+        전처리된 흑백 이미지들의 리스트를 입력 순서대로 return 한다.
+        """
+        executor = self.executor
+        shms = []
+        futures = []
+        results = []
+
+        try:
+            for image in images:
+                image_shm, image_info = to_shared_memory(image)
+                # 전처리 결과는 원본과 같은 크기의 흑백 이미지
+                result_shm, result_info = to_shared_memory(np.zeros(image.shape[:2], dtype=np.uint8))
+                shms += [image_shm, result_shm]
+
+                futures.append((executor.submit(erase_line_worker, image_info, result_info, erase_engine), result_shm, image.shape[:2]))
+
+            for future, result_shm, shape in futures:
+                future.result()
+                results.append(np.ndarray(shape, dtype=np.uint8, buffer=result_shm.buf).copy())
+
+        except BrokenProcessPool:
+            self.replace_broken_executor(executor)
+            raise
+
+        finally:
+            for shm in shms:
+                shm.close()
+                shm.unlink()
+
+        return results
+
+    # 이미지 여러 장 OSD
+    def detect_rotations(self, images, tesseract, erase_engine=ERASE_ENGINE_VECTORIZED):
+        """
+        images : opencv(BGR) 이미지 또는 흑백 이미지들의 리스트
+        tesseract : pytesseract model
+        erase_engine : EraseTableLine 구분선 검출 방식
+
+        (시계방향으로 회전되어야 할 각도(OSD 에러 시 None)들의 리스트, 전처리된 흑백 이미지들의 리스트)를 입력 순서대로 return 한다.
+        """
+        executor = self.executor
+        shms = []
+        futures = []
+        degrees = []
+        erased_line_images = []
+
+        try:
+            for image in images:
+                image_shm, image_info = to_shared_memory(image)
+                result_shm, result_info = to_shared_memory(np.zeros(image.shape[:2], dtype=np.uint8))
+                shms += [image_shm, result_shm]
+
+                futures.append((executor.submit(osd_worker, image_info, result_info, tesseract.pytesseract.tesseract_cmd, erase_engine), result_shm, image.shape[:2]))
+
+            for future, result_shm, shape in futures:
+                degrees.append(future.result())
+                erased_line_images.append(np.ndarray(shape, dtype=np.uint8, buffer=result_shm.buf).copy())
+
+        except BrokenProcessPool:
+            self.replace_broken_executor(executor)
+            raise
+
+        finally:
+            for shm in shms:
+                shm.close()
+                shm.unlink()
+
+        return degrees, erased_line_images
+
+    def shutdown(self):
+        self.executor.shutdown()
+
+# ================================================================================================================
+def get_preprocess_pool(process_count):
+    """
+    process_count : worker 프로세스 개수 (0 이하이면 병렬 처리를 하지 않는다)
+
+    프로세스 수에 맞는 PreprocessPool을 한 번만 만들어 재사용한다. 병렬 처리를 하지 않으면 None을 return 한다.
+    """
+    if not process_count or process_count <= 0:
+        return None
+
+    with preprocess_pools_lock:
+        if process_count not in preprocess_pools:
+            preprocess_pools[process_count] = PreprocessPool(process_count)
+
+    return preprocess_pools[process_count]
@@ -0,0 +1,145 @@
+import cv2
+import fitz
+import numpy as np
+
+# 삽입 이미지를 OCR 하지 않는 이유
+# small : 아이콘, 글머리표 등 작은 이미지, text_covered : 텍스트 레이어가 이미 덮고 있는 이미지, low_entropy : 단색 배경, 장식용 이미지
+SKIP_SMALL = "small"
+SKIP_TEXT_COVERED = "text_covered"
+SKIP_LOW_ENTROPY = "low_entropy"
+
+# 텍스트 레이어가 이미지를 덮는 비율을 계산할 격자의 한 변 칸 수
+COVERAGE_GRID_SIZE = 32
+# 엔트로피를 계산할 축소 이미지의 긴 변 최대 길이
+ENTROPY_SAMPLE_SIZE = 256
+
+# ================================================================================================================
+def text_block_rects(page, margin=6):
+    """
+    page : fitz 모듈로 연 pdf 문서의 페이지
+    margin : 블록 영역을 사방으로 넓힐 길이(pt) (문단 사이의 좁은 간격을 덮기 위해)
+
+    페이지 텍스트 레이어(보이지 않는 OCR 텍스트 포함)의 텍스트 블록 영역 리스트를 return 한다.
+    """
+    rects = []
+    for block in page.get_text("blocks"):
+        # 이미지 블록(block_type 1)과 공백뿐인 블록은 제외
+        if block[6] != 0 or not block[4].strip():
+            continue
+        rects.append(fitz.Rect(block[:4]) + (-margin, -margin, margin, margin))
+
+    return rects
+
+def text_coverage(image_rect, text_rects, grid_size=COVERAGE_GRID_SIZE):
+    """
+    image_rect : 페이지에 배치된 이미지 영역
+    text_rects : 'text_block_rects' 함수가 return 한 텍스트 블록 영역 리스트
+
+    이미지 영역을 grid_size x grid_size 격자로 나눠서 중심이 텍스트 블록 안에 있는 칸의 비율을 return 한다. (겹친 블록을 두 번 세지 않는다)
+    """
+    if image_rect.is_empty or not text_rects:
+        return 0.0
+
+    xs = image_rect.x0 + (np.arange(grid_size) + 0.5) * image_rect.width / grid_size
+    ys = image_rect.y0 + (np.arange(grid_size) + 0.5) * image_rect.height / grid_size
+    grid_x, grid_y = np.meshgrid(xs, ys)
+
+    covered = np.zeros(grid_x.shape, dtype=bool)
+    for rect in text_rects:
+        covered |= (grid_x >= rect.x0) & (grid_x < rect.x1) & (grid_y >= rect.y0) & (grid_y < rect.y1)
+
+    return float(covered.mean())
+
+def image_entropy(cv_image):
+    """
+    cv_image : opencv(BGR) 이미지 또는 흑백 이미지
+
+    축소한 흑백 이미지의 밝기 히스토그램 엔트로피(bit)를 return 한다. 단색에 가까울수록 0에 가깝다.
+    """
+    gray_image = cv_image if cv_image.ndim == 2 else cv2.cvtColor(cv_image, cv2.COLOR_BGR2GRAY)
+
+    scale = ENTROPY_SAMPLE_SIZE / max(gray_image.shape[:2])
+    if scale < 1:
+        gray_image = cv2.resize(gray_image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    histogram = np.bincount(gray_image.ravel(), minlength=256).astype(np.float64)
+    probabilities = histogram[histogram > 0] / histogram.sum()
+
+    return float(-(probabilities * np.log2(probabilities)).sum())
+
+# ================================================================================================================
+class RegionPlanner:
+    """
+    # ICCBased 페이지 삽입 이미지 OCR 대상 선정
+
+    ICCBased 페이지의 삽입 이미지 중 텍스트 레이어에 없는 글자가 있을 만한 이미지만 OCR 대상으로 남긴다.
+
+    1. 이미지 크기(픽셀)가 작은 이미지 (아이콘, 글머리표 등)
+    2. 페이지에 배치된 영역 대부분을 텍스트 레이어가 덮고 있는 이미지 (텍스트 레이어가 있는 스캔 이미지, 글자 뒤 배경 등)
+    3. 밝기 엔트로피가 낮은 이미지 (단색 배경, 장식용 이미지)
+
+    1, 2는 이미지를 불러오기 전에 PyMuPDF 메타데이터(get_images, get_image_rects, 텍스트 블록)로 판단하고, 3은 불러온 이미지로 판단한다.
+    """
+    def __init__(self, min_side=32, min_pixels=4096, max_text_coverage=0.7, min_entropy=1.0):
+        """
+        min_side : OCR 할 이미지의 짧은 변 최소 픽셀 수
+        min_pixels : OCR 할 이미지의 최소 픽셀 수
+        max_text_coverage : 텍스트 레이어가 이미지 영역을 이 비율 이상 덮으면 OCR 하지 않는다
+        min_entropy : OCR 할 이미지의 최소 밝기 엔트로피(bit)
+        """
+        self.min_side = min_side
+        self.min_pixels = min_pixels
+        self.max_text_coverage = max_text_coverage
+        self.min_entropy = min_entropy
+
+    def plan(self, page):
+        """
+        page : fitz 모듈로 연 pdf 문서의 페이지
+
+        페이지의 삽입 이미지 순서('get_page_images(full=True)', png lake의 inner_images 순서)대로
+        OCR 하지 않을 이유(SKIP_SMALL, SKIP_TEXT_COVERED) 또는 None의 리스트를 return 한다.
+        """
+        text_rects = None
+        reasons = []
+
+        for image_info in page.get_images(full=True):
+            xref, width, height = image_info[0], image_info[2], image_info[3]
+
+            if min(width, height) < self.min_side or width * height < self.min_pixels:
+                reasons.append(SKIP_SMALL)
+                continue
+
+            # 텍스트 블록은 크기 기준을 통과한 이미지가 있을 때만 한 번 계산
+            if text_rects is None:
+                text_rects = text_block_rects(page)
+
+            # 같은 이미지가 여러 곳에 배치되어 있으면 모든 배치 영역이 덮여 있어야 건너뛴다
+            image_rects = [rect & page.rect for rect in page.get_image_rects(xref)]
+            image_rects = [rect for rect in image_rects if not rect.is_empty]
+            if image_rects and all(text_coverage(rect, text_rects) >= self.max_text_coverage for rect in image_rects):
+                reasons.append(SKIP_TEXT_COVERED)
+                continue
+
+            reasons.append(None)
+
+        return reasons
+
+    def check_image(self, cv_image):
+        """
+        불러온 이미지를 OCR 하지 않을 이유(SKIP_LOW_ENTROPY) 또는 None을 return 한다.
+        """
+        if image_entropy(cv_image) < self.min_entropy:
+            return SKIP_LOW_ENTROPY
+
+        return None
+
+def make_region_planner(config):
+    """
+    config : 파이프라인 설정값 dict
+
+    'region_planner' 설정이 True이면 RegionPlanner를 만들고, 아니면 None을 return 한다. (None이면 모든 삽입 이미지를 OCR)
+    """
+    if not config["region_planner"]:
+        return None
+
+    return RegionPlanner(config["region_min_side"], config["region_min_pixels"], config["region_max_text_coverage"], config["region_min_entropy"])
@@ -0,0 +1,287 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from hdfs_client import make_hdfs_client
+from ndjson_output import make_ndjson_path, write_ndjson_output
+from pdf_source import PdfSource
+import logging
+
+# 결과값 형식이나 추출 로직이 바뀌면 올려서 이전 캐시를 무효화한다
+PIPELINE_VERSION = "1"
+
+# 결과값에 영향을 주지 않아서 캐시 key에서 제외하는 설정값
+# ('ocr_gpu'는 GPU와 CPU에서 easyocr 결과 텍스트가 다를 수 있으므로 제외하지 않는다)
+cache_key_excluded_config = [
+    "result_cache", "result_cache_path", "result_cache_max_bytes",
+    "worker_count", "job_queue_size", "job_admission", "job_block_timeout",
+    "preprocess_processes", "save_png", "png_storage", "erase_line_engine",
+    "metrics", "metrics_in_output", "metrics_sink", "metrics_sink_path",
+    "hdfs_backend", "local_hdfs_root",
+    "hdfs_pool_size", "hdfs_timeout", "hdfs_max_tries", "hdfs_retry_backoff", "hdfs_bulk_workers",
+    "batch_workers", "batch_manifest_path", "batch_progress_interval", "page_checkpoint",
+    "output_format", "ocr_tile_batch",
+    "ocr_onnx_directory", "ocr_intra_op_threads", "ocr_inter_op_threads",
+    "ocr_model_directory", "ocr_download_enabled", "startup_warmup", "startup_preload_pipeline",
+    "ocr_workers", "ocr_worker_threads", "ocr_worker_timeout",
+    "pdf_spill_bytes", "pdf_spill_directory", "pdf_spill_chunk_bytes"
+]
+
+# backend 별로 한 번만 생성해서 재사용하는 캐시 (hit/miss 카운터 유지)
+result_caches = {}
+result_caches_lock = threading.Lock()
+
+# ================================================================================================================
+def make_cache_key(content, config):
+    """
+    content : pdf 파일의 바이트 데이터 또는 PdfSource 객체
+    config : 파이프라인 설정값 dict
+
+    pdf 내용, 결과값에 영향을 주는 설정값, 파이프라인 버전으로 캐시 key(sha256)를 만든다.
+
+    경로가 달라도 같은 pdf, 같은 설정이면 같은 key가 나온다.
+    """
+    key_config = {key : value for key, value in config.items() if key not in cache_key_excluded_config}
+
+    hasher = hashlib.sha256()
+    hasher.update(content.digest() if isinstance(content, PdfSource) else hashlib.sha256(content).digest())
+    hasher.update(json.dumps(key_config, sort_keys=True, default=str).encode())
+    hasher.update(PIPELINE_VERSION.encode())
+
+    return hasher.hexdigest()
+
+def is_complete_output(output):
+    """
+    output : 'extract_text' 함수의 결과값
+
+    STATUS가 200이고 실패한 페이지가 없으며, 모든 페이지의 결과가 들어있으면 True를 return 한다.
+
+    ndjson 형식의 결과값(요약 줄)은 PAGES가 파일에만 있고 요약 줄은 모든 페이지를 쓴 후에 기록하므로 STATUS와 실패한 페이지만 확인한다.
+    """
+    if output.get("STATUS") != "200" or output.get("FAILED_PAGES"):
+        return False
+
+    if "PAGES" not in output:
+        return True
+
+    return len(output["PAGES"]) == int(output.get("PAGE_COUNT") or 0)
+
+# ================================================================================================================
+class LocalDiskCacheBackend:
+    """
+    # 로컬 디스크 캐시 저장소
+
+    '{directory}/{key}.json' 형태로 저장하고, 파일 수정 시간을 마지막 사용 시간으로 사용한다.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+
+        with open(path, "rb") as fp:
+            data = fp.read()
+
+        # 마지막 사용 시간 갱신
+        os.utime(path)
+
+        return data
+
+    def put(self, key, data):
+        # 쓰는 도중의 파일을 읽지 않도록 임시 파일에 쓴 후 이름 변경
+        tmp_path = self.path(key) + ".tmp"
+        with open(tmp_path, "wb") as fp:
+            fp.write(data)
+        os.replace(tmp_path, self.path(key))
+
+    def list_entries(self):
+        """
+        (key, 크기, 마지막 사용 시간) 리스트를 return 한다.
+        """
+        entries = []
+        for file in os.listdir(self.directory):
+            if file.endswith(".json"):
+                stat = os.stat(os.path.join(self.directory, file))
+                entries.append((file[:-len(".json")], stat.st_size, stat.st_mtime))
+
+        return entries
+
+    def delete(self, key):
+        if os.path.exists(self.path(key)):
+            os.remove(self.path(key))
+
+# ================================================================================================================
+class HdfsCacheBackend:
+    """
+    # hdfs 캐시 저장소
+
+    '{directory}/{key}.json' 형태로 hdfs에 저장하고, 파일 수정 시간을 마지막 사용 시간으로 사용한다.
+    """
+    def __init__(self, directory, fs):
+        self.directory = directory
+        self.fs = fs
+        self.fs.mkdirs(directory)
+
+    def path(self, key):
+        return f"{self.directory.rstrip('/')}/{key}.json"
+
+    def get(self, key):
+        path = self.path(key)
+        if not self.fs.exists(path):
+            return None
+
+        with self.fs.open(path) as fp:
+            data = fp.read()
+
+        # 마지막 사용 시간 갱신 (hdfs 시간 단위는 ms)
+        self.fs.set_times(path, modificationtime=int(time.time() * 1000))
+
+        return data
+
+    def put(self, key, data):
+        self.fs.create(self.path(key), data, overwrite=True)
+
+    def list_entries(self):
+        """
+        (key, 크기, 마지막 사용 시간) 리스트를 return 한다.
+        """
+        entries = []
+        for item in self.fs.list_status(self.directory):
+            if item["type"] == "FILE" and item["pathSuffix"].endswith(".json"):
+                entries.append((item["pathSuffix"][:-len(".json")], item["length"], item["modificationTime"] / 1000))
+
+        return entries
+
+    def delete(self, key):
+        self.fs.delete(self.path(key))
+
+# ================================================================================================================
+class ResultCache:
+    """
+    # 결과값 캐시
+
+    pdf 내용 hash로 'extract_text' 결과값을 저장하고, 같은 pdf가 다시 들어오면 저장된 결과값을 바로 돌려준다.
+
+    전체 크기가 max_bytes를 넘으면 가장 오래 사용하지 않은 결과값부터 삭제한다.
+    """
+    def __init__(self, backend, max_bytes=10 * 1024 ** 3):
+        """
+        backend : 캐시 저장소 (LocalDiskCacheBackend, HdfsCacheBackend)
+        max_bytes : 캐시 전체의 최대 크기
+        """
+        self.backend = backend
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.counters = {
+            "HITS" : 0,
+            "MISSES" : 0,
+            "STORES" : 0,
+            "EVICTIONS" : 0
+        }
+
+    def get(self, key):
+        """
+        저장된 결과값 dict를 return 한다. 없으면 None을 return 한다.
+        """
+        try:
+            data = self.backend.get(key)
+        except Exception:
+            logging.exception("result cache read failed : {}".format(key))
+            data = None
+
+        with self.lock:
+            self.counters["HITS" if data is not None else "MISSES"] += 1
+
+        return json.loads(data) if data is not None else None
+
+    def put(self, key, output):
+        """
+        모든 페이지가 성공한 결과값만 저장하고, 최대 크기를 넘으면 오래된 결과값을 삭제한다.
+        """
+        # ndjson 형식으로 처리한 결과값은 FULL_TEXT, PAGES가 파일에만 있으므로 저장하지 않는다
+        if "PAGES" not in output:
+            return
+
+        # 중간에 멈춰서 일부 페이지만 있는 결과값은 저장하지 않는다
+        if not is_complete_output(output):
+            return
+
+        # 측정 결과는 그 실행에만 해당하므로 저장하지 않는다
+        output = {field : value for field, value in output.items() if field != "METRICS"}
+
+        try:
+            self.backend.put(key, json.dumps(output).encode())
+            with self.lock:
+                self.counters["STORES"] += 1
+            self.evict()
+        except Exception:
+            logging.exception("result cache write failed : {}".format(key))
+
+    def evict(self):
+        """
+        마지막 사용 시간이 오래된 순서로 전체 크기가 max_bytes 이하가 될 때까지 삭제한다.
+        """
+        entries = sorted(self.backend.list_entries(), key=lambda entry: entry[2])
+        total_bytes = sum(size for _, size, _ in entries)
+
+        for key, size, _ in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            self.backend.delete(key)
+            total_bytes -= size
+            with self.lock:
+                self.counters["EVICTIONS"] += 1
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters)
+
+# ================================================================================================================
+def get_result_cache(config, hdfs_hosts="hdfs.kdap.svc.cluster.local:9870"):
+    """
+    config : 파이프라인 설정값 dict
+    hdfs_hosts : hdfs 캐시 저장소를 사용할 때 접속할 hdfs의 호스트
+
+    'result_cache' 설정값("local", "hdfs")에 맞는 ResultCache를 한 번만 만들어 재사용한다. 설정하지 않았으면 None을 return 한다.
+    """
+    backend_type = config["result_cache"]
+    if not backend_type:
+        return None
+
+    cache_id = (backend_type, config["result_cache_path"], hdfs_hosts if backend_type == "hdfs" else None)
+    with result_caches_lock:
+        if cache_id not in result_caches:
+            if backend_type == "hdfs":
+                backend = HdfsCacheBackend(config["result_cache_path"], make_hdfs_client(hdfs_hosts, config))
+            else:
+                backend = LocalDiskCacheBackend(config["result_cache_path"])
+            result_caches[cache_id] = ResultCache(backend, config["result_cache_max_bytes"])
+
+    return result_caches[cache_id]
+
+# ================================================================================================================
+def save_cached_result(fs, output, json_path, file_name, output_format="json"):
+    """
+    fs : pyhdfs의 HdfsClient 객체
+    output : 캐시에서 불러온 결과값
+    json_path : json파일이 저장될 hdfs의 json 저장소의 경로
+    file_name : pdf 파일의 이름
+    output_format : 결과 저장 형식 ("json", "ndjson")
+
+    캐시에서 불러온 결과값을 이번 요청의 json 경로에 저장한다.
+    """
+    if output_format == "ndjson":
+        write_ndjson_output(fs, output, make_ndjson_path(json_path, file_name))
+        logging.info("Saved cached ndjson file in hdfs")
+        return
+
+    result_path = os.path.join(json_path, f"{file_name}.json")
+    fs.create(result_path, json.dumps(output).encode(), overwrite=True)
+    logging.info("Saved cached json file in hdfs")
@@ -0,0 +1,132 @@
+import os
+import time
+import json
+import logging
+import numpy as np
+from PIL import Image, ImageDraw
+
+# 시작 단계 이름
+STARTUP_IMPORT_SERVICE = "import_service"
+STARTUP_IMPORT_OCR = "import_ocr"
+STARTUP_MODEL_LOAD = "model_load"
+STARTUP_WARMUP = "warmup"
+STARTUP_IMPORT_PIPELINE = "import_pipeline"
+STARTUP_SCHEDULER = "scheduler"
+
+# warm-up 이미지에 쓸 글자
+WARMUP_TEXT = "KEPCO ENC FULL TEXT 0123456789"
+
+# ================================================================================================================
+class StartupTimer:
+    """
+    # 서비스 시작 시간 측정
+
+    시작 단계(import, 모델 load, warm-up 등) 별 소요 시간을 기록하고, 'report'로 단계 별 시간과 전체 시간을 돌려준다.
+
+    with startup_timer.stage(STARTUP_MODEL_LOAD):
+        ...
+    """
+    def __init__(self, start=None):
+        """
+        start : 시작 시각 ('time.perf_counter' 값, None이면 지금)
+        """
+        self.start = start if start is not None else time.perf_counter()
+        self.stages = {}
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def stage(self, name):
+        return StartupStage(self, name)
+
+    def report(self):
+        """
+        {"STAGES" : {단계 이름 : 초}, "TOTAL_SECONDS" : 시작부터 지금까지의 초}를 return 한다.
+        """
+        return {
+            "STAGES" : dict(self.stages),
+            "TOTAL_SECONDS" : time.perf_counter() - self.start
+        }
+
+class StartupStage:
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.timer.add(self.name, time.perf_counter() - self.start)
+        return False
+
+# ================================================================================================================
+def make_warmup_image(width=640, height=160):
+    """
+    글자 한 줄이 있는 흑백 이미지를 만든다. (detector, recognizer가 모두 실행되도록 글자를 넣는다)
+    """
+    image = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(image)
+
+    # Pillow 기본 글꼴은 너무 작아서 글자 크기를 키운다
+    try:
+        draw.text((20, height // 3), WARMUP_TEXT, fill=0, font_size=40)
+    except TypeError:
+        # font_size 인자가 없는 Pillow(10.1 미만)
+        draw.text((20, height // 3), WARMUP_TEXT, fill=0)
+
+    return np.array(image)
+
+def warm_up_ocr(easyocr):
+    """
+    # OCR 모델 warm-up
+
+    easyocr : ocr.Inference 객체
+
+    합성 이미지로 'extract_text'와 'extract_text_batch'를 한 번씩 실행해서 첫 요청 전에 모델 초기화(메모리 할당, kernel 선택 등)를 끝낸다.
+
+    warm-up 결과의 STATUS를 return 한다. 실패해도 서비스 시작은 막지 않는다.
+    """
+    image = make_warmup_image()
+
+    output = easyocr.extract_text(image)
+    if output["STATUS"] == "200":
+        # OcrWorkerPool이면 모든 worker가 한 장 이상 처리하도록 worker 수만큼 넣는다
+        output = easyocr.extract_text_batch([image] * max(2, getattr(easyocr, "process_count", 1)))[0]
+
+    if output["STATUS"] != "200":
+        logging.warning("ocr warm-up failed : {}".format(output["STATUS_RESULT"]))
+
+    return output["STATUS"]
+
+# ================================================================================================================
+def execute_fulltext_job(pdf_path, png_lake, tesseract, easyocr, json_path, config=None):
+    """
+    'execute_fulltext_api'를 처음 실행할 때 pdf 처리 모듈(pandas, cv2, fitz, pyhdfs 등)을 import 하는 작업 함수.
+
+    서비스 시작 시 무거운 모듈의 import를 미루기 위해 JobScheduler의 target으로 사용한다.
+
+    작업 상태에서 결과 파일을 찾을 수 있도록 저장한 결과 파일 경로를 'RESULT_PATH'에 넣는다. (저장하지 않았으면 빈 문자열)
+    """
+    from exe_full_text import execute_fulltext_api
+
+    output = execute_fulltext_api(pdf_path, png_lake, tesseract, easyocr, json_path, config=config)
+    output["RESULT_PATH"] = make_result_path(output, pdf_path, json_path)
+
+    return output
+
+def make_result_path(output, pdf_path, json_path):
+    # ndjson 형식이면 결과값에 저장 경로가 있다
+    if "OUTPUT_PATH" in output:
+        return output["OUTPUT_PATH"]
+
+    # json은 모든 페이지를 처리했을 때(성공했거나 실패한 페이지가 기록된 경우)만 저장된다
+    if output.get("STATUS") != "200" and not output.get("FAILED_PAGES"):
+        return ""
+
+    file_name = os.path.splitext(os.path.basename(pdf_path))[0]
+    return os.path.join(json_path, f"{file_name}.json")
+
+def log_startup_report(report):
+    logging.info("startup : {}".format(json.dumps(report)))
@@ -0,0 +1,110 @@
+import json
+import pytest
+from hdfs_client import LocalHdfsClient
+from batch_fulltext import BatchManifest, BatchProgress, make_output_paths, find_duplicate_outputs, find_pdf_paths, has_successful_json, process_document, BATCH_DONE, BATCH_FAILED, BATCH_SKIPPED
+
+# ================================================================================================================
+@pytest.fixture
+def fs(tmp_path):
+    return LocalHdfsClient(str(tmp_path / "hdfs"))
+
+@pytest.fixture
+def manifest_path(tmp_path):
+    return str(tmp_path / "manifest" / "batch.jsonl")
+
+def make_output(page_count=2, **fields):
+    output = {
+        "STATUS" : "200",
+        "STATUS_RESULT" : "성공",
+        "PAGE_COUNT" : str(page_count),
+        "FAILED_PAGES" : [],
+        "PAGES" : [{"page_number" : str(page_num)} for page_num in range(1, page_count + 1)]
+    }
+    output.update(fields)
+    return output
+
+# ================================================================================================================
+def test_make_output_paths():
+    assert make_output_paths("/input", "/input/a.pdf", "/png", "/json") == ("/png", "/json")
+    assert make_output_paths("/input/", "/input/2024/01/a.pdf", "/png", "/json") == ("/png/2024/01", "/json/2024/01")
+
+def test_find_duplicate_outputs():
+    pdf_paths = ["/input/a.pdf", "/input/a.PDF", "/input/b.pdf", "/input/sub/a.pdf"]
+    assert find_duplicate_outputs(pdf_paths) == ["/input/a.pdf", "/input/a.PDF"]
+    assert find_duplicate_outputs(["/input/a.pdf", "/input/sub/a.pdf"]) == []
+
+def test_find_pdf_paths(fs):
+    for path in ["/input/b.pdf", "/input/sub/a.PDF", "/input/readme.txt"]:
+        fs.create(path, b"data")
+
+    assert find_pdf_paths(fs, "/input") == ["/input/b.pdf", "/input/sub/a.PDF"]
+
+# ================================================================================================================
+def test_manifest_resume(manifest_path):
+    manifest = BatchManifest(manifest_path)
+    manifest.write({"PDF_PATH" : "/input/a.pdf", "STATE" : BATCH_DONE})
+    manifest.write({"PDF_PATH" : "/input/b.pdf", "STATE" : BATCH_FAILED})
+    manifest.write({"PDF_PATH" : "/input/c.pdf", "STATE" : BATCH_SKIPPED})
+    manifest.close()
+
+    resumed = BatchManifest(manifest_path)
+    assert resumed.is_finished("/input/a.pdf")
+    assert resumed.is_finished("/input/c.pdf")
+    assert not resumed.is_finished("/input/d.pdf")
+    # 실패한 문서는 retry_failed일 때만 다시 처리한다
+    assert not resumed.is_finished("/input/b.pdf")
+    assert resumed.is_finished("/input/b.pdf", retry_failed=False)
+    resumed.close()
+
+def test_manifest_resume_after_truncated_line(manifest_path):
+    manifest = BatchManifest(manifest_path)
+    manifest.write({"PDF_PATH" : "/input/a.pdf", "STATE" : BATCH_DONE})
+    manifest.close()
+
+    # 기록 도중 죽어서 잘린 마지막 줄
+    with open(manifest_path, "a", encoding="utf-8") as fp:
+        fp.write(json.dumps({"PDF_PATH" : "/input/b.pdf", "STATE" : BATCH_DONE})[:20])
+
+    resumed = BatchManifest(manifest_path)
+    assert resumed.is_finished("/input/a.pdf")
+    assert not resumed.is_finished("/input/b.pdf")
+
+    # 잘린 줄 뒤에 새 기록이 붙지 않는다
+    resumed.write({"PDF_PATH" : "/input/b.pdf", "STATE" : BATCH_DONE})
+    resumed.close()
+
+    assert sorted(BatchManifest(manifest_path).records) == ["/input/a.pdf", "/input/b.pdf"]
+
+# ================================================================================================================
+def test_has_successful_json(fs):
+    fs.create("/json/done.json", json.dumps(make_output()).encode())
+    fs.create("/json/partial.json", json.dumps(make_output(FAILED_PAGES=["2"])).encode())
+    fs.create("/json/broken.json", b'{"STATUS": "2')
+
+    assert has_successful_json(fs, "/json", "/input/done.pdf")
+    assert not has_successful_json(fs, "/json", "/input/partial.pdf")
+    assert not has_successful_json(fs, "/json", "/input/broken.pdf")
+    assert not has_successful_json(fs, "/json", "/input/missing.pdf")
+    assert not has_successful_json(fs, "/json", "/input/done.pdf", output_format="ndjson")
+
+def test_process_document(fs, manifest_path):
+    fs.create("/json/done.json", json.dumps(make_output()).encode())
+    manifest = BatchManifest(manifest_path)
+    progress = BatchProgress(total=4, interval=3600)
+
+    def fulltext_api(pdf_path):
+        if "broken" in pdf_path:
+            raise ValueError("broken pdf")
+        if "partial" in pdf_path:
+            return make_output(3, FAILED_PAGES=["3"])
+        return make_output(3)
+
+    states = {pdf_path : process_document(pdf_path, fulltext_api, fs, "/json", manifest, progress)["STATE"]
+              for pdf_path in ["/input/done.pdf", "/input/new.pdf", "/input/partial.pdf", "/input/broken.pdf"]}
+    manifest.close()
+
+    assert states == {"/input/done.pdf" : BATCH_SKIPPED, "/input/new.pdf" : BATCH_DONE, "/input/partial.pdf" : BATCH_FAILED, "/input/broken.pdf" : BATCH_FAILED}
+
+    snapshot = progress.snapshot()
+    assert (snapshot["FINISHED"], snapshot["DONE"], snapshot["FAILED"], snapshot["SKIPPED"], snapshot["PAGES"]) == (4, 1, 2, 1, 6)
+    assert BatchManifest(manifest_path).records["/input/broken.pdf"]["STATUS"] != ""
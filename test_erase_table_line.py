@@ -0,0 +1,54 @@
+import cv2
+import numpy as np
+import pytest
+from erase_table_line import EraseTableLine, ERASE_ENGINE_CONTOUR, ERASE_ENGINE_VECTORIZED
+from benchmark_erase_table_line import make_table_image
+
+# 표 이미지 크기 (로고, 도장 같은 작은 삽입 이미지는 한 변이 최소 사각형 크기(30)의 2배보다 작다)
+IMAGE_SIZES = [(20, 16), (40, 24), (48, 56), (59, 45), (120, 90), (400, 300)]
+
+# ================================================================================================================
+def make_random_image(rng, width, height):
+    # 작은 이미지에 선, 사각형, 점 모양의 잡음을 그린다
+    image = np.full((height, width, 3), 255, dtype=np.uint8)
+    for _ in range(rng.integers(1, 8)):
+        x1, x2 = sorted(rng.integers(0, width, size=2))
+        y1, y2 = sorted(rng.integers(0, height, size=2))
+        if rng.random() < 0.5:
+            cv2.rectangle(image, (int(x1), int(y1)), (int(x2), int(y2)), (0, 0, 0), int(rng.integers(1, 3)))
+        else:
+            cv2.line(image, (int(x1), int(y1)), (int(x2), int(y2)), (0, 0, 0), int(rng.integers(1, 3)))
+
+    noise = rng.integers(0, 60, size=image.shape[:2], dtype=np.uint8)
+    return cv2.subtract(image, cv2.merge([noise, noise, noise]))
+
+def assert_same_lines(image):
+    contour_lines = EraseTableLine(image, engine=ERASE_ENGINE_CONTOUR).detect_contour()
+    vectorized_lines = EraseTableLine(image, engine=ERASE_ENGINE_VECTORIZED).detect_contour_vectorized()
+
+    assert np.array_equal(contour_lines, vectorized_lines)
+
+# ================================================================================================================
+@pytest.mark.parametrize("width, height", IMAGE_SIZES)
+def test_table_images_match_contour_engine(width, height):
+    for seed in range(10):
+        rows, cols = seed % 4 + 1, seed % 3 + 1
+        image = make_table_image(width, height, rows, cols, seed=seed)
+
+        assert_same_lines(image)
+        assert_same_lines(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY))
+
+def test_random_small_images_match_contour_engine():
+    rng = np.random.default_rng(0)
+    for _ in range(400):
+        width, height = (int(size) for size in rng.integers(8, 80, size=2))
+
+        assert_same_lines(make_random_image(rng, width, height))
+
+def test_erased_images_match_contour_engine():
+    for width, height in IMAGE_SIZES:
+        image = make_table_image(width, height, 3, 2)
+        contour_result = EraseTableLine(image, engine=ERASE_ENGINE_CONTOUR).execute_all_erase_function()
+        vectorized_result = EraseTableLine(image, engine=ERASE_ENGINE_VECTORIZED).execute_all_erase_function()
+
+        assert np.array_equal(contour_result, vectorized_result)
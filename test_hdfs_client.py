@@ -0,0 +1,120 @@
+import io
+import pytest
+import pyhdfs
+import hdfs_client
+from config import default_config
+from hdfs_client import HdfsStorage, LocalHdfsClient, make_hdfs_client
+
+# ================================================================================================================
+@pytest.fixture
+def sleeps(monkeypatch):
+    # 재시도 대기 시간을 기록만 하고 기다리지 않는다 (random.uniform은 최소값 0.5로 고정)
+    delays = []
+    monkeypatch.setattr(hdfs_client.time, "sleep", delays.append)
+    monkeypatch.setattr(hdfs_client.random, "uniform", lambda low, high: low)
+    return delays
+
+class FlakyClient:
+    """
+    메소드 별로 정해진 횟수만큼 에러를 낸 후 LocalHdfsClient로 넘기는 client
+    """
+    def __init__(self, root, failures, error=ConnectionError("connection reset")):
+        self.client = LocalHdfsClient(root)
+        self.failures = dict(failures)
+        self.error = error
+        self.calls = {}
+
+    def __getattr__(self, name):
+        attribute = getattr(self.client, name)
+
+        def method(*args, **kwargs):
+            self.calls[name] = self.calls.get(name, 0) + 1
+            if self.failures.get(name, 0) > 0:
+                self.failures[name] -= 1
+                raise self.error
+            return attribute(*args, **kwargs)
+
+        return method
+
+# ================================================================================================================
+def test_retry_with_backoff(tmp_path, sleeps):
+    client = FlakyClient(str(tmp_path), {"exists" : 2})
+    storage = HdfsStorage(client, max_tries=3, retry_backoff=1.0)
+
+    assert storage.exists("/missing") is False
+    assert client.calls["exists"] == 3
+    # 재시도마다 대기 시간이 두 배
+    assert sleeps == [0.5, 1.0]
+
+def test_give_up_after_max_tries(tmp_path, sleeps):
+    client = FlakyClient(str(tmp_path), {"mkdirs" : 5}, pyhdfs.HdfsStandbyException("standby", "StandbyException", 403))
+    storage = HdfsStorage(client, max_tries=3, retry_backoff=2.0)
+
+    with pytest.raises(pyhdfs.HdfsStandbyException):
+        storage.mkdirs("/dir")
+    assert client.calls["mkdirs"] == 3
+    assert sleeps == [1.0, 2.0]
+
+def test_other_errors_are_not_retried(tmp_path, sleeps):
+    client = FlakyClient(str(tmp_path), {"list_status" : 1}, pyhdfs.HdfsFileNotFoundException("/dir not found", "FileNotFoundException", 404))
+    storage = HdfsStorage(client, max_tries=3)
+
+    with pytest.raises(pyhdfs.HdfsFileNotFoundException):
+        storage.list_status("/dir")
+    assert client.calls["list_status"] == 1
+    assert sleeps == []
+
+def test_create_retry(tmp_path, sleeps):
+    client = FlakyClient(str(tmp_path), {"create" : 1})
+    storage = HdfsStorage(client, max_tries=3)
+    storage.create("/a.txt", b"bytes")
+    assert storage.open("/a.txt").read() == b"bytes"
+
+    # 파일 객체는 처음 위치로 되돌린 후 다시 보낸다
+    class HalfReadClient(FlakyClient):
+        def __getattr__(self, name):
+            if name != "create" or not self.failures.get(name):
+                return super().__getattr__(name)
+
+            def create(path, data, **kwargs):
+                self.failures[name] -= 1
+                data.read(3)
+                raise ConnectionError("connection reset")
+
+            return create
+
+    client = HalfReadClient(str(tmp_path), {"create" : 1})
+    storage = HdfsStorage(client, max_tries=3)
+    stream = io.BytesIO(b"header:stream")
+    stream.seek(len(b"header:"))
+    storage.create("/b.txt", stream)
+    assert storage.open("/b.txt").read() == b"stream"
+
+def test_create_unseekable_stream_is_not_retried(tmp_path, sleeps):
+    class Unseekable(io.RawIOBase):
+        def readable(self):
+            return True
+
+        def readinto(self, buffer):
+            return 0
+
+    client = FlakyClient(str(tmp_path), {"create" : 1})
+    with pytest.raises(ConnectionError):
+        HdfsStorage(client, max_tries=3).create("/c.txt", Unseekable())
+    assert client.calls["create"] == 1
+
+def test_bulk_methods_keep_order(tmp_path, sleeps):
+    storage = HdfsStorage(LocalHdfsClient(str(tmp_path)), bulk_workers=4)
+    items = [(f"/bulk/{index}.bin", bytes([index]) * (index + 1)) for index in range(10)]
+
+    storage.upload_many(items)
+    assert storage.download_many([path for path, _ in items]) == [data for _, data in items]
+    assert storage.mkdirs_many(["/x", "/y"]) == [True, True]
+
+def test_make_hdfs_client_is_shared(tmp_path):
+    config = dict(default_config, hdfs_backend="local", local_hdfs_root=str(tmp_path))
+    storage = make_hdfs_client("unused:9870", config)
+
+    assert isinstance(storage, HdfsStorage)
+    assert make_hdfs_client("unused:9870", dict(config)) is storage
+    assert make_hdfs_client("unused:9870", dict(config, hdfs_max_tries=1)) is not storage
@@ -0,0 +1,101 @@
+import time
+import threading
+import pytest
+from job_scheduler import JobScheduler, JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED, JOB_REJECTED
+
+# ================================================================================================================
+@pytest.fixture
+def gate():
+    # target 함수가 이 event가 set 될 때까지 멈춰 있는다
+    event = threading.Event()
+    yield event
+    event.set()
+
+def wait_state(scheduler, job_id, state, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = scheduler.get_status(job_id)
+        if status is not None and status["STATE"] == state:
+            return status
+        time.sleep(0.01)
+
+    raise AssertionError("job {} did not reach {} : {}".format(job_id, state, scheduler.get_status(job_id)))
+
+def make_target(gate):
+    def target(name):
+        gate.wait()
+        return {"STATUS" : "200", "STATUS_RESULT" : "성공", "PAGE_COUNT" : "1", "FULL_TEXT" : name}
+    return target
+
+# ================================================================================================================
+def test_reject_when_queue_is_full(gate):
+    scheduler = JobScheduler(make_target(gate), worker_count=1, queue_size=1, admission="reject")
+
+    running = scheduler.submit("a")
+    wait_state(scheduler, running["JOB_ID"], JOB_RUNNING)
+    queued = scheduler.submit("b")
+    assert queued["STATE"] == JOB_QUEUED and queued["QUEUE_POSITION"] == 0
+
+    started = time.time()
+    rejected = scheduler.submit("c")
+    assert rejected["STATE"] == JOB_REJECTED
+    assert rejected["FINISHED_AT"] is not None
+    assert time.time() - started < 1
+
+    gate.set()
+    done = wait_state(scheduler, queued["JOB_ID"], JOB_DONE)
+    # 끝난 작업에는 요약 항목만 남긴다
+    assert done["RESULT"] == {"STATUS" : "200", "STATUS_RESULT" : "성공", "PAGE_COUNT" : "1"}
+    scheduler.shutdown()
+
+def test_block_until_timeout(gate):
+    scheduler = JobScheduler(make_target(gate), worker_count=1, queue_size=1, admission="block", block_timeout=0.2)
+
+    running = scheduler.submit("a")
+    wait_state(scheduler, running["JOB_ID"], JOB_RUNNING)
+    scheduler.submit("b")
+
+    started = time.time()
+    assert scheduler.submit("c")["STATE"] == JOB_REJECTED
+    assert time.time() - started >= 0.2
+
+    gate.set()
+    scheduler.shutdown()
+
+def test_block_until_slot_is_free(gate):
+    scheduler = JobScheduler(make_target(gate), worker_count=1, queue_size=1, admission="block", block_timeout=5)
+
+    running = scheduler.submit("a")
+    wait_state(scheduler, running["JOB_ID"], JOB_RUNNING)
+    scheduler.submit("b")
+
+    # 기다리는 동안 작업이 끝나서 자리가 나면 받아들인다
+    threading.Timer(0.1, gate.set).start()
+    blocked = scheduler.submit("c")
+    assert blocked["STATE"] != JOB_REJECTED
+
+    wait_state(scheduler, blocked["JOB_ID"], JOB_DONE)
+    scheduler.shutdown()
+
+def test_failed_jobs():
+    def target(status):
+        if status is None:
+            raise ValueError("broken pdf")
+        return {"STATUS" : status, "STATUS_RESULT" : ""}
+
+    scheduler = JobScheduler(target, worker_count=1)
+    failed = scheduler.submit("500")
+    raised = scheduler.submit(None)
+
+    assert wait_state(scheduler, failed["JOB_ID"], JOB_FAILED)["RESULT"]["STATUS"] == "500"
+    assert wait_state(scheduler, raised["JOB_ID"], JOB_FAILED)["RESULT"]["STATUS"] != ""
+    scheduler.shutdown()
+
+def test_history_is_trimmed():
+    scheduler = JobScheduler(lambda: {"STATUS" : "200"}, worker_count=1, queue_size=10, history_size=2)
+    job_ids = [scheduler.submit()["JOB_ID"] for _ in range(5)]
+    scheduler.shutdown()
+
+    # 오래된 작업부터 기록을 삭제한다
+    assert [scheduler.get_status(job_id) is not None for job_id in job_ids] == [False, False, False, True, True]
+    assert scheduler.get_status("unknown") is None
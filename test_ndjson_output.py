@@ -0,0 +1,103 @@
+import pytest
+import ndjson_output
+from hdfs_client import LocalHdfsClient
+from ndjson_output import NdjsonOutputWriter, read_ndjson_summary, read_ndjson_output, write_ndjson_output, make_ndjson_path
+
+# ================================================================================================================
+@pytest.fixture
+def fs(tmp_path):
+    return LocalHdfsClient(str(tmp_path))
+
+def make_record(page_num, text):
+    return {"page_number" : str(page_num), "page_text" : text, "page_status" : "200", "page_status_result" : "성공"}
+
+def make_summary(page_count, **fields):
+    summary = {
+        "STATUS" : "200",
+        "STATUS_RESULT" : "성공",
+        "PAGE_COUNT" : str(page_count),
+        "DOC_SEARCHABLE" : "True",
+        "FAILED_PAGES" : [],
+        "RESUMED_PAGE_COUNT" : "0"
+    }
+    summary.update(fields)
+    return summary
+
+def write_document(fs, path, texts, summary=True):
+    writer = NdjsonOutputWriter(fs, path)
+    for page_num, text in enumerate(texts, 1):
+        writer.add_page(make_record(page_num, text), text + "\n")
+        # 페이지 두 개마다 hdfs에 추가 (window 단위 flush)
+        if page_num % 2 == 0:
+            writer.flush()
+
+    if summary:
+        writer.finish(make_summary(len(texts)))
+    else:
+        writer.flush()
+
+# ================================================================================================================
+def test_writer_and_read_output(fs):
+    path = make_ndjson_path("/json", "doc")
+    write_document(fs, path, ["첫 페이지", "second", "third"])
+
+    output = read_ndjson_output(fs, path)
+    assert output["STATUS"] == "200"
+    assert output["PAGE_COUNT"] == "3"
+    assert output["FULL_TEXT"] == "첫 페이지\nsecond\nthird\n"
+    assert [page["page_text"] for page in output["PAGES"]] == ["첫 페이지", "second", "third"]
+
+def test_rewrite_overwrites_previous_run(fs):
+    path = make_ndjson_path("/json", "doc")
+    write_document(fs, path, ["old", "old", "old", "old"])
+    write_document(fs, path, ["new"])
+
+    assert read_ndjson_output(fs, path)["FULL_TEXT"] == "new\n"
+
+def test_write_and_read_round_trip(fs):
+    path = make_ndjson_path("/json", "cached")
+    output = make_summary(2, FULL_TEXT="a\nb\n", PAGES=[make_record(1, "a"), make_record(2, "b")],
+                          DEDUPLICATED_IMAGE_COUNT="0", SKIPPED_IMAGE_COUNT="0", SKIPPED_OCR_SECONDS="0.0")
+    write_ndjson_output(fs, output, path)
+
+    assert read_ndjson_output(fs, path) == output
+    assert read_ndjson_summary(fs, path)["FULL_TEXT"] == "a\nb\n"
+
+def test_summary(fs):
+    path = make_ndjson_path("/json", "doc")
+    write_document(fs, path, ["a", "b"])
+
+    summary = read_ndjson_summary(fs, path)
+    assert summary["RECORD_TYPE"] == "SUMMARY"
+    assert summary["STATUS"] == "200"
+    assert "PAGES" not in summary and "FULL_TEXT" not in summary
+
+def test_summary_missing(fs):
+    path = make_ndjson_path("/json", "doc")
+    assert read_ndjson_summary(fs, path) is None
+
+    # 요약 줄을 쓰기 전에 멈춘 문서
+    write_document(fs, path, ["a", "b", "c"], summary=False)
+    assert read_ndjson_summary(fs, path) is None
+    assert read_ndjson_output(fs, path)["STATUS"] == ""
+
+    # 요약 줄을 쓰는 도중에 끊긴 문서
+    fs.append(path, b'{"RECORD_TYPE": "SUMMARY", "STA')
+    assert read_ndjson_summary(fs, path) is None
+
+def test_summary_tail_window(fs, monkeypatch):
+    monkeypatch.setattr(ndjson_output, "SUMMARY_TAIL_BYTES", 64)
+    path = make_ndjson_path("/json", "doc")
+
+    # 끝부분에 페이지 줄 일부와 요약 줄이 모두 들어가는 경우
+    fs.create(path, ("x" * 500 + "\n" + '{"RECORD_TYPE": "SUMMARY", "STATUS": "200"}\n').encode("utf-8"))
+    assert read_ndjson_summary(fs, path)["STATUS"] == "200"
+
+    # 요약 줄이 끝부분보다 길면 파일 전체를 읽는다
+    write_document(fs, path, ["page " * 40] * 3)
+    long_summary = read_ndjson_summary(fs, path)
+    assert long_summary["STATUS"] == "200"
+    assert long_summary["PAGE_COUNT"] == "3"
+
+    write_ndjson_output(fs, make_summary(1, FULL_TEXT="long text " * 50, PAGES=[make_record(1, "long")]), path)
+    assert read_ndjson_summary(fs, path)["FULL_TEXT"] == "long text " * 50
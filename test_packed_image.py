@@ -0,0 +1,79 @@
+import pytest
+from hdfs_client import LocalHdfsClient
+from packed_image import PackedImageWriter, PackedImageReader, make_pack_path, make_inner_image_manifest_path, PACK_FOOTER, PAGE_IMAGE, INNER_IMAGE
+
+# ================================================================================================================
+@pytest.fixture
+def fs(tmp_path):
+    return LocalHdfsClient(str(tmp_path))
+
+def write_pack(fs, pack_path, images, references=()):
+    """
+    images : (종류, 페이지 번호, 순번, 바이트 데이터) 리스트
+    references : (종류, 페이지 번호, 순번, 가리킬 (종류, 페이지 번호, 순번)) 리스트
+    """
+    writer = PackedImageWriter(fs, pack_path, spool_size=16)
+    for kind, page_num, index, content in images:
+        writer.add_image(kind, page_num, index, content)
+    for kind, page_num, index, target in references:
+        writer.add_reference(kind, page_num, index, target)
+    writer.close()
+
+def index_offset(fs, pack_path):
+    data = fs.open(pack_path).read()
+    return PACK_FOOTER.unpack(data[-PACK_FOOTER.size:])[1]
+
+# ================================================================================================================
+def test_paths():
+    assert make_pack_path("/lake/png/doc/") == "/lake/png/doc.pack"
+    assert make_inner_image_manifest_path("/lake/png/doc/") == "/lake/png/doc/inner_images.json"
+
+def test_round_trip(fs):
+    images = [
+        (PAGE_IMAGE, 0, 0, b"page-0"),
+        (INNER_IMAGE, 1, 0, b"inner-1-0"),
+        (INNER_IMAGE, 1, 1, b"inner-1-1" * 100),
+        (PAGE_IMAGE, 2, 0, b""),
+    ]
+    write_pack(fs, "/png/doc.pack", images)
+
+    reader = PackedImageReader(fs, "/png/doc.pack")
+    for kind, page_num, index, content in images:
+        assert reader.read_image(kind, page_num, index) == content
+
+    assert reader.count_inner_images(0) == 0
+    assert reader.count_inner_images(1) == 2
+
+    # footer는 파일 끝에 있고 index는 이미지 데이터 바로 뒤에서 시작한다
+    data = fs.open("/png/doc.pack").read()
+    magic, offset, length = PACK_FOOTER.unpack(data[-PACK_FOOTER.size:])
+    assert offset == sum(len(content) for *_, content in images)
+    assert offset + length + PACK_FOOTER.size == len(data)
+
+def test_reference_shares_data(fs):
+    logo = b"logo" * 50
+    write_pack(fs, "/png/ref.pack", [(INNER_IMAGE, 0, 0, logo)], [(INNER_IMAGE, 3, 1, (INNER_IMAGE, 0, 0))])
+    write_pack(fs, "/png/copy.pack", [(INNER_IMAGE, 0, 0, logo), (INNER_IMAGE, 3, 1, logo)])
+
+    reader = PackedImageReader(fs, "/png/ref.pack")
+    assert reader.read_image(INNER_IMAGE, 3, 1) == logo
+    assert reader.entries[(INNER_IMAGE, 3, 1)]["offset"] == reader.entries[(INNER_IMAGE, 0, 0)]["offset"]
+    assert reader.count_inner_images(3) == 1
+
+    # 참조는 데이터를 다시 쓰지 않는다 (index 시작 위치 = 이미지 데이터 크기)
+    assert index_offset(fs, "/png/ref.pack") == len(logo)
+    assert index_offset(fs, "/png/copy.pack") == len(logo) * 2
+
+def test_reference_to_unknown_image(fs):
+    writer = PackedImageWriter(fs, "/png/bad.pack")
+    with pytest.raises(KeyError):
+        writer.add_reference(INNER_IMAGE, 1, 0, (INNER_IMAGE, 0, 0))
+    writer.abort()
+
+    assert not fs.exists("/png/bad.pack")
+
+def test_not_a_pack_file(fs):
+    fs.create("/png/plain.png", b"\x89PNG" + b"\x00" * 64)
+
+    with pytest.raises(ValueError):
+        PackedImageReader(fs, "/png/plain.png")
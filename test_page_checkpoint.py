@@ -0,0 +1,109 @@
+import json
+import pytest
+from hdfs_client import LocalHdfsClient
+from page_checkpoint import PageCheckpoint, make_checkpoint_path
+
+# ================================================================================================================
+@pytest.fixture
+def fs(tmp_path):
+    return LocalHdfsClient(str(tmp_path))
+
+def make_entry(page_num, page_status="200", full_text="text"):
+    return {
+        "PAGE" : page_num,
+        "PAGE_KIND" : None,
+        "SCANNED_COUNT" : 0,
+        "FULL_TEXT" : full_text,
+        "RECORD" : {"page_number" : str(page_num + 1), "page_status" : page_status}
+    }
+
+def write_lines(fs, path, key, lines):
+    header = json.dumps({"CHECKPOINT_KEY" : key})
+    fs.create(path, "\n".join([header] + lines).encode("utf-8"), overwrite=True)
+
+# ================================================================================================================
+def test_write_and_load(fs):
+    path = make_checkpoint_path("/json", "doc")
+    checkpoint = PageCheckpoint(fs, path, "key")
+    checkpoint.write([make_entry(0), make_entry(1, "500")])
+    checkpoint.write([make_entry(2)])
+
+    loaded = PageCheckpoint(fs, path, "key").load()
+    assert sorted(loaded) == [0, 2]
+    assert loaded[0]["FULL_TEXT"] == "text"
+
+def test_stale_key_is_ignored(fs):
+    path = make_checkpoint_path("/json", "doc")
+    PageCheckpoint(fs, path, "old").write([make_entry(0)])
+
+    checkpoint = PageCheckpoint(fs, path, "new")
+    assert checkpoint.load() == {}
+    assert checkpoint.found and not checkpoint.opened
+
+    # 새로 쓰면 이전 파일을 덮어쓴다
+    checkpoint.write([make_entry(1)])
+    assert sorted(PageCheckpoint(fs, path, "new").load()) == [1]
+
+def test_last_entry_wins(fs):
+    path = make_checkpoint_path("/json", "doc")
+    write_lines(fs, path, "key", [
+        json.dumps(make_entry(0, "500")),
+        json.dumps(make_entry(0, "200", "retried")),
+        json.dumps(make_entry(1, "200")),
+        json.dumps(make_entry(1, "500")),
+    ])
+
+    loaded = PageCheckpoint(fs, path, "key").load()
+    assert sorted(loaded) == [0]
+    assert loaded[0]["FULL_TEXT"] == "retried"
+
+def test_truncated_and_malformed_lines_are_skipped(fs):
+    path = make_checkpoint_path("/json", "doc")
+    write_lines(fs, path, "key", [
+        json.dumps(make_entry(0)),
+        "",
+        "null",
+        "[1, 2]",
+        json.dumps({"PAGE" : 1}),
+        json.dumps(dict(make_entry(2), RECORD="200")),
+        json.dumps(dict(make_entry(3), PAGE="3")),
+        json.dumps(make_entry(4)),
+        json.dumps(make_entry(5))[:20],
+    ])
+
+    assert sorted(PageCheckpoint(fs, path, "key").load()) == [0, 4]
+
+def test_append_after_truncated_line(fs):
+    path = make_checkpoint_path("/json", "doc")
+    checkpoint = PageCheckpoint(fs, path, "key")
+    checkpoint.write([make_entry(0)])
+    # 쓰는 도중 끊긴 줄
+    fs.append(path, json.dumps(make_entry(1))[:15].encode("utf-8"))
+    checkpoint.write([make_entry(2)])
+
+    assert sorted(PageCheckpoint(fs, path, "key").load()) == [0, 2]
+
+def test_remove(fs):
+    path = make_checkpoint_path("/json", "doc")
+    checkpoint = PageCheckpoint(fs, path, "key")
+    checkpoint.write([make_entry(0)])
+    checkpoint.remove()
+
+    assert not fs.exists(path)
+
+def test_write_failure_disables_checkpoint(fs):
+    class FailingFs:
+        def __init__(self):
+            self.calls = 0
+
+        def create(self, *args, **kwargs):
+            self.calls += 1
+            raise OSError("disk full")
+
+    failing_fs = FailingFs()
+    checkpoint = PageCheckpoint(failing_fs, "/json/doc.pages.jsonl", "key")
+    checkpoint.write([make_entry(0)])
+    checkpoint.write([make_entry(1)])
+
+    assert checkpoint.disabled
+    assert failing_fs.calls == 1
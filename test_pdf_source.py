@@ -0,0 +1,98 @@
+import os
+import io
+import fitz
+import pytest
+from config import default_config
+from hdfs_client import LocalHdfsClient
+from pdf_source import PdfSource, load_pdf_source
+
+# ================================================================================================================
+@pytest.fixture
+def fs(tmp_path):
+    return LocalHdfsClient(str(tmp_path / "hdfs"))
+
+@pytest.fixture
+def spill_directory(tmp_path):
+    return str(tmp_path / "spill")
+
+@pytest.fixture
+def pdf_content():
+    document = fitz.open()
+    for page_num in range(3):
+        document.new_page().insert_text((72, 72), f"page {page_num + 1}")
+    content = document.tobytes()
+    document.close()
+    return content
+
+def make_config(spill_directory, spill_bytes):
+    return dict(default_config, pdf_spill_bytes=spill_bytes, pdf_spill_directory=spill_directory, pdf_spill_chunk_bytes=100)
+
+# ================================================================================================================
+def test_spill_threshold(fs, spill_directory, pdf_content):
+    fs.create("/pdf/doc.pdf", pdf_content)
+
+    # 'pdf_spill_bytes'보다 작거나 0이면 메모리로 불러온다
+    for spill_bytes in [len(pdf_content) + 1, 0]:
+        source = load_pdf_source(fs, "/pdf/doc.pdf", make_config(spill_directory, spill_bytes))
+        assert not source.spilled
+        assert source.content == pdf_content
+
+    source = load_pdf_source(fs, "/pdf/doc.pdf", make_config(spill_directory, len(pdf_content)))
+    assert source.spilled
+    assert os.path.dirname(source.path) == spill_directory
+    assert source.size == len(pdf_content)
+
+    with open(source.path, "rb") as fp:
+        assert fp.read() == pdf_content
+    source.close()
+
+def test_spilled_source_matches_memory_source(fs, spill_directory, pdf_content):
+    fs.create("/pdf/doc.pdf", pdf_content)
+    spilled = load_pdf_source(fs, "/pdf/doc.pdf", make_config(spill_directory, 1))
+    in_memory = PdfSource(content=pdf_content)
+
+    assert spilled.digest() == in_memory.digest()
+    for source in [spilled, in_memory]:
+        with source.open_document() as document:
+            assert document.page_count == 3
+            assert document[1].get_text().strip() == "page 2"
+        with source.local_path() as path, open(path, "rb") as fp:
+            assert fp.read() == pdf_content
+
+    spilled.close()
+
+def test_cleanup(fs, spill_directory, pdf_content):
+    fs.create("/pdf/doc.pdf", pdf_content)
+    source = load_pdf_source(fs, "/pdf/doc.pdf", make_config(spill_directory, 1))
+    path = source.path
+
+    source.close()
+    assert not os.path.exists(path)
+    # 여러 번 호출해도 된다
+    source.close()
+
+    # 메모리 방식의 임시 파일은 with 블록이 끝나면 삭제한다
+    with PdfSource(content=pdf_content).local_path() as path:
+        assert os.path.exists(path)
+    assert not os.path.exists(path)
+
+def test_failed_spill_is_removed(fs, spill_directory, pdf_content):
+    fs.create("/pdf/doc.pdf", pdf_content)
+
+    class BrokenStream(io.BytesIO):
+        def read(self, size=-1):
+            if self.tell() >= 200:
+                raise ConnectionError("connection reset")
+            return super().read(size)
+
+    class BrokenFs:
+        def get_file_status(self, path):
+            return fs.get_file_status(path)
+
+        def open(self, path):
+            return BrokenStream(pdf_content)
+
+    with pytest.raises(ConnectionError):
+        load_pdf_source(BrokenFs(), "/pdf/doc.pdf", make_config(spill_directory, 1))
+
+    assert os.listdir(spill_directory) == []
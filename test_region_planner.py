@@ -0,0 +1,72 @@
+import cv2
+import fitz
+import numpy as np
+from config import default_config
+from region_planner import RegionPlanner, make_region_planner, text_coverage, image_entropy, SKIP_SMALL, SKIP_TEXT_COVERED, SKIP_LOW_ENTROPY
+
+# ================================================================================================================
+def make_png(height, width, seed):
+    noise = np.random.default_rng(seed).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    return cv2.imencode(".png", noise)[1].tobytes()
+
+def make_page():
+    """
+    삽입 이미지 4개가 있는 페이지를 만들어서 (페이지, {xref : 이미지 이름}) 을 return 한다.
+    """
+    document = fitz.open()
+    page = document.new_page(width=600, height=800)
+
+    images = {
+        "icon" : (fitz.Rect(20, 20, 40, 40), make_png(16, 16, 0)),
+        "covered" : (fitz.Rect(50, 100, 550, 300), make_png(200, 400, 1)),
+        "figure" : (fitz.Rect(50, 400, 550, 700), make_png(200, 400, 2)),
+        "outside" : (fitz.Rect(700, 900, 900, 1000), make_png(100, 100, 3)),
+    }
+    xref_names = {}
+    for name, (rect, png) in images.items():
+        xref_names[page.insert_image(rect, stream=png)] = name
+
+    # covered 이미지 영역을 덮는 텍스트 레이어 (보이지 않는 OCR 텍스트)
+    for line in range(10):
+        page.insert_text((50, 110 + line * 20), "scanned text line " * 5, fontsize=12, render_mode=3)
+
+    return document, page, xref_names
+
+# ================================================================================================================
+def test_plan_skip_reasons():
+    document, page, xref_names = make_page()
+    reasons = RegionPlanner().plan(page)
+
+    # 결과는 get_images(full=True) 순서
+    named_reasons = {xref_names[image_info[0]] : reason for image_info, reason in zip(page.get_images(full=True), reasons)}
+    assert named_reasons == {"icon" : SKIP_SMALL, "covered" : SKIP_TEXT_COVERED, "figure" : None, "outside" : None}
+    document.close()
+
+def test_plan_thresholds():
+    document, page, xref_names = make_page()
+    reasons = RegionPlanner(min_side=1, min_pixels=1, max_text_coverage=1.1).plan(page)
+
+    assert reasons == [None] * 4
+    document.close()
+
+def test_text_coverage():
+    image_rect = fitz.Rect(0, 0, 100, 100)
+    assert text_coverage(image_rect, []) == 0.0
+    assert text_coverage(image_rect, [fitz.Rect(0, 0, 50, 100)]) == 0.5
+    # 겹친 블록은 두 번 세지 않는다
+    assert text_coverage(image_rect, [fitz.Rect(0, 0, 50, 100), fitz.Rect(0, 0, 50, 100), fitz.Rect(0, 0, 100, 50)]) == 0.75
+
+def test_check_image():
+    planner = RegionPlanner()
+    blank = np.full((600, 800, 3), 255, np.uint8)
+    noise = np.random.default_rng(0).integers(0, 256, (600, 800), dtype=np.uint8)
+
+    assert image_entropy(blank) == 0.0
+    assert planner.check_image(blank) == SKIP_LOW_ENTROPY
+    assert planner.check_image(noise) is None
+
+def test_make_region_planner():
+    assert make_region_planner(default_config) is None
+
+    planner = make_region_planner(dict(default_config, region_planner=True, region_min_side=10))
+    assert planner.min_side == 10
@@ -0,0 +1,86 @@
+import os
+import pytest
+from config import default_config
+from pdf_source import PdfSource
+from result_cache import ResultCache, LocalDiskCacheBackend, make_cache_key, is_complete_output
+
+# ================================================================================================================
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(LocalDiskCacheBackend(str(tmp_path / "cache")), max_bytes=10 * 1024 ** 2)
+
+def make_output(page_count=2, **fields):
+    output = {
+        "STATUS" : "200",
+        "STATUS_RESULT" : "성공",
+        "PAGE_COUNT" : str(page_count),
+        "FAILED_PAGES" : [],
+        "FULL_TEXT" : "text\n" * page_count,
+        "PAGES" : [{"page_number" : str(page_num), "page_status" : "200"} for page_num in range(1, page_count + 1)]
+    }
+    output.update(fields)
+    return output
+
+# ================================================================================================================
+def test_cache_key_is_stable():
+    config = dict(default_config)
+    key = make_cache_key(b"%PDF-1.4 content", config)
+
+    # 같은 pdf, 같은 설정이면 key 순서나 경로와 관계 없이 같은 key
+    assert make_cache_key(b"%PDF-1.4 content", dict(reversed(list(config.items())))) == key
+    assert make_cache_key(PdfSource(content=b"%PDF-1.4 content"), config) == key
+
+    assert make_cache_key(b"%PDF-1.4 other", config) != key
+
+def test_cache_key_config():
+    config = dict(default_config)
+    key = make_cache_key(b"pdf", config)
+
+    # 결과값에 영향을 주지 않는 설정값은 key에 들어가지 않는다
+    assert make_cache_key(b"pdf", dict(config, worker_count=99, metrics=not config["metrics"])) == key
+
+    # 결과값에 영향을 주는 설정값은 key를 바꾼다
+    assert make_cache_key(b"pdf", dict(config, ocr_gpu=not config["ocr_gpu"])) != key
+    assert make_cache_key(b"pdf", dict(config, region_planner=not config["region_planner"])) != key
+
+def test_incomplete_output_is_not_stored(cache):
+    incomplete_outputs = [
+        make_output(STATUS="500"),
+        make_output(FAILED_PAGES=["2"]),
+        make_output(PAGE_COUNT="3"),
+        {field : value for field, value in make_output().items() if field != "PAGES"},
+    ]
+    for index, output in enumerate(incomplete_outputs):
+        cache.put(f"key{index}", output)
+
+    assert cache.backend.list_entries() == []
+    assert cache.stats()["STORES"] == 0
+    assert not is_complete_output(incomplete_outputs[0])
+
+def test_put_and_get(cache):
+    output = make_output(METRICS={"TOTAL_SECONDS" : 1.0})
+    cache.put("key", output)
+
+    cached = cache.get("key")
+    assert "METRICS" not in cached
+    assert cached["PAGES"] == output["PAGES"]
+    assert cache.get("missing") is None
+    assert cache.stats() == {"HITS" : 1, "MISSES" : 1, "STORES" : 1, "EVICTIONS" : 0}
+
+def test_least_recently_used_is_evicted(cache):
+    for key in ["a", "b", "c"]:
+        cache.put(key, make_output())
+    entry_size = cache.backend.list_entries()[0][1]
+
+    # a가 가장 최근, b가 가장 오래전에 사용된 결과값
+    for key, mtime in [("a", 3000), ("b", 1000), ("c", 2000)]:
+        os.utime(cache.backend.path(key), (mtime, mtime))
+
+    cache.max_bytes = entry_size * 2
+    cache.evict()
+    assert sorted(key for key, _, _ in cache.backend.list_entries()) == ["a", "c"]
+
+    cache.max_bytes = entry_size
+    cache.evict()
+    assert [key for key, _, _ in cache.backend.list_entries()] == ["a"]
+    assert cache.stats()["EVICTIONS"] == 2
@@ -0,0 +1,92 @@
+import numpy as np
+from tiled_ocr import tile_starts, tile_core_bounds, TilePlan, TiledImage, OcrTiling
+
+# ================================================================================================================
+def make_result(boxes=None, text="", status="200"):
+    result = {"STATUS" : status, "STATUS_RESULT" : "성공" if status == "200" else "실패", "TEXT" : text}
+    if boxes is not None:
+        result["BOXES"] = boxes
+    return result
+
+# ================================================================================================================
+def test_tile_starts():
+    assert tile_starts(300, 400, 100) == [0]
+    assert tile_starts(400, 400, 100) == [0]
+    # 마지막 tile은 이미지 끝에 맞춘다
+    assert tile_starts(1000, 400, 100) == [0, 300, 600]
+    assert tile_starts(750, 400, 100) == [0, 300, 350]
+
+def test_tile_core_bounds():
+    assert tile_core_bounds([0], 400, 300) == [(0, 300)]
+
+    # 겹치는 구간의 가운데가 경계이고, 구간들은 빈틈 없이 이미지 전체를 덮는다
+    bounds = tile_core_bounds([0, 300, 600], 400, 1000)
+    assert bounds == [(0, 350), (350, 650), (650, 1000)]
+
+def test_plan_order():
+    plan = TilePlan(700, 1000, 400, 100)
+    assert (plan.tile_height, plan.tile_width) == (400, 400)
+    # 왼쪽 위부터 행 단위 순서
+    assert plan.origins == [(0, 0), (300, 0), (600, 0), (0, 300), (300, 300), (600, 300)]
+    assert len(plan) == len(plan.cores) == 6
+
+def test_merge_deduplicates_and_orders():
+    plan = TilePlan(100, 1000, 400, 100)
+    tile_results = [
+        make_result([
+            (10, 60, 60, 80, "left"),
+            (10, 10, 50, 30, "first"),
+            # 오른쪽 경계에서 잘린 글자
+            (290, 10, 400, 30, "partial"),
+            # 중심이 다음 tile이 맡는 구간에 있는 글자
+            (340, 60, 380, 80, "neighbor")
+        ]),
+        make_result([(0, 10, 120, 30, "word"), (40, 60, 80, 80, "middle")]),
+        make_result([(50, 60, 100, 80, "second")])
+    ]
+
+    assert plan.merge(tile_results)["TEXT"] == " first word left middle second"
+
+def test_merge_without_boxes_and_failure():
+    plan = TilePlan(100, 1000, 400, 100)
+    assert plan.merge([make_result(text="a "), make_result(text="b "), make_result(text="c ")])["TEXT"] == "a b c "
+
+    failed = plan.merge([make_result([]), make_result(status="500"), make_result([])])
+    assert failed["STATUS"] == "500" and failed["TEXT"] == ""
+
+# ================================================================================================================
+def test_ocr_tiling_plan():
+    tiling = OcrTiling(min_pixels=500 * 500, tile_size=400, overlap=1000)
+    assert tiling.overlap == 200
+
+    assert tiling.plan(np.zeros((300, 300), np.uint8)) is None
+    assert tiling.plan(np.zeros((100, 1000), np.uint8)) is None
+
+    image = np.zeros((1000, 1000), np.uint8)
+    assert isinstance(tiling.split(image), TiledImage)
+    assert tiling.split(np.zeros((300, 300), np.uint8)).shape == (300, 300)
+
+def test_tile_groups_are_built_lazily():
+    image = np.arange(1000 * 1000, dtype=np.uint32).reshape(1000, 1000)
+    calls = []
+
+    def preprocess(tiles):
+        calls.append(len(tiles))
+        return [tile * 2 for tile in tiles]
+
+    tiled_image = OcrTiling(min_pixels=1, tile_size=400, overlap=100, batch_tiles=4).split(image, preprocess)
+    assert len(tiled_image.plan) == 9
+    assert tiled_image.pixels == 9 * 400 * 400
+
+    groups = tiled_image.tile_groups(4)
+    first = next(groups)
+    # 첫 묶음만 잘라서 전처리한다
+    assert calls == [4]
+    assert len(first) == 4
+    assert np.array_equal(first[1], image[0:400, 300:700] * 2)
+
+    assert [len(group) for group in groups] == [4, 1]
+    assert calls == [4, 4, 1]
+
+    tiled_image.release()
+    assert tiled_image.image is None
@@ -0,0 +1,260 @@
+import numpy as np
+
+# 다른 tile의 글자 영역과 이 비율 이상 겹치면 같은 글자로 보고 큰 영역만 남긴다 (겹친 넓이 / 작은 영역의 넓이)
+DUPLICATE_BOX_RATIO = 0.5
+
+# ================================================================================================================
+def tile_starts(length, tile_length, overlap):
+    """
+    length : 이미지의 한 축 길이
+    tile_length : tile의 한 축 길이
+    overlap : 이웃한 tile끼리 겹치는 길이
+
+    한 축의 tile 시작 위치 리스트를 return 한다. 마지막 tile은 이미지 끝에 맞추므로 모든 tile의 크기가 같다.
+    """
+    if length <= tile_length:
+        return [0]
+
+    step = max(1, tile_length - overlap)
+    starts = list(range(0, length - tile_length, step))
+    starts.append(length - tile_length)
+
+    return starts
+
+def tile_core_bounds(starts, tile_length, length):
+    """
+    한 축에서 각 tile이 글자 영역을 맡는 구간 [시작, 끝) 리스트를 return 한다.
+
+    이웃한 두 tile이 겹치는 구간의 가운데를 경계로 나눈다.
+    """
+    edges = [0]
+    for previous_start, start in zip(starts, starts[1:]):
+        edges.append((start + previous_start + tile_length) / 2)
+    edges.append(length)
+
+    return list(zip(edges, edges[1:]))
+
+# ================================================================================================================
+class TilePlan:
+    """
+    # 큰 페이지 이미지의 tile 분할
+
+    페이지 이미지를 tile_size 크기의 겹치는 tile들로 나누고, tile 별 OCR 결과를 페이지 좌표로 옮겨서 합친다.
+
+    tile은 왼쪽 위부터 행 단위 순서이며, 모두 같은 크기이므로 detector에서 한 batch로 처리된다.
+    """
+    def __init__(self, height, width, tile_size, overlap):
+        """
+        height, width : 페이지 이미지 크기
+        tile_size : tile의 한 변 길이 (이미지가 더 작은 축은 이미지 길이)
+        overlap : 이웃한 tile끼리 겹치는 길이 (가장 긴 글자 영역보다 길어야 잘린 글자가 이웃 tile에 온전히 들어간다)
+        """
+        self.tile_height = min(tile_size, height)
+        self.tile_width = min(tile_size, width)
+
+        y_starts = tile_starts(height, self.tile_height, overlap)
+        x_starts = tile_starts(width, self.tile_width, overlap)
+        y_cores = tile_core_bounds(y_starts, self.tile_height, height)
+        x_cores = tile_core_bounds(x_starts, self.tile_width, width)
+
+        # tile 별 (x, y) 시작 위치와 글자 영역을 맡는 구간 (x0, y0, x1, y1)
+        self.origins = [(x, y) for y in y_starts for x in x_starts]
+        self.cores = [(x0, y0, x1, y1) for y0, y1 in y_cores for x0, x1 in x_cores]
+
+    def __len__(self):
+        return len(self.origins)
+
+    def crop(self, image, tile_index):
+        x, y = self.origins[tile_index]
+        return np.ascontiguousarray(image[y:y + self.tile_height, x:x + self.tile_width])
+
+    def merge(self, tile_results):
+        """
+        tile_results : tile 순서대로의 OCR 결과값 리스트 ({"STATUS", "STATUS_RESULT", "TEXT", "BOXES"})
+
+        tile 별 OCR 결과를 페이지 하나의 OCR 결과값({"STATUS", "STATUS_RESULT", "TEXT"})으로 합친다.
+
+        1. 글자 영역을 페이지 좌표로 옮기고, 중심이 tile이 맡는 구간 밖에 있는 영역은 이웃 tile에 맡긴다.
+        2. 다른 tile의 영역과 많이 겹치는 영역(경계에서 잘린 글자)은 큰 영역만 남긴다.
+        3. 남은 영역을 위에서 아래, 왼쪽에서 오른쪽 순서로 이어붙인다.
+
+        글자 영역 좌표가 없는 OCR 모델의 결과는 tile 순서대로 텍스트만 이어붙인다.
+        """
+        for tile_result in tile_results:
+            if tile_result["STATUS"] != "200":
+                return {"STATUS" : tile_result["STATUS"], "STATUS_RESULT" : tile_result["STATUS_RESULT"], "TEXT" : ""}
+
+        output = {"STATUS" : "200", "STATUS_RESULT" : "성공", "TEXT" : ""}
+
+        if not all("BOXES" in tile_result for tile_result in tile_results):
+            output["TEXT"] = "".join(tile_result["TEXT"] for tile_result in tile_results)
+            return output
+
+        boxes = []
+        for tile_index, tile_result in enumerate(tile_results):
+            x, y = self.origins[tile_index]
+            core_x0, core_y0, core_x1, core_y1 = self.cores[tile_index]
+
+            for x0, y0, x1, y1, text in tile_result["BOXES"]:
+                box = (x0 + x, y0 + y, x1 + x, y1 + y, text, tile_index)
+                center_x, center_y = (box[0] + box[2]) / 2, (box[1] + box[3]) / 2
+
+                if core_x0 <= center_x < core_x1 and core_y0 <= center_y < core_y1:
+                    boxes.append(box)
+
+        for box in order_boxes(remove_duplicate_boxes(boxes)):
+            output["TEXT"] += (" " + box[4])
+
+        return output
+
+# ================================================================================================================
+def box_area(box):
+    return max(0, box[2] - box[0]) * max(0, box[3] - box[1])
+
+def remove_duplicate_boxes(boxes):
+    """
+    boxes : (x0, y0, x1, y1, text, tile_index) 리스트
+
+    서로 다른 tile에서 나온 영역이 많이 겹치면 넓은 영역(잘리지 않은 글자)만 남긴다.
+    """
+    kept = []
+    for box in sorted(boxes, key=box_area, reverse=True):
+        duplicate = False
+        for other in kept:
+            if other[5] == box[5]:
+                continue
+
+            overlap_width = min(box[2], other[2]) - max(box[0], other[0])
+            overlap_height = min(box[3], other[3]) - max(box[1], other[1])
+            if overlap_width <= 0 or overlap_height <= 0:
+                continue
+
+            if overlap_width * overlap_height >= DUPLICATE_BOX_RATIO * max(1, box_area(box)):
+                duplicate = True
+                break
+
+        if not duplicate:
+            kept.append(box)
+
+    return kept
+
+def order_boxes(boxes):
+    """
+    글자 영역들을 읽는 순서(줄 단위로 위에서 아래, 줄 안에서 왼쪽에서 오른쪽)로 정렬한다.
+
+    세로 중심의 차이가 글자 높이 중앙값의 절반보다 작으면 같은 줄로 본다.
+    """
+    if not boxes:
+        return []
+
+    line_height = max(1, float(np.median([box[3] - box[1] for box in boxes])))
+    boxes = sorted(boxes, key=lambda box: (box[1] + box[3]) / 2)
+
+    lines = [[boxes[0]]]
+    for box in boxes[1:]:
+        line_center = (lines[-1][0][1] + lines[-1][0][3]) / 2
+        if (box[1] + box[3]) / 2 - line_center < line_height / 2:
+            lines[-1].append(box)
+        else:
+            lines.append([box])
+
+    return [box for line in lines for box in sorted(line, key=lambda box: box[0])]
+
+# ================================================================================================================
+class TiledImage:
+    """
+    # tile로 나눌 페이지 이미지
+
+    'prepare_ocr_window'가 큰 페이지 이미지 대신 OCR 대상에 넣는 객체이며, 'run_window_ocr'에서 tile을 batch_tiles 개씩 잘라서
+    전처리, OCR 한 후 결과를 합친다.
+
+    페이지 이미지는 한 장만 가지고 있고, tile은 묶음 단위로 만들었다가 OCR이 끝나면 버린다.
+    """
+    def __init__(self, plan, image, preprocess=None):
+        """
+        plan : TilePlan 객체
+        image : 페이지 이미지 (전처리 전 이미지 또는 전처리가 끝난 이미지)
+        preprocess : tile 이미지 리스트를 받아서 전처리 결과 리스트를 return 하는 함수 (None이면 이미 전처리된 이미지)
+        """
+        self.plan = plan
+        self.image = image
+        self.preprocess = preprocess
+
+    @property
+    def pixels(self):
+        return len(self.plan) * self.plan.tile_height * self.plan.tile_width
+
+    def tile_groups(self, batch_tiles):
+        """
+        batch_tiles : 한 번에 만들 tile 수
+
+        tile을 batch_tiles 개씩 잘라서 전처리한 리스트를 순서대로 yield 한다. (전처리 에러가 난 tile은 에러 정보 dict)
+
+        받은 쪽에서 다음 묶음을 요청하기 전에 이전 묶음을 버리면 동시에 메모리에 있는 tile은 한 묶음뿐이다.
+        """
+        for tile_start in range(0, len(self.plan), batch_tiles):
+            tile_indexes = range(tile_start, min(tile_start + batch_tiles, len(self.plan)))
+            if self.preprocess is None:
+                yield [self.plan.crop(self.image, tile_index) for tile_index in tile_indexes]
+            else:
+                yield self.preprocess([self.plan.crop(self.image, tile_index) for tile_index in tile_indexes])
+
+    def release(self):
+        # OCR이 끝난 페이지 이미지는 메모리 해제
+        self.image = None
+
+class OcrTiling:
+    """
+    # tile OCR 설정
+
+    픽셀 수가 min_pixels 이상인 페이지 이미지는 tile로 나눠서 전처리, OCR 한다.
+
+    detector는 큰 이미지를 정해진 크기로 줄여서 글자 영역을 찾으므로, 대형 도면의 작은 글자는 tile 단위로 찾아야 놓치지 않는다.
+
+    페이지 이미지 한 장은 그대로 메모리에 있고, 전처리와 OCR의 작업 메모리가 batch_tiles 개의 tile 크기 만큼 더 필요하다.
+    """
+    def __init__(self, min_pixels, tile_size=2048, overlap=256, batch_tiles=4):
+        """
+        min_pixels : tile로 나눌 페이지 이미지의 최소 픽셀 수
+        tile_size : tile의 한 변 길이
+        overlap : 이웃한 tile끼리 겹치는 길이
+        batch_tiles : 한 번에 잘라서 전처리하고 detector에 넣을 tile 수
+        """
+        self.min_pixels = min_pixels
+        self.tile_size = tile_size
+        self.overlap = min(overlap, tile_size // 2)
+        self.batch_tiles = max(1, batch_tiles)
+
+    def plan(self, image):
+        """
+        tile로 나눠야 하는 이미지면 TilePlan을, 아니면 None을 return 한다.
+        """
+        height, width = image.shape[:2]
+        if height * width < self.min_pixels or (height <= self.tile_size and width <= self.tile_size):
+            return None
+
+        return TilePlan(height, width, self.tile_size, self.overlap)
+
+    def split(self, image, preprocess=None):
+        """
+        image : 페이지 이미지
+        preprocess : tile 단위로 실행할 전처리 함수 (None이면 이미 전처리가 끝난 이미지)
+
+        tile로 나눠야 하는 이미지는 tile을 만들지 않은 TiledImage로 감싸서 return 한다. tile로 나누지 않는 이미지는 그대로 return 한다.
+        """
+        plan = self.plan(image)
+        if plan is None:
+            return image
+
+        return TiledImage(plan, image, preprocess)
+
+def make_ocr_tiling(config):
+    """
+    config : 파이프라인 설정값 dict
+
+    'ocr_tile_min_pixels' 설정으로 OcrTiling을 만든다. 0이면 tile OCR을 사용하지 않으므로 None을 return 한다.
+    """
+    if not config["ocr_tile_min_pixels"]:
+        return None
+
+    return OcrTiling(config["ocr_tile_min_pixels"], config["ocr_tile_size"], config["ocr_tile_overlap"], config["ocr_tile_batch"])